@@ -0,0 +1,242 @@
+"""
+Admission Module
+
+Bounds how much chat work a worker takes on at once. A request is admitted
+while the global and per-persona in-flight limits have room; otherwise it
+waits in a bounded FIFO queue until a slot frees or its deadline passes.
+When the queue is full the request is turned away immediately, so a burst
+gets fast 429/503 responses with Retry-After instead of piling up behind
+blocking provider calls until the worker is timed out.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+# Requests served concurrently per worker, across all personas
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "32"))
+
+# Requests served concurrently per persona, unless overridden below
+ADMISSION_PERSONA_LIMIT = int(os.getenv("ADMISSION_PERSONA_LIMIT", "16"))
+
+# Per-persona overrides, e.g. "ocean=8,mkm=4"
+ADMISSION_PERSONA_LIMITS = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("ADMISSION_PERSONA_LIMITS", "").split(",") if "=" in item
+    )
+}
+
+# Requests allowed to wait for a slot; beyond this they are rejected at once
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+
+# Seconds a request may wait in the queue before giving up
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request can't be admitted
+
+    status_code is 429 when the queue is full and 503 when the request
+    waited past its deadline; retry_after is a hint in whole seconds.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("persona", "loop", "future", "granted")
+
+    def __init__(self, persona, loop, future):
+        self.persona = persona
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Global and per-persona concurrency limits with a bounded wait queue.
+
+    acquire() is awaited on the event loop; release() may be called from any
+    thread, so a streaming response can hand its slot back from the worker
+    thread that ran it. A freed slot goes straight to the oldest queued
+    request whose persona has room.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = ADMISSION_MAX_INFLIGHT,
+        persona_limit: int = ADMISSION_PERSONA_LIMIT,
+        persona_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            max_inflight: Concurrent requests across all personas
+            persona_limit: Concurrent requests per persona
+            persona_limits: Per-persona overrides of persona_limit
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait before it is rejected
+        """
+        self.max_inflight = max_inflight
+        self.persona_limit = persona_limit
+        self.persona_limits = dict(ADMISSION_PERSONA_LIMITS if persona_limits is None else persona_limits)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._inflight = 0
+        self._persona_inflight: Dict[str, int] = {}
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+
+    def limit_for(self, persona: str) -> int:
+        return self.persona_limits.get(persona, self.persona_limit)
+
+    async def acquire(self, persona: str, timeout: Optional[float] = None) -> float:
+        """
+        Wait for a slot for one request
+
+        Args:
+            persona: Chat type the request is for
+            timeout: Seconds to wait in the queue (defaults to queue_timeout)
+
+        Returns:
+            float: Monotonic admission time, to pass back to release()
+
+        Raises:
+            Overloaded: The queue is full or the deadline passed
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Only jump the queue when nobody is waiting for this persona's slot
+            if self._has_room(persona) and not any(w.persona == persona for w in self._queue):
+                self._grant(persona)
+                return time.monotonic()
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("Server is busy, please retry shortly", 429, self._retry_after())
+            waiter = _Waiter(persona, loop, loop.create_future())
+            self._queue.append(waiter)
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout if timeout is None else timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not waiter.granted:
+                    self._queue.remove(waiter)
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    self.timed_out += 1
+                    raise Overloaded("Timed out waiting for capacity", 503, self._retry_after())
+            # The slot was handed over just as the wait ended
+            if isinstance(e, asyncio.CancelledError):
+                self.release(persona)
+                raise
+        return time.monotonic()
+
+    def release(self, persona: str, admitted_at: Optional[float] = None):
+        """Return a slot and hand it to the next eligible waiter"""
+        with self._lock:
+            self._inflight -= 1
+            remaining = self._persona_inflight.get(persona, 1) - 1
+            if remaining > 0:
+                self._persona_inflight[persona] = remaining
+            else:
+                self._persona_inflight.pop(persona, None)
+            if admitted_at is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - admitted_at)
+            self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, persona: str, timeout: Optional[float] = None):
+        """Hold a slot for the duration of the block"""
+        admitted_at = await self.acquire(persona, timeout)
+        try:
+            yield
+        finally:
+            self.release(persona, admitted_at)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "inflight": self._inflight,
+                "inflight_by_persona": dict(self._persona_inflight),
+                "queue_depth": len(self._queue),
+                "queue_depth_by_persona": self._queue_by_persona(),
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "mean_service_seconds": round(self._service_time, 3),
+                "limits": {
+                    "max_inflight": self.max_inflight,
+                    "persona_limit": self.persona_limit,
+                    "persona_limits": dict(self.persona_limits),
+                    "max_queue": self.max_queue,
+                    "queue_timeout": self.queue_timeout
+                }
+            }
+
+    def _has_room(self, persona: str) -> bool:
+        return (self._inflight < self.max_inflight
+                and self._persona_inflight.get(persona, 0) < self.limit_for(persona))
+
+    def _grant(self, persona: str):
+        """Take a slot (caller holds the lock)"""
+        self._inflight += 1
+        self._persona_inflight[persona] = self._persona_inflight.get(persona, 0) + 1
+        self.admitted += 1
+
+    def _dispatch(self):
+        """Hand free slots to the oldest waiters that fit (caller holds the lock)"""
+        for waiter in list(self._queue):
+            if self._inflight >= self.max_inflight:
+                return
+            if waiter.future.done() or not self._has_room(waiter.persona):
+                continue
+            self._queue.remove(waiter)
+            self._grant(waiter.persona)
+            waiter.granted = True
+            waiter.loop.call_soon_threadsafe(self._wake, waiter.future)
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    def _queue_by_persona(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for waiter in self._queue:
+            counts[waiter.persona] = counts.get(waiter.persona, 0) + 1
+        return counts
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (caller holds the lock)"""
+        backlog = (len(self._queue) + 1) / max(1, self.max_inflight)
+        return max(1, math.ceil(backlog * self._service_time))
+
+
+# Process-wide controller used by the web app
+admission = AdmissionController()
@@ -4,6 +4,10 @@ import json
 import time
 from typing import List, Dict, Any
 
+from log_config import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
 def list_chat_types(db_path: str = "chat_history.db") -> Dict[str, int]:
     """List all chat types in the database with their counts"""
     with sqlite3.connect(db_path) as conn:
@@ -109,7 +113,7 @@ def migrate_chat_type(
                 stats["migrated"] += 1
                 
             except Exception as e:
-                print(f"Error migrating conversation {conv.get('chat_id')}: {e}")
+                logger.error("Error migrating conversation %s: %s", conv.get('chat_id'), e)
                 stats["failed"] += 1
     
     # Delete migrated conversations from source DB
@@ -142,10 +146,10 @@ def archive_non_essential(
     results = {}
     for chat_type in chat_types:
         if chat_type not in keep_types:
-            print(f"Archiving {chat_type}...")
+            logger.info("Archiving %s...", chat_type)
             stats = migrate_chat_type(chat_type, source_db, target_db)
             results[chat_type] = stats
-            print(f"Done: {stats}")
+            logger.info("Archived %s: %s", chat_type, stats, extra=stats)
     
     return results
 
@@ -154,9 +158,11 @@ def optimize_database(db_path: str = "chat_history.db"):
     with sqlite3.connect(db_path) as conn:
         conn.execute("VACUUM")
         conn.execute("ANALYZE")
-    print(f"Database {db_path} optimized")
+    logger.info("Database %s optimized", db_path)
 
 if __name__ == "__main__":
+    configure_logging()
+
     # First, list all chat types
     print("Current chat types in database:")
     chat_types = list_chat_types()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Batch Metadata Module
+
+Backfills conversation metadata for a whole database. Conversations that are
+missing topics or a summary are collected, analyzed in batches with bounded
+parallelism, and written back in bulk to conversations.metadata and the
+topics/summary columns of the FTS index. Progress is checkpointed to a JSON
+file so an interrupted run resumes where it stopped.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log_config import configure_logging, get_logger
+
+DEFAULT_BATCH_SIZE = int(os.getenv("METADATA_BATCH_SIZE", "20"))
+DEFAULT_WORKERS = int(os.getenv("METADATA_BATCH_WORKERS", "4"))
+DEFAULT_CHECKPOINT_PATH = os.getenv("METADATA_CHECKPOINT_PATH", "metadata_checkpoint.json")
+
+# Summary ChatClient saves before any real metadata exists
+PLACEHOLDER_SUMMARY = "Chat history"
+
+logger = get_logger(__name__)
+
+
+def needs_metadata(metadata_json: Optional[str]) -> bool:
+    """Check if a conversation's stored metadata lacks topics or a real summary"""
+    try:
+        metadata = json.loads(metadata_json or "{}")
+    except json.JSONDecodeError:
+        return True
+    summary = metadata.get("summary")
+    return not metadata.get("topics") or not summary or summary == PLACEHOLDER_SUMMARY
+
+
+class BatchMetadataPipeline:
+    def __init__(
+        self,
+        db_path: str = "chat_history.db",
+        analyze_fn: Optional[Callable[[List[Dict]], Optional[Dict]]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_workers: int = DEFAULT_WORKERS,
+        checkpoint_path: str = DEFAULT_CHECKPOINT_PATH
+    ):
+        """
+        Initialize the pipeline
+
+        Args:
+            db_path: SQLite database to backfill
+            analyze_fn: Takes a list of messages and returns a metadata dict (or
+                None on failure). Defaults to metadata_utils.analyze_conversation.
+            batch_size: Conversations analyzed and written per batch
+            max_workers: Concurrent analyze_fn calls within a batch
+            checkpoint_path: JSON file recording finished and failed chat IDs
+        """
+        if analyze_fn is None:
+            from metadata_utils import analyze_conversation
+            analyze_fn = analyze_conversation
+        self.db_path = db_path
+        self.analyze_fn = analyze_fn
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self) -> Dict:
+        """Load the checkpoint, or start a new one"""
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+            return {"done": checkpoint.get("done", []), "failed": checkpoint.get("failed", {})}
+        except FileNotFoundError:
+            return {"done": [], "failed": {}}
+        except Exception as e:
+            logger.warning("Could not load checkpoint %s: %s", self.checkpoint_path, e)
+            return {"done": [], "failed": {}}
+
+    def save_checkpoint(self):
+        """Write the checkpoint atomically so a crash can't leave it half-written"""
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**self.checkpoint, "updated": time.time()}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def reset_checkpoint(self):
+        self.checkpoint = {"done": [], "failed": {}}
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def collect(self, chat_type: Optional[str] = None, limit: Optional[int] = None, force: bool = False) -> List[Tuple[int, List[Dict]]]:
+        """
+        Find conversations that still need metadata
+
+        Args:
+            chat_type: Only collect this chat type
+            limit: Maximum number of conversations
+            force: Re-analyze conversations that already have metadata
+
+        Returns:
+            List of (chat_id, messages), newest first
+        """
+        done = set(self.checkpoint["done"])
+        query = "SELECT chat_id, conversation, metadata FROM conversations"
+        params = []
+        if chat_type:
+            query += " WHERE chat_type = ?"
+            params.append(chat_type)
+        query += " ORDER BY timestamp DESC"
+
+        pending = []
+        with sqlite3.connect(self.db_path) as conn:
+            for chat_id, conversation, metadata in conn.execute(query, params):
+                if chat_id in done or not (force or needs_metadata(metadata)):
+                    continue
+                try:
+                    messages = json.loads(conversation or "[]")
+                except json.JSONDecodeError:
+                    continue
+                if messages:
+                    pending.append((chat_id, messages))
+                if limit and len(pending) >= limit:
+                    break
+        return pending
+
+    def run(self, chat_type: Optional[str] = None, limit: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+        """
+        Analyze and store metadata for every pending conversation
+
+        Returns:
+            Dict[str, int]: Counts of pending, updated and failed conversations
+        """
+        pending = self.collect(chat_type, limit, force)
+        logger.info("Found %d conversations needing metadata", len(pending))
+        updated = failed = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                results = list(executor.map(self._analyze, batch))
+
+                succeeded = [(chat_id, metadata) for chat_id, metadata, _ in results if metadata]
+                self.write_results(succeeded)
+
+                for chat_id, metadata, error in results:
+                    if metadata:
+                        self.checkpoint["done"].append(chat_id)
+                        self.checkpoint["failed"].pop(str(chat_id), None)
+                    else:
+                        self.checkpoint["failed"][str(chat_id)] = error or "No metadata returned"
+                self.save_checkpoint()
+
+                updated += len(succeeded)
+                failed += len(results) - len(succeeded)
+                logger.info("Batch %d: %d/%d updated", start // self.batch_size + 1, len(succeeded), len(batch))
+
+        return {"pending": len(pending), "updated": updated, "failed": failed}
+
+    def write_results(self, results: List[Tuple[int, Dict]]):
+        """
+        Merge new metadata into conversations.metadata and refresh the FTS
+        topics/summary columns, all in one transaction
+        """
+        if not results:
+            return
+        with sqlite3.connect(self.db_path) as conn:
+            placeholders = ",".join("?" for _ in results)
+            chat_ids = [chat_id for chat_id, _ in results]
+            existing = dict(conn.execute(
+                f"SELECT chat_id, metadata FROM conversations WHERE chat_id IN ({placeholders})",
+                chat_ids
+            ).fetchall())
+            # chat_id is UNINDEXED in the FTS table, so each lookup by it scans
+            # the whole index: find the batch's rowids in one pass instead
+            fts_rowids = dict(conn.execute(
+                f"SELECT chat_id, rowid FROM conversation_fts WHERE chat_id IN ({placeholders})",
+                chat_ids
+            ).fetchall())
+
+            metadata_rows = []
+            fts_rows = []
+            for chat_id, metadata in results:
+                try:
+                    merged = json.loads(existing.get(chat_id) or "{}")
+                except json.JSONDecodeError:
+                    merged = {}
+                merged.update(metadata)
+                metadata_rows.append((json.dumps(merged), chat_id))
+                if chat_id in fts_rowids:
+                    fts_rows.append((" ".join(merged.get("topics", [])), merged.get("summary", ""), fts_rowids[chat_id]))
+
+            conn.executemany("UPDATE conversations SET metadata = ? WHERE chat_id = ?", metadata_rows)
+            conn.executemany("UPDATE conversation_fts SET topics = ?, summary = ? WHERE rowid = ?", fts_rows)
+
+    def _analyze(self, item: Tuple[int, List[Dict]]) -> Tuple[int, Optional[Dict], Optional[str]]:
+        chat_id, messages = item
+        try:
+            return chat_id, self.analyze_fn(messages), None
+        except Exception as e:
+            logger.error("Error analyzing conversation %s: %s", chat_id, e)
+            return chat_id, None, str(e)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description='Backfill conversation metadata in batches')
+    parser.add_argument('--db', default="chat_history.db", help='SQLite database path')
+    parser.add_argument('--type', help='Only process this chat type')
+    parser.add_argument('--limit', type=int, help='Maximum conversations to process')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Conversations per batch')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent analysis calls')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH, help='Checkpoint file')
+    parser.add_argument('--force', action='store_true', help='Re-analyze conversations that already have metadata')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+
+    args = parser.parse_args()
+
+    pipeline = BatchMetadataPipeline(
+        db_path=args.db,
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+        checkpoint_path=args.checkpoint
+    )
+    if args.restart:
+        pipeline.reset_checkpoint()
+
+    result = pipeline.run(chat_type=args.type, limit=args.limit, force=args.force)
+    print(f"Done: {result['updated']} updated, {result['failed']} failed of {result['pending']}")
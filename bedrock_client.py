@@ -7,16 +7,21 @@ Acts as a substitute for the Anthropic client with a compatible interface.
 
 import json
 import os
+import threading
 import time
 import boto3
 from typing import Dict, List, Any
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from datetime import datetime
+from prompt_cache import strip_cache_control
+from log_config import get_logger
 
 # Ensure environment variables are loaded
 load_dotenv()
 
+logger = get_logger(__name__)
+
 def get_aws_session():
     """Create and return an AWS session"""
     return boto3.Session(
@@ -25,8 +30,38 @@ def get_aws_session():
         region_name=os.getenv('AWS_REGION', 'us-east-1')
     )
 
-# Get AWS session
-aws_session = get_aws_session()
+# Shared AWS session, created on first use: building one resolves credentials
+# and loads botocore's data files
+_aws_session = None
+_aws_session_lock = threading.Lock()
+
+def get_shared_aws_session():
+    """Get the process-wide AWS session, creating it on first call"""
+    global _aws_session
+    if _aws_session is None:
+        with _aws_session_lock:
+            if _aws_session is None:
+                _aws_session = get_aws_session()
+    return _aws_session
+
+# Bedrock model ID prefixes that accept cache_control breakpoints
+PROMPT_CACHE_MODEL_PREFIXES = (
+    "anthropic.claude-3-5-haiku",
+    "anthropic.claude-3-7-sonnet",
+    "anthropic.claude-sonnet-4",
+    "anthropic.claude-opus-4"
+)
+
+def supports_prompt_cache(model):
+    """Check if a Bedrock model ID (or cross-region profile ID) supports prompt caching"""
+    if not model:
+        return False
+    # Cross-region inference profiles prefix the model ID with a region group
+    for region_group in ("us.", "eu.", "apac."):
+        if model.startswith(region_group):
+            model = model[len(region_group):]
+            break
+    return model.startswith(PROMPT_CACHE_MODEL_PREFIXES)
 
 class BedrockMessages:
     """
@@ -38,7 +73,7 @@ class BedrockMessages:
         """Initialize with a Bedrock client"""
         self.client = client
     
-    def create(self, max_tokens=256, messages=None, model=None, system=None, temperature=0.7):
+    def create(self, max_tokens=256, messages=None, model=None, system=None, temperature=0.7, stream=False):
         """
         Create a message using Amazon Bedrock Claude API
         
@@ -46,11 +81,14 @@ class BedrockMessages:
             max_tokens (int): Maximum tokens to generate
             messages (List[Dict]): List of message objects (role, content)
             model (str): Bedrock model ID to use
-            system (str): System prompt
+            system (str | List[Dict]): System prompt, either a string or text blocks
+                with cache_control breakpoints (see prompt_cache.build_system_blocks)
             temperature (float): Temperature for generation
+            stream (bool): Stream the response with invoke_model_with_response_stream
             
         Returns:
-            object: Response object with compatible interface
+            object: Response object with compatible interface, or a BedrockStream
+            of Anthropic-style events when stream is True
         """
         if not messages:
             messages = []
@@ -80,16 +118,20 @@ class BedrockMessages:
             "temperature": temperature
         }
         
-        # Add system prompt if provided
+        # Add system prompt if provided, dropping cache breakpoints the model can't use
         if system:
-            request_body["system"] = system
+            request_body["system"] = system if supports_prompt_cache(model) else strip_cache_control(system)
             
         # Convert to JSON
         request = json.dumps(request_body)
         
+        if stream:
+            return self._create_stream(model, request, len(filtered_messages))
+        
         try:
-            print(f"Calling Bedrock API with model: {model}")
-            print(f"Message count: {len(filtered_messages)}")
+            logger.debug("Calling Bedrock API", extra={
+                "model": model, "message_count": len(filtered_messages), "request_bytes": len(request)
+            })
             
             # Call Bedrock API
             response = self.client.invoke_model(
@@ -103,13 +145,71 @@ class BedrockMessages:
             # Create a response object with compatible interface to Anthropic's API
             return BedrockResponse(response_body)
             
-        except (ClientError, Exception) as e:
-            print(f"Error invoking Bedrock model: {e}")
-            # Return a minimal compatible response object
-            return BedrockResponse({
-                "content": [{"type": "text", "text": f"Error: {str(e)}"}]
+        except ClientError as e:
+            # Raised so callers (see resilience.py) can retry or fail over
+            logger.error("Error invoking Bedrock model: %s", e, extra={"model": model})
+            raise
+    
+    def _create_stream(self, model, request, message_count):
+        """Invoke the model with a streaming response"""
+        try:
+            logger.debug("Calling Bedrock streaming API", extra={
+                "model": model, "message_count": message_count, "request_bytes": len(request)
             })
             
+            response = self.client.invoke_model_with_response_stream(
+                modelId=model,
+                body=request
+            )
+            return BedrockStream(response["body"])
+            
+        except ClientError as e:
+            logger.error("Error invoking Bedrock model: %s", e, extra={"model": model})
+            raise
+            
+class BedrockStreamEvent:
+    """
+    A class to mimic the interface of Anthropic's streaming event objects
+    (event.type, event.delta.text, event.message.usage, ...)
+    """
+    
+    def __init__(self, data):
+        """Initialize with a decoded event dict, exposing keys as attributes"""
+        self.data = data
+        for key, value in data.items():
+            setattr(self, key, BedrockStreamEvent(value) if isinstance(value, dict) else value)
+    
+    def __repr__(self):
+        return f"BedrockStreamEvent({self.data!r})"
+            
+class BedrockStream:
+    """
+    Iterates the event stream returned by invoke_model_with_response_stream,
+    yielding Anthropic-compatible events (message_start, content_block_delta, ...)
+    """
+    
+    def __init__(self, event_stream):
+        """Initialize with the response body EventStream"""
+        self.event_stream = event_stream
+    
+    def __iter__(self):
+        for item in self.event_stream:
+            chunk = item.get("chunk")
+            if chunk is None:
+                # Bedrock reports mid-stream failures as exception events
+                error_type, details = next(iter(item.items()))
+                raise RuntimeError(f"Bedrock stream error ({error_type}): {details.get('message', details)}")
+            yield BedrockStreamEvent(json.loads(chunk["bytes"].decode("utf-8")))
+    
+    @property
+    def text_stream(self):
+        """Yield only the text deltas, like Anthropic's MessageStream.text_stream"""
+        for event in self:
+            if event.type == "content_block_delta":
+                text = getattr(event.delta, "text", None)
+                if text:
+                    yield text
+            
 class BedrockResponse:
     """
     A class to mimic the interface of Anthropic's response object
@@ -119,6 +219,7 @@ class BedrockResponse:
         """Initialize with Bedrock response data"""
         self.response_data = response_data
         self.content = self._extract_content()
+        self.usage = BedrockUsage(response_data.get("usage", {}))
     
     def _extract_content(self):
         """Extract content from Bedrock response in Anthropic-compatible format"""
@@ -128,6 +229,18 @@ class BedrockResponse:
         except (KeyError, IndexError):
             return [BedrockContent("Error extracting content from response")]
             
+class BedrockUsage:
+    """
+    A class to mimic the interface of Anthropic's usage object
+    """
+    
+    def __init__(self, usage_data):
+        """Initialize with the usage dict from a Bedrock response"""
+        self.input_tokens = usage_data.get("input_tokens", 0)
+        self.output_tokens = usage_data.get("output_tokens", 0)
+        self.cache_read_input_tokens = usage_data.get("cache_read_input_tokens", 0)
+        self.cache_creation_input_tokens = usage_data.get("cache_creation_input_tokens", 0)
+            
 class BedrockContent:
     """
     A class to mimic the interface of Anthropic's content object
@@ -142,19 +255,24 @@ class BedrockClient:
     A client for interacting with Amazon Bedrock with an interface compatible with Anthropic's client
     """
     
-    def __init__(self, api_key=None, region_name="us-east-1"):
+    def __init__(self, api_key=None, region_name="us-east-1", runtime_client=None):
         """
         Initialize the Bedrock client
         
         Args:
             api_key (str): Unused, for compatibility
             region_name (str): AWS region for Bedrock
+            runtime_client: Existing bedrock-runtime client to reuse (e.g. the
+                pooled one from provider_registry) instead of creating a new one
         """
         # AWS credentials are loaded from environment variables
-        self.aws_session = aws_session
-        self.client = self.aws_session.client("bedrock-runtime", region_name=region_name)
+        self.client = runtime_client or self.aws_session.client("bedrock-runtime", region_name=region_name)
         self.messages = BedrockMessages(self.client)
         
+    @property
+    def aws_session(self):
+        return get_shared_aws_session()
+        
     def get_available_models(self):
         """
         Get list of available Bedrock models
@@ -169,5 +287,5 @@ class BedrockClient:
             
             return [model.get("modelId") for model in models if model.get("modelId")]
         except Exception as e:
-            print(f"Error getting available models: {e}")
+            logger.error("Error getting available models: %s", e)
             return []
\ No newline at end of file
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Static Build Module
+
+Copies the files under static/ to static/dist/ with a content hash in each
+filename (css/chat.css -> css/chat.1a2b3c4d5e.css), writes gzip and brotli
+variants next to the text assets, and records the mapping in
+static/dist/manifest.json. Templates resolve asset paths through the manifest
+(see static_assets.asset_url), so hashed files can be cached forever and a
+deploy changes every URL whose content changed. The service worker is built
+with its cache version taken from the manifest.
+
+    python build_static.py
+"""
+
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict, Optional
+
+from log_config import configure_logging, get_logger
+
+STATIC_DIR = "static"
+STATIC_URL = "/static"
+DIST_DIRNAME = "dist"
+MANIFEST_FILENAME = "manifest.json"
+SERVICE_WORKER = "service-worker.js"
+
+logger = get_logger(__name__)
+
+# Paths (relative to static/) that keep their names: the service worker is
+# served from a fixed URL and the PWA manifest's icon paths are relative to it
+EXCLUDE_PATTERNS = [
+    f"{DIST_DIRNAME}/*",
+    SERVICE_WORKER,
+    "manifest.json",
+    "pico-main/scripts/*",
+    "*/postcss.config.js"
+]
+
+# Extensions worth compressing; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".json", ".svg", ".ico", ".html", ".txt", ".map"}
+
+# Assets every page loads, cached by the service worker when it installs
+PRECACHE_ASSETS = ["pico-main/css/pico.violet.min.css", "main.css", "css/chat.css", "js/chat.js"]
+
+HASH_LENGTH = 10
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(relative_path: str, digest: str) -> str:
+    """css/chat.css -> css/chat.<digest>.css"""
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+
+def is_excluded(relative_path: str) -> bool:
+    return any(fnmatch.fnmatch(relative_path, pattern) for pattern in EXCLUDE_PATTERNS)
+
+
+def write_compressed(path: str, data: bytes) -> Dict[str, int]:
+    """
+    Write .gz and .br variants of a file when they are smaller than the original
+
+    Brotli needs the `brotli` package; without it only gzip is written.
+
+    Returns:
+        Dict[str, int]: Size of each variant written, by encoding
+    """
+    sizes = {}
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(f"{path}.gz", "wb") as f:
+            f.write(compressed)
+        sizes["gzip"] = len(compressed)
+
+    try:
+        import brotli
+    except ImportError:
+        return sizes
+    compressed = brotli.compress(data, quality=11)
+    if len(compressed) < len(data):
+        with open(f"{path}.br", "wb") as f:
+            f.write(compressed)
+        sizes["br"] = len(compressed)
+    return sizes
+
+
+def build(static_dir: str = STATIC_DIR) -> Dict:
+    """
+    Build static/dist from static/
+
+    Args:
+        static_dir: Source directory; output goes to its dist/ subdirectory
+
+    Returns:
+        Dict: The manifest that was written
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    assets = {}
+    original_bytes = compressed_bytes = 0
+    for root, _, files in os.walk(static_dir):
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            relative_path = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            if is_excluded(relative_path):
+                continue
+
+            name = hashed_name(relative_path, file_hash(source))
+            target = os.path.join(dist_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            assets[relative_path] = name
+
+            if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                with open(source, "rb") as f:
+                    data = f.read()
+                sizes = write_compressed(target, data)
+                if sizes:
+                    original_bytes += len(data)
+                    compressed_bytes += min(sizes.values())
+
+    # The version changes whenever any asset does
+    version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    manifest = {"version": version, "assets": dict(sorted(assets.items()))}
+    with open(os.path.join(dist_dir, MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    build_service_worker(static_dir, manifest)
+
+    print(f"Built {len(assets)} assets into {dist_dir} (version {version})")
+    if original_bytes:
+        print(f"Compressed text assets: {original_bytes} -> {compressed_bytes} bytes")
+    return manifest
+
+
+def build_service_worker(static_dir: str, manifest: Dict) -> Optional[str]:
+    """
+    Write dist/service-worker.js with the cache version and precache list
+    filled in from the manifest
+
+    Returns:
+        str: Path of the built service worker, or None if there is no source
+    """
+    source = os.path.join(static_dir, SERVICE_WORKER)
+    if not os.path.exists(source):
+        return None
+    with open(source, "r") as f:
+        script = f.read()
+
+    precache = ["/"] + [
+        f"{STATIC_URL}/{DIST_DIRNAME}/{manifest['assets'][path]}"
+        for path in PRECACHE_ASSETS
+        if path in manifest["assets"]
+    ]
+    script = re.sub(r'var CACHE_VERSION = ".*?";', f'var CACHE_VERSION = "{manifest["version"]}";', script)
+    script = re.sub(r"var PRECACHE_URLS = \[.*?\];", f"var PRECACHE_URLS = {json.dumps(precache)};", script, flags=re.S)
+
+    target = os.path.join(static_dir, DIST_DIRNAME, SERVICE_WORKER)
+    with open(target, "w") as f:
+        f.write(script)
+    return target
+
+
+def load_manifest(static_dir: str = STATIC_DIR) -> Dict:
+    """Read the built manifest, or an empty one if the build hasn't run"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIRNAME, MANIFEST_FILENAME), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": "dev", "assets": {}}
+    except Exception as e:
+        logger.warning("Could not load static manifest: %s", e)
+        return {"version": "dev", "assets": {}}
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static assets')
+    parser.add_argument('--static-dir', default=STATIC_DIR, help='Static source directory')
+
+    args = parser.parse_args()
+    build(args.static_dir)
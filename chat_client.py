@@ -1,16 +1,25 @@
-import json
+import asyncio
+import threading
+import time
 from datetime import datetime
-import os
-import anthropic
 from sqlite_client import SQLiteClient
+from conversation_lock import ConversationLock
+from provider_registry import registry
+from memory_intent import is_memory_query
+from context_window import HistoryWindow, build_recalled_context, estimate_tokens
+from prompt_cache import build_system_blocks, usage_report, format_usage, system_text
+from telemetry import usage_tracker
+from metrics import metrics, persona_context, timed
+from log_config import get_logger
 from dotenv import load_dotenv
-import re
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger(__name__)
+
 class ChatClient:
-    def __init__(self, chat_type=None, model="claude-3-sonnet-20240229", system_prompt="", client_class=None):
+    def __init__(self, chat_type=None, model="claude-3-sonnet-20240229", system_prompt="", client_class=None, history_policy=None, recall_max_tokens=600, client=None, async_client=None, router=None, user_id="default", db_path="chat_history.db"):
         """
         Initialize a chat client.
         
@@ -19,71 +28,129 @@ class ChatClient:
             model (str): The model to use for chat
             system_prompt (str): System prompt to use for the conversation
             client_class: The client class to use (e.g., BedrockClient)
+            history_policy (dict): Sliding window settings (max_turns, max_tokens,
+                summary_chars). Older turns are summarized into the system prompt.
+                None sends the whole chat log on every turn.
+            recall_max_tokens (int): Estimated token budget for recalled conversations
+                added to a single request
+            client: Provider client to use (e.g. from provider_registry). Defaults to
+                the shared Anthropic client.
+            async_client: Async provider client used by asend_message
+            router (ModelRouter): Picks the model and provider per request. Without
+                one every request uses `model` on `client`.
+            user_id (str): Owner of this chat (e.g. a browser session). History is
+                loaded, saved and searched for this user only.
+            db_path (str): SQLite database holding the chat history
         """
         self.chat_type = chat_type
+        self.user_id = user_id
         self.chat_log = []
         self.chat_responses = []
+        # Newest messages-table row reflected in chat_log
+        self._last_message_id = 0
         self.model = model
         self.system_prompt = system_prompt
+        self.history_window = HistoryWindow.from_policy(history_policy)
+        self.recall_max_tokens = recall_max_tokens
+        
+        # Serializes whole turns on this conversation (thread or task)
+        self.lock = ConversationLock()
+        # Makes append-and-persist atomic, so saved rows follow chat_log order
+        self._log_lock = threading.Lock()
+        
+        # Prompt cache accounting: last request and running totals
+        self.last_usage = None
+        self.usage_totals = usage_report(None)
+        # Recalled context size of the last request built, for telemetry
+        self.last_recalled_bytes = 0
         
         # Initialize database
-        self.db = SQLiteClient()
+        self.db = SQLiteClient(db_path)
         
         # Load history if chat_type is specified
         if chat_type:
             self.load_chat_history()
             
         # Initialize client
-        if client_class:
+        if client:
+            self.client = client
+        elif client_class:
             self.client = client_class()
         else:
-            # Initialize Anthropic client
-            api_key = os.getenv('ANTHROPIC_API_KEY')
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-            self.client = anthropic.Anthropic(api_key=api_key)
+            # Use the process-wide Anthropic client
+            self.client = registry.get_client("anthropic")
+        self.async_client = async_client
+        self.router = router
             
     def load_chat_history(self):
         """Load chat history from SQLite"""
         try:
-            # Get the most recent conversation of this type
-            results = self.db.get_conversations_by_type(self.chat_type, limit=1)
-            if results:
-                conversation = results[0]
-                self.chat_log = conversation['conversation']
-                # Note: We don't store responses separately in SQLite
-                # They're part of the conversation
+            # History saved before the messages table existed lives in the latest snapshot
+            self.db.seed_messages(self.chat_type, self.user_id)
+            self.sync_history()
         except Exception as e:
-            print(f"Error loading chat history from SQLite: {e}")
+            logger.error("Error loading chat history from SQLite: %s", e)
+            
+    def sync_history(self):
+        """
+        Bring chat_log up to date with the messages table
+        
+        SQLite is authoritative: other workers may have added to (or cleared)
+        this conversation. Only rows newer than the last one seen are fetched,
+        so an up-to-date cache costs a couple of index seeks.
+        
+        Returns:
+            bool: True if chat_log changed
+        """
+        with self._log_lock:
+            return self._sync_history()
+            
+    def _sync_history(self):
+        """Apply new messages-table rows to chat_log (caller holds _log_lock)"""
+        update = self.db.get_messages_since(self.chat_type, self.user_id, self._last_message_id)
+        self._last_message_id = update["last_id"]
+        if update["cleared"]:
+            self.chat_log = []
+            self.chat_responses = []
+            if self.history_window:
+                self.history_window.reset()
+        self.chat_log.extend(update["messages"])
+        return update["cleared"] or bool(update["messages"])
+            
+    def get_recent_messages(self, count=2):
+        """
+        Get the most recent messages of the conversation
+        
+        Args:
+            count (int): Number of messages to return
+            
+        Returns:
+            list: Up to `count` messages, oldest first
+        """
+        if self.chat_type:
+            self.sync_history()
+        with self._log_lock:
+            return list(self.chat_log[-count:]) if count > 0 else []
             
     def send_message(self, user_input, max_tokens=1024, temperature=0.7):
         """Send a message and get a response"""
-        # Check if this is a memory query
-        if self.is_memory_query(user_input):
-            # Search for relevant conversations
-            relevant_conversations = self.search_relevant_conversations(user_input)
-            if relevant_conversations:
-                # Add relevant conversations to context
-                self.add_relevant_context(relevant_conversations)
+        # One turn at a time per conversation, so user/assistant pairs stay in order
+        with persona_context(self.chat_type), timed("chat.turn"), self.lock:
+            return self._send_message(user_input, max_tokens, temperature)
             
-        # Add user message to chat log
-        self.add_message("user", user_input)
+    def _send_message(self, user_input, max_tokens, temperature):
+        """Run one turn (caller holds self.lock)"""
+        request = self.prepare_request(user_input, max_tokens, temperature)
+        client, _, _ = self.route_request(user_input, request)
         
         try:
             # Send to Anthropic
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system=self.system_prompt,
-                messages=[
-                    {"role": msg["role"], "content": msg["content"]} 
-                    for msg in self.chat_log
-                ]
-            )
+            with timed("provider.create"):
+                response = client.messages.create(**request)
             
             # Get the response text
             assistant_message = response.content[0].text
+            self.record_usage(usage_report(getattr(response, "usage", None)), request, assistant_message)
             
             # Add to chat log
             self.add_message("assistant", assistant_message)
@@ -91,64 +158,271 @@ class ChatClient:
             return assistant_message
             
         except Exception as e:
-            print(f"Error sending message: {e}")
-            return str(e)
+            # Surface provider failures to the caller instead of replying with them
+            logger.error("Error sending message: %s", e)
+            raise
+            
+    async def asend_message(self, user_input, max_tokens=1024, temperature=0.7):
+        """
+        Send a message and get a response without blocking the event loop
+        
+        Uses async_client when set; otherwise runs the turn in a worker thread.
+        Waiting for the conversation lock doesn't tie up a thread.
+        """
+        with persona_context(self.chat_type), timed("chat.turn"):
+            async with self.lock:
+                return await self._asend_message(user_input, max_tokens, temperature)
+            
+    async def _asend_message(self, user_input, max_tokens, temperature):
+        """Run one turn without blocking the event loop (caller holds self.lock)"""
+        if not self.async_client and not self.router:
+            return await asyncio.to_thread(self._send_message, user_input, max_tokens, temperature)
+        
+        # SQLite reads and writes stay off the event loop
+        request = await asyncio.to_thread(self.prepare_request, user_input, max_tokens, temperature)
+        _, async_client, _ = self.route_request(user_input, request)
+        
+        try:
+            with timed("provider.create"):
+                response = await async_client.messages.create(**request)
+            assistant_message = response.content[0].text
+            self.record_usage(usage_report(getattr(response, "usage", None)), request, assistant_message)
+            await asyncio.to_thread(self.add_message, "assistant", assistant_message)
+            return assistant_message
+            
+        except Exception as e:
+            logger.error("Error sending message: %s", e)
+            raise
+            
+    def stream_message(self, user_input, max_tokens=1024, temperature=0.7):
+        """
+        Send a message and yield the response text as it arrives
+        
+        The assistant message is added to the chat log (and saved) once the
+        stream ends. If the consumer stops early, the text received so far is
+        saved. If the provider fails mid-stream, the partial text is dropped (as
+        with a failed send_message) and the error propagates.
+        
+        Yields:
+            str: Chunks of the assistant's response
+        """
+        # The lock is held until the stream ends or the consumer closes it
+        with self.lock:
+            yield from self._stream_message(user_input, max_tokens, temperature)
+            
+    def _stream_message(self, user_input, max_tokens, temperature):
+        """Stream one turn (caller holds self.lock)"""
+        # The persona context is only set around code that doesn't yield: the
+        # consumer may resume this generator from another thread's context
+        turn_started = time.perf_counter()
+        with persona_context(self.chat_type):
+            request = self.prepare_request(user_input, max_tokens, temperature)
+        client, _, _ = self.route_request(user_input, request)
+        
+        if not getattr(client, "supports_streaming", True):
+            # Provider can't stream: deliver the whole reply as a single chunk
+            with persona_context(self.chat_type):
+                with timed("provider.create"):
+                    response = client.messages.create(**request)
+                assistant_message = response.content[0].text
+                self.record_usage(usage_report(getattr(response, "usage", None)), request, assistant_message)
+                self.add_message("assistant", assistant_message)
+            metrics.observe("chat.turn", time.perf_counter() - turn_started, self.chat_type)
+            yield assistant_message
+            return
+        
+        chunks = []
+        usage = None
+        started = time.monotonic()
+        failed = True
+        try:
+            stream = client.messages.create(stream=True, **request)
+            for event in stream:
+                if event.type == "content_block_delta":
+                    text = getattr(event.delta, "text", None)
+                    if text:
+                        if not chunks:
+                            metrics.observe("provider.first_token", time.monotonic() - started, self.chat_type)
+                        chunks.append(text)
+                        yield text
+                elif event.type == "message_start":
+                    # Input and cache token counts arrive with the first event
+                    usage = usage_report(getattr(event.message, "usage", None))
+                elif event.type == "message_delta" and usage is not None:
+                    output_tokens = getattr(getattr(event, "usage", None), "output_tokens", None)
+                    if output_tokens:
+                        usage["output_tokens"] = output_tokens
+            failed = False
+        except GeneratorExit:
+            # The consumer stopped reading (e.g. the client disconnected)
+            failed = False
+            raise
+        finally:
+            metrics.observe("provider.stream", time.monotonic() - started, self.chat_type, failed)
+            with persona_context(self.chat_type):
+                if usage is not None or chunks:
+                    self.record_usage(usage, request, "".join(chunks))
+                if chunks and not failed:
+                    self.add_message("assistant", "".join(chunks))
+                elif chunks:
+                    logger.warning("[%s] Stream failed after %d chunks; partial reply not saved", self.chat_type, len(chunks))
+            metrics.observe("chat.turn", time.perf_counter() - turn_started, self.chat_type, failed)
+            
+    def route_request(self, user_input, request):
+        """
+        Choose the model and provider for a prepared request
+        
+        Sets request["model"] when a router is configured. Note that switching
+        models between turns starts a new prompt cache for that model.
+        
+        Returns:
+            tuple: (client, async_client, route); route is None without a router
+        """
+        if not self.router:
+            return self.client, self.async_client, None
+        
+        context_tokens = estimate_tokens(system_text(request.get("system"))) + sum(
+            estimate_tokens(msg["content"]) for msg in request["messages"]
+        )
+        route = self.router.route(self.chat_type, user_input, context_tokens, request["max_tokens"])
+        request["model"] = route.model
+        client, async_client = self.router.clients_for(route.provider)
+        return client, async_client, route
+        
+    def prepare_request(self, user_input, max_tokens, temperature):
+        """
+        Record the user's message and build the arguments for messages.create
+        
+        Args:
+            user_input (str): The user's message
+            max_tokens (int): Maximum tokens to generate
+            temperature (float): Temperature for generation
             
+        Returns:
+            dict: Keyword arguments for the provider's messages.create
+        """
+        # Check if this is a memory query
+        relevant_conversations = []
+        if self.is_memory_query(user_input):
+            # Search for relevant conversations
+            relevant_conversations = self.search_relevant_conversations(user_input)
+            
+        # Add user message to chat log
+        self.add_message("user", user_input)
+        
+        # Recalled conversations only go into this request, never the chat log
+        messages, system_prompt = self.build_context(relevant_conversations)
+        
+        request = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [
+                {"role": msg["role"], "content": msg["content"]} 
+                for msg in messages
+            ]
+        }
+        if system_prompt:
+            request["system"] = system_prompt
+        return request
+            
+    def build_context(self, relevant_conversations=None):
+        """
+        Get the messages and system prompt to send for the next request
+        
+        Args:
+            relevant_conversations (list): Recalled conversations to include in
+                this request only
+        
+        Returns:
+            tuple: (messages, system_blocks). With a history window, only the
+            recent turns are returned and older ones are summarized into the
+            system prompt. Recalled conversations are added to the system prompt,
+            capped at recall_max_tokens and skipping messages already sent.
+            The system prompt is a list of blocks: only the persona ends in a
+            cache breakpoint, the rolling summary and recalled context are
+            never cached.
+        """
+        messages = self.chat_log
+        summary = None
+        recalled = None
+        
+        if self.history_window:
+            with timed("history.summarize"):
+                older, messages = self.history_window.split(self.chat_log)
+                summary = self.history_window.summarize(older)
+        
+        if relevant_conversations:
+            recalled = build_recalled_context(
+                relevant_conversations, messages, max_tokens=self.recall_max_tokens
+            )
+        
+        # Telemetry can't tell the uncached summary and recalled blocks apart
+        self.last_recalled_bytes = len((recalled or "").encode("utf-8"))
+        return messages, build_system_blocks(self.system_prompt, request_context=recalled, summary=summary)
+        
+    def record_usage(self, report, request=None, reply=None):
+        """
+        Record token counts and payload sizes for a request
+        
+        Args:
+            report (dict): usage_report of the response, or None if the provider
+                didn't report usage (tokens are then estimated)
+            request (dict): The messages.create arguments that were sent
+            reply (str): The assistant's reply text
+        """
+        if request is not None:
+            usage_tracker.record(self.chat_type, request, report, reply, recalled_bytes=self.last_recalled_bytes)
+        if report is None:
+            return
+        self.last_usage = report
+        for key, value in report.items():
+            self.usage_totals[key] = self.usage_totals.get(key, 0) + value
+        logger.info("[%s] %s", self.chat_type or 'chat', format_usage(report), extra=report)
+        
     def is_memory_query(self, message):
         """Check if the message is asking about previous conversations"""
-        memory_phrases = [
-            r"remember when",
-            r"remember talking about",
-            r"we discussed",
-            r"we talked about",
-            r"previous conversation",
-            r"earlier we",
-            r"before we"
-        ]
-        return any(re.search(phrase, message.lower()) for phrase in memory_phrases)
+        return is_memory_query(message)
         
     def search_relevant_conversations(self, query):
         """Search for conversations relevant to the query"""
         try:
             # Use the SQLite client's search functionality
-            results = self.db.search_conversations(query, self.chat_type, limit=3)
+            results = self.db.search_conversations(query, self.chat_type, limit=3, user_id=self.user_id)
             return results
         except Exception as e:
-            print(f"Error searching conversations: {e}")
+            logger.error("Error searching conversations: %s", e)
             return []
             
-    def add_relevant_context(self, conversations):
-        """Add relevant conversations to the chat context"""
-        # Add a separator
-        self.chat_log.append({
-            "role": "assistant",
-            "content": "Let me recall our previous relevant conversations about this topic:",
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Add each relevant conversation
-        for conv in conversations:
-            # Add conversation messages
-            self.chat_log.extend(conv['conversation'])
-            
-        # Add a closing separator
-        self.chat_log.append({
-            "role": "assistant",
-            "content": "That was what we discussed before. Let me address your current question.",
-            "timestamp": datetime.now().isoformat()
-        })
-        
     def add_message(self, role, content):
-        """Add a message to the chat log"""
+        """
+        Add a message to the chat log and save it, as one atomic step
+        
+        The message is appended to the messages table first and chat_log is
+        then synced from it, which also picks up anything other workers
+        appended, so every worker sees the same order.
+        """
         message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
         }
-        self.chat_log.append(message)
-        
-        # Save history to SQLite if chat_type is specified
-        if self.chat_type:
+        with self._log_lock:
+            if not self.chat_type:
+                self.chat_log.append(message)
+                return
+            
+            if self.db.append_message(self.chat_type, self.user_id, message) is None:
+                # Keep the conversation going in memory if the write failed
+                self.chat_log.append(message)
+            else:
+                try:
+                    self._sync_history()
+                except Exception as e:
+                    logger.error("Error syncing chat history from SQLite: %s", e)
+                    self.chat_log.append(message)
+            
+            # Save a searchable snapshot for conversation recall
             self.save_chat_history()
             
     def add_response(self, response):
@@ -160,15 +434,17 @@ class ChatClient:
             self.save_chat_history()
             
     def clear_history(self):
-        """Clear the chat history"""
-        self.chat_log = []
-        self.chat_responses = []
-        
-        # Clear history from SQLite if chat_type is specified
-        if self.chat_type:
-            # Note: We don't actually delete from SQLite, we just clear the local state
-            # If you want to delete from SQLite, you'll need to implement that in SQLiteClient
-            pass
+        """Clear the chat history, for every worker sharing the database"""
+        with self._log_lock:
+            self.chat_log = []
+            self.chat_responses = []
+            if self.history_window:
+                self.history_window.reset()
+            
+            # Saved snapshots are kept for recall; the clear marker makes every
+            # worker (and the next load) start this conversation afresh
+            if self.chat_type:
+                self._last_message_id = self.db.clear_messages(self.chat_type, self.user_id) or self._last_message_id
             
     def save_chat_history(self):
         """Save chat history to SQLite"""
@@ -176,8 +452,8 @@ class ChatClient:
             # Save chat log to SQLite
             conversation = {
                 "chat_type": self.chat_type,
-                "user_id": "default",  # You might want to make this configurable
-                "conversation": self.chat_log,
+                "user_id": self.user_id,
+                "conversation": list(self.chat_log),
                 "metadata": {
                     "summary": "Chat history",
                     "topics": [],
@@ -187,4 +463,4 @@ class ChatClient:
             }
             self.db.save_conversation(conversation)
         except Exception as e:
-            print(f"Error saving chat history to SQLite: {e}")
\ No newline at end of file
+            logger.error("Error saving chat history to SQLite: %s", e)
\ No newline at end of file
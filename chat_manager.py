@@ -6,12 +6,18 @@ Provides a single interface for initializing, accessing, and manipulating chat c
 Uses SQLite for persistent storage.
 """
 
+import asyncio
 import os
+import threading
+import time
 from chat_client import ChatClient
-from bedrock_client import BedrockClient
+from model_router import ModelRouter
+from session_store import SessionStore, DEFAULT_SESSION
 import json
 from sqlite_client import SQLiteClient
-from memory_manager import MemoryManager
+from log_config import get_logger
+
+logger = get_logger(__name__)
 
 # System prompts for each chat persona
 SYSTEM_PROMPTS = {
@@ -66,68 +72,182 @@ SYSTEM_PROMPTS = {
                 'Never break character or mention technical terms like "conversation history" or "previous discussions."')
 }
 
+# Sliding window policy for each persona: the last `max_turns` user turns (within
+# an estimated `max_tokens` budget) are sent verbatim; older turns are folded into
+# a rolling summary of at most `summary_chars` characters in the system prompt.
+# Set a persona to None to send its whole history on every turn.
+HISTORY_POLICIES = {
+    "ocean": {"max_turns": 8, "max_tokens": 4000, "summary_chars": 1500},
+    "vampire": {"max_turns": 12, "max_tokens": 8000, "summary_chars": 2500},
+    "mkm": {"max_turns": 10, "max_tokens": 8000, "summary_chars": 2000},
+    "claude": {"max_turns": 10, "max_tokens": 6000, "summary_chars": 2000},
+    "bedrock": {"max_turns": 10, "max_tokens": 6000, "summary_chars": 2000}
+}
+
+# Model routing policy for each persona (see model_router.DEFAULT_POLICY for the
+# keys). Short turns always go to the first, lightest model; long messages may
+# use a heavier one when its p95 latency and estimated cost fit the budget.
+ROUTING_POLICIES = {
+    "ocean": {"heavy_min_tokens": 150, "latency_budget_ms": 12000},
+    "vampire": {"heavy_min_tokens": 150, "latency_budget_ms": 15000},
+    "mkm": {"heavy_min_tokens": 200, "latency_budget_ms": 20000},
+    "claude": {"heavy_min_tokens": 300, "latency_budget_ms": 10000},
+    "bedrock": {"providers": ["bedrock", "anthropic"], "heavy_min_tokens": 300, "latency_budget_ms": 10000}
+}
+
+# Messages per page of history served to the web UI
+HISTORY_PAGE_SIZE = 30
+MAX_HISTORY_PAGE_SIZE = 100
+
 class ChatManager:
     """
     Singleton class to manage all chat clients in the application
     Uses SQLite for persistent storage
+    
+    Each browser session gets its own chat state per persona, held in a bounded
+    LRU (see session_store.py). Callers without a session share DEFAULT_SESSION.
+    
+    Set LLM_PROVIDER=fake to run every persona against the local fakes in
+    fake_provider.py instead of Anthropic and Bedrock.
+    
+    Nothing expensive happens at import: chat clients, provider clients, AWS
+    sessions and spaCy are created on first use. Call warmup() to pay those
+    costs up front instead of on the first request.
     """
     _instance = None
+    _instance_lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ChatManager, cls).__new__(cls)
-        return cls._instance
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ChatManager, cls).__new__(cls)
+            return cls._instance
     
     def __init__(self):
-        if not hasattr(self, 'initialized'):
-            self.clients = {}
-            self.db = SQLiteClient()
-            self.memory_manager = MemoryManager()
-            self._initialize_clients()
+        # Two threads constructing the singleton at once must not both initialize it
+        with self._instance_lock:
+            if hasattr(self, 'initialized'):
+                return
+            self._db = None
+            self._memory_manager = None
+            self.router = ModelRouter(ROUTING_POLICIES)
+            # Live chat state per (session, persona), rehydrated from SQLite on a miss
+            self.sessions = SessionStore(self._create_client, is_busy=lambda client: client.lock.locked())
             self.initialized = True
     
-    def _initialize_clients(self):
-        """Initialize chat clients for each persona"""
-        for chat_type, system_prompt in SYSTEM_PROMPTS.items():
-            if chat_type == 'bedrock':
-                # Use BedrockClient for bedrock chat type
-                self.clients[chat_type] = ChatClient(
-                    model='anthropic.claude-3-haiku-20240307-v1:0',
-                    system_prompt=system_prompt,
-                    chat_type=chat_type,
-                    client_class=BedrockClient
-                )
-            else:
-                # Use regular ChatClient for other chat types
-                self.clients[chat_type] = ChatClient(
-                    model='claude-3-haiku-20240307',
-                    system_prompt=system_prompt,
-                    chat_type=chat_type
-                )
-    
-    def get_client(self, client_type):
-        """Get a chat client by type"""
-        if client_type not in self.clients:
+    @property
+    def db(self):
+        """The shared SQLiteClient, created on first use"""
+        if self._db is None:
+            self._db = SQLiteClient()
+        return self._db
+    
+    @property
+    def memory_manager(self):
+        """The shared MemoryManager, created on first use (it imports spaCy)"""
+        if self._memory_manager is None:
+            with self._instance_lock:
+                if self._memory_manager is None:
+                    from memory_manager import MemoryManager
+                    self._memory_manager = MemoryManager()
+        return self._memory_manager
+    
+    def warmup(self, personas=None, session_id=DEFAULT_SESSION, memory=False):
+        """
+        Create clients ahead of the first request
+        
+        Args:
+            personas (list): Personas whose chat clients to load (default: all)
+            session_id (str): Session to load them for
+            memory (bool): Also load the MemoryManager and its spaCy model
+        
+        Returns:
+            dict: Seconds spent per step
+        """
+        timings = {}
+        for chat_type in personas or SYSTEM_PROMPTS:
+            started = time.perf_counter()
+            self.get_client(chat_type, session_id)
+            timings[chat_type] = round(time.perf_counter() - started, 3)
+        if memory:
+            started = time.perf_counter()
+            self.memory_manager.nlp
+            timings["memory"] = round(time.perf_counter() - started, 3)
+        logger.info("Warmed up: %s", timings)
+        return timings
+    
+    def _create_client(self, session_id, chat_type):
+        """Create the chat client for one session and persona, loading its saved history"""
+        # The router picks the model and provider per request; the persona's
+        # preferred provider is the fallback when routing isn't used
+        provider = ROUTING_POLICIES.get(chat_type, {}).get("providers", ["anthropic"])[0]
+        client, async_client = self.router.clients_for(provider)
+        return ChatClient(
+            model='claude-3-haiku-20240307',
+            system_prompt=SYSTEM_PROMPTS[chat_type],
+            chat_type=chat_type,
+            client=client,
+            async_client=async_client,
+            history_policy=HISTORY_POLICIES.get(chat_type),
+            router=self.router,
+            user_id=session_id
+        )
+    
+    def get_client(self, client_type, session_id=DEFAULT_SESSION):
+        """Get a session's chat client by type"""
+        if client_type not in SYSTEM_PROMPTS:
             raise ValueError(f"Unknown client type: {client_type}")
-        return self.clients[client_type]
+        return self.sessions.get(session_id, client_type)
     
-    def send_message(self, client_type, user_input, max_tokens=1024, temperature=0.75, use_memory=True):
+    def send_message(self, client_type, user_input, max_tokens=1024, temperature=0.75, use_memory=True, session_id=DEFAULT_SESSION):
         """Send a message to a specific chat client"""
-        client = self.get_client(client_type)
+        client = self.get_client(client_type, session_id)
         return client.send_message(user_input, max_tokens, temperature)
     
-    def get_recent_messages(self, client_type, count=2):
+    async def asend_message(self, client_type, user_input, max_tokens=1024, temperature=0.75, session_id=DEFAULT_SESSION):
+        """Send a message to a specific chat client without blocking the event loop"""
+        # A miss rehydrates from SQLite, so look the client up off the event loop
+        client = await asyncio.to_thread(self.get_client, client_type, session_id)
+        return await client.asend_message(user_input, max_tokens, temperature)
+    
+    def stream_message(self, client_type, user_input, max_tokens=1024, temperature=0.75, session_id=DEFAULT_SESSION):
+        """Send a message to a specific chat client and yield the response as it streams"""
+        client = self.get_client(client_type, session_id)
+        return client.stream_message(user_input, max_tokens, temperature)
+    
+    def get_recent_messages(self, client_type, count=2, session_id=DEFAULT_SESSION):
         """Get recent messages for a specific chat client"""
-        client = self.get_client(client_type)
+        client = self.get_client(client_type, session_id)
         return client.get_recent_messages(count)
     
-    def clear_history(self, client_type=None):
-        """Clear chat history for a specific client or all clients"""
+    def get_history(self, client_type, before=None, limit=HISTORY_PAGE_SIZE, session_id=DEFAULT_SESSION):
+        """
+        Get one page of a session's stored messages for a persona
+        
+        Reads SQLite directly, so paging through history doesn't load the whole
+        conversation into a chat client.
+        
+        Args:
+            before (int): Message id to page back from (None for the latest page)
+            limit (int): Page size, capped at MAX_HISTORY_PAGE_SIZE
+        
+        Returns:
+            dict: "messages" (oldest first) and "next_before" (None at the start)
+        """
+        if client_type not in SYSTEM_PROMPTS:
+            raise ValueError(f"Unknown client type: {client_type}")
+        # History saved before the messages table existed is copied over once
+        self.db.seed_messages(client_type, session_id)
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        return self.db.get_messages_page(client_type, session_id, before, limit)
+    
+    def clear_history(self, client_type=None, session_id=DEFAULT_SESSION):
+        """Clear a session's chat history for a specific client or all of its clients"""
         if client_type:
-            client = self.get_client(client_type)
+            client = self.get_client(client_type, session_id)
             client.clear_history()
         else:
-            for client in self.clients.values():
+            for client in self.sessions.session_values(session_id):
                 client.clear_history()
     
     def get_last_conversation_summary(self):
@@ -152,7 +272,7 @@ class ChatManager:
             return None
             
         except Exception as e:
-            print(f"Error getting last conversation summary: {e}")
+            logger.error("Error getting last conversation summary: %s", e)
             return None
 
 # Create an instance for import
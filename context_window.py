@@ -0,0 +1,180 @@
+"""
+Context Window Module
+
+Keeps the request sent to the model bounded as a chat grows: the most recent
+turns are sent verbatim and older turns are folded into a cached rolling
+summary that goes into the system prompt. Recalled conversations are rendered
+as size-capped, per-request context rather than being added to the chat log.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# Rough characters-per-token ratio for English text with Claude's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a string without calling the API"""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _first_sentence(text: str, limit: int) -> str:
+    """Return the first sentence of text, truncated to limit characters"""
+    text = " ".join((text or "").split())
+    for end in (". ", "? ", "! ", "\n"):
+        index = text.find(end)
+        if 0 < index < limit:
+            return text[:index + 1]
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+class HistoryWindow:
+    """
+    Splits a chat log into an older part (summarized) and a recent part (verbatim).
+
+    The summary of the older part is built incrementally: when the window slides
+    forward only the newly overflowed messages are folded in.
+    """
+
+    def __init__(
+        self,
+        max_turns: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        summary_chars: int = 1500,
+        line_chars: int = 160
+    ):
+        """
+        Initialize the window
+
+        Args:
+            max_turns (int): Number of most recent user turns to send verbatim
+            max_tokens (int): Estimated token budget for the verbatim messages
+            summary_chars (int): Maximum length of the rolling summary
+            line_chars (int): Maximum length of each summarized message
+        """
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summary_chars = summary_chars
+        self.line_chars = line_chars
+        self._summary_lines: List[str] = []
+        self._folded = 0
+        self._last_folded_content = None
+
+    @classmethod
+    def from_policy(cls, policy: Optional[Dict]) -> Optional["HistoryWindow"]:
+        """Build a window from a persona history policy, or None to send everything"""
+        if not policy or not (policy.get("max_turns") or policy.get("max_tokens")):
+            return None
+        return cls(**policy)
+
+    def split(self, messages: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split messages into (older, recent).
+
+        The recent part always starts on a user message and always contains the
+        latest user turn, even if that turn alone exceeds the token budget.
+        """
+        start = len(messages)
+        turns = 0
+        tokens = 0
+
+        for index in range(len(messages) - 1, -1, -1):
+            tokens += estimate_tokens(messages[index].get("content", ""))
+            if self.max_tokens and tokens > self.max_tokens and turns > 0:
+                break
+            if messages[index].get("role") == "user":
+                turns += 1
+                start = index
+                if self.max_turns and turns >= self.max_turns:
+                    break
+
+        return messages[:start], messages[start:]
+
+    def summarize(self, older: List[Dict]) -> str:
+        """Return the rolling summary of the older messages, updating it incrementally"""
+        if not older:
+            return ""
+
+        # Start over if the log no longer extends the one already folded in
+        if (self._folded > len(older) or
+                (self._folded and older[self._folded - 1].get("content") != self._last_folded_content)):
+            self._summary_lines = []
+            self._folded = 0
+
+        for msg in older[self._folded:]:
+            content = msg.get("content", "")
+            if not content:
+                continue
+            speaker = "The user said" if msg.get("role") == "user" else "You replied"
+            self._summary_lines.append(f"- {speaker}: {_first_sentence(content, self.line_chars)}")
+
+        self._folded = len(older)
+        self._last_folded_content = older[-1].get("content")
+
+        # Keep the newest lines that fit in the summary budget
+        while len(self._summary_lines) > 1 and sum(len(line) + 1 for line in self._summary_lines) > self.summary_chars:
+            self._summary_lines.pop(0)
+
+        return "Earlier in this conversation:\n" + "\n".join(self._summary_lines)
+
+    def reset(self):
+        """Forget the cached summary"""
+        self._summary_lines = []
+        self._folded = 0
+        self._last_folded_content = None
+
+
+def build_recalled_context(
+    conversations: List[Dict],
+    window: List[Dict],
+    max_tokens: int = 600,
+    line_chars: int = 300
+) -> str:
+    """
+    Render recalled conversations as ephemeral context for a single request.
+
+    Messages already present in the window, and messages repeated across the
+    recalled conversations, are skipped. Rendering stops once the estimated
+    token budget is used up. The result is meant for the system prompt of one
+    request and must not be written back to the chat log.
+
+    Args:
+        conversations (List[Dict]): Conversations returned by a memory search
+        window (List[Dict]): Messages being sent verbatim with this request
+        max_tokens (int): Estimated token budget for the recalled context
+        line_chars (int): Maximum length of each recalled message
+
+    Returns:
+        str: Context block, or an empty string if nothing new was recalled
+    """
+    seen = {msg.get("content") for msg in window}
+    recalled = [
+        msg for conversation in conversations or []
+        for msg in conversation.get("conversation", [])
+    ]
+    lines = []
+    used = 0
+
+    for msg in recalled:
+        content = msg.get("content")
+        if not content or content in seen:
+            continue
+        seen.add(content)
+
+        speaker = "The user said" if msg.get("role") == "user" else "You replied"
+        text = " ".join(content.split())
+        if len(text) > line_chars:
+            text = text[:line_chars].rstrip() + "..."
+        line = f"- {speaker}: {text}"
+
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+
+    if not lines:
+        return ""
+    return "Relevant moments from earlier conversations:\n" + "\n".join(lines)
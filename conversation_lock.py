@@ -0,0 +1,114 @@
+"""
+Conversation Lock Module
+
+A lock that serializes turns on one conversation whether they arrive on
+worker threads (`with lock:`) or on the event loop (`async with lock:`).
+Async waiters don't occupy a thread while they wait: they park on a future
+that the releasing side wakes, so thousands of queued turns can't starve the
+thread pool that the turns themselves need.
+
+SharedSemaphore is the same mechanism with more than one slot; the provider
+registry uses one per provider so sync and async calls share a single cap.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+
+class SharedSemaphore:
+    """
+    Semaphore usable from threads (`with`) and coroutines (`async with`).
+
+    Any thread may release a slot, and the next async waiter is woken on its
+    own event loop.
+    """
+
+    def __init__(self, value: int = 1):
+        self._lock = threading.Lock() if value == 1 else threading.BoundedSemaphore(value)
+        self._waiters = deque()
+        self._waiters_lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        # Semaphores take None rather than -1 for "no timeout"
+        if not blocking or timeout < 0:
+            return self._lock.acquire(blocking)
+        return self._lock.acquire(True, timeout)
+
+    def release(self):
+        self._lock.release()
+        self._wake_one()
+
+    async def acquire_async(self):
+        """Acquire without blocking the event loop or a worker thread"""
+        loop = asyncio.get_running_loop()
+        while not self._lock.acquire(blocking=False):
+            waiter = loop.create_future()
+            with self._waiters_lock:
+                self._waiters.append((loop, waiter))
+            # The holder may have released before we registered
+            if self._lock.acquire(blocking=False):
+                self._forget(loop, waiter)
+                return
+            try:
+                await waiter
+            except BaseException:
+                if not self._forget(loop, waiter):
+                    # A release picked this waiter before it was cancelled:
+                    # pass the wakeup on, or the next waiter would never run
+                    self._wake_one()
+                raise
+            self._forget(loop, waiter)
+
+    def _forget(self, loop, waiter) -> bool:
+        """Take a waiter off the queue; False if _wake_one already took it"""
+        with self._waiters_lock:
+            try:
+                self._waiters.remove((loop, waiter))
+                return True
+            except ValueError:
+                return False
+
+    def _wake_one(self):
+        """Wake the oldest async waiter that is still waiting"""
+        with self._waiters_lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if not waiter.done():
+                    loop.call_soon_threadsafe(self._set_waiter, waiter)
+                    return
+
+    @staticmethod
+    def _set_waiter(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class ConversationLock(SharedSemaphore):
+    """
+    Non-reentrant lock usable from threads and coroutines.
+
+    Backed by a threading.Lock, which any thread may release; a streaming
+    generator can therefore hold it across yields that resume on different
+    worker threads.
+    """
+
+    def __init__(self):
+        super().__init__(1)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
@@ -0,0 +1,537 @@
+"""
+Fake Provider Module
+
+A local stand-in for the Anthropic and Bedrock APIs so the whole stack can run
+and be benchmarked without credentials. Replies are deterministic filler text,
+paced by a configurable latency distribution and token rate, with optional
+error injection.
+
+Two ways to use it:
+- In process: set LLM_PROVIDER=fake and provider_registry hands out
+  FakeAnthropic / FakeBedrockRuntime instead of the real clients.
+- Over HTTP: run `python fake_provider.py --port 8089`, then point the real
+  SDKs at it with ANTHROPIC_BASE_URL=http://localhost:8089 and
+  BEDROCK_ENDPOINT_URL=http://localhost:8089 (any API key / AWS keys work).
+
+Settings come from arguments or the environment:
+    FAKE_LLM_LATENCY      time to first token, e.g. "fixed:0.2", "uniform:0.1:0.5",
+                          "normal:0.4:0.1" or "lognormal:0.4:0.5" (median, sigma)
+    FAKE_LLM_TPS          output tokens per second (0 = instant)
+    FAKE_LLM_REPLY_TOKENS words in each reply (capped by max_tokens)
+    FAKE_LLM_ERROR_RATE   fraction of requests that fail
+    FAKE_LLM_ERROR_STATUS HTTP status of injected failures (529 = overloaded)
+    FAKE_LLM_SEED         seed for reproducible latency and errors
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from context_window import estimate_tokens
+from prompt_cache import system_text
+
+# Words used to pad replies to the configured length
+FILLER_WORDS = (
+    "the tide rolls in slow and silver over the harbor while gulls argue about "
+    "supper and somebody on the porch swears the weather is turning again"
+).split()
+
+# Bedrock error code for each injected HTTP status
+BEDROCK_ERROR_CODES = {
+    429: "ThrottlingException",
+    500: "InternalServerException",
+    503: "ServiceUnavailableException",
+    529: "ServiceUnavailableException"
+}
+
+# Anthropic error type for each injected HTTP status
+ANTHROPIC_ERROR_TYPES = {
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error"
+}
+
+
+class LatencyDistribution:
+    """Samples delays in seconds from a spec like "lognormal:0.4:0.5" """
+
+    def __init__(self, spec: str = "fixed:0"):
+        self.spec = spec
+        kind, *args = spec.split(":")
+        self.kind = kind
+        self.args = [float(arg) for arg in args]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.args[0], self.args[1]))
+        median, sigma = self.args
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class FakeConfig:
+    def __init__(
+        self,
+        latency: str = "fixed:0.05",
+        tokens_per_second: float = 80.0,
+        reply_tokens: int = 60,
+        error_rate: float = 0.0,
+        error_status: int = 529,
+        seed: Optional[int] = None
+    ):
+        """
+        Behaviour of the fake provider
+
+        Args:
+            latency (str): Time-to-first-token distribution spec
+            tokens_per_second (float): Output rate after the first token (0 = instant)
+            reply_tokens (int): Words per reply, capped by the request's max_tokens
+            error_rate (float): Fraction of requests that fail with error_status
+            error_status (int): HTTP status of injected failures
+            seed (int): Seed for reproducible runs
+        """
+        self.latency = LatencyDistribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "fixed:0.05"),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TPS", "80")),
+            reply_tokens=int(os.getenv("FAKE_LLM_REPLY_TOKENS", "60")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            error_status=int(os.getenv("FAKE_LLM_ERROR_STATUS", "529")),
+            seed=int(seed) if seed else None
+        )
+
+
+class FakeAPIError(Exception):
+    """Injected Anthropic failure, shaped like anthropic.APIStatusError"""
+
+    def __init__(self, status_code: int, message: str = "Injected failure"):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+
+
+class FakeClientError(Exception):
+    """Injected Bedrock failure, shaped like botocore's ClientError"""
+
+    def __init__(self, status_code: int, operation: str):
+        code = BEDROCK_ERROR_CODES.get(status_code, "InternalServerException")
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation: Injected failure")
+        self.response = {
+            "Error": {"Code": code, "Message": "Injected failure"},
+            "ResponseMetadata": {"HTTPStatusCode": status_code}
+        }
+
+
+class FakeLLM:
+    """Generates replies and timing shared by the in-process and HTTP fakes"""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig.from_env()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.config.error_rate
+
+    def first_token_delay(self) -> float:
+        with self._lock:
+            return self.config.latency.sample(self._rng)
+
+    def token_delay(self) -> float:
+        tps = self.config.tokens_per_second
+        return 1.0 / tps if tps > 0 else 0.0
+
+    def reply_tokens(self, model: str, messages: List[Dict], max_tokens: int) -> List[str]:
+        """Deterministic reply for a conversation, split into word tokens"""
+        last_user = next(
+            (self._content_text(msg["content"]) for msg in reversed(messages or []) if msg.get("role") == "user"),
+            ""
+        )
+        words = f"({model}) You said: {' '.join(last_user.split()[:20])}".split()
+        # Same input, same reply
+        filler = random.Random(last_user)
+        while len(words) < self.config.reply_tokens:
+            words.append(filler.choice(FILLER_WORDS))
+        words = words[:max(1, min(self.config.reply_tokens, max_tokens or self.config.reply_tokens))]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def metadata_reply(self, prompt: str) -> str:
+        """JSON metadata for a Mistral-style extraction prompt"""
+        text = prompt.split("Conversation:", 1)[-1].split("Respond with", 1)[0]
+        words = [word.lower() for word in re.findall(r"[A-Za-z]{5,}", text)]
+        topics = [word for word, _ in Counter(words).most_common(5)]
+        entities = sorted(set(re.findall(r"\b[A-Z][a-z]{2,}\b", text)))[:5]
+        return json.dumps({
+            "topics": topics,
+            "summary": " ".join(text.split()[:20]),
+            "key_entities": entities,
+            "sentiment": "neutral",
+            "questions": [q.strip() + "?" for q in text.split("?")[:-1]][:3]
+        })
+
+    @staticmethod
+    def input_tokens(system, messages) -> int:
+        return estimate_tokens(system_text(system)) + sum(
+            estimate_tokens(FakeLLM._content_text(msg.get("content"))) for msg in messages or []
+        )
+
+    @staticmethod
+    def _content_text(content) -> str:
+        if isinstance(content, list):
+            return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        return content or ""
+
+
+def anthropic_message(model: str, tokens: List[str], input_tokens: int) -> Dict:
+    """Complete Messages API response body"""
+    return {
+        "id": f"msg_fake_{uuid.uuid4().hex[:12]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": "".join(tokens)}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": len(tokens),
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
+    }
+
+
+def anthropic_events(llm: FakeLLM, model: str, tokens: List[str], input_tokens: int, paced: bool = True) -> Iterator[Dict]:
+    """Messages API streaming events, paced at the configured token rate unless paced is False"""
+    message = anthropic_message(model, [], input_tokens)
+    message["usage"]["output_tokens"] = 1
+    yield {"type": "message_start", "message": message}
+    yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    for i, token in enumerate(tokens):
+        if i and paced:
+            time.sleep(llm.token_delay())
+        yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+    yield {"type": "content_block_stop", "index": 0}
+    yield {
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": {"output_tokens": len(tokens)}
+    }
+    yield {"type": "message_stop"}
+
+
+async def async_anthropic_events(llm: FakeLLM, model: str, tokens: List[str], input_tokens: int) -> AsyncIterator:
+    """anthropic_events as an async stream of SDK-like objects, paced without blocking the loop"""
+    deltas = 0
+    for event in anthropic_events(llm, model, tokens, input_tokens, paced=False):
+        if event["type"] == "content_block_delta":
+            if deltas:
+                await asyncio.sleep(llm.token_delay())
+            deltas += 1
+        yield to_namespace(event)
+
+
+def to_namespace(value):
+    """Turn decoded JSON into objects with attribute access, like the SDK's models"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+class FakeMessages:
+    """In-process fake of anthropic.Anthropic().messages"""
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+
+    def create(self, model=None, messages=None, system=None, max_tokens=1024, stream=False, **kwargs):
+        if self.llm.should_fail():
+            raise FakeAPIError(self.llm.config.error_status)
+        tokens = self.llm.reply_tokens(model, messages, max_tokens)
+        input_tokens = self.llm.input_tokens(system, messages)
+        time.sleep(self.llm.first_token_delay())
+        if stream:
+            return (to_namespace(event) for event in anthropic_events(self.llm, model, tokens, input_tokens))
+        time.sleep(self.llm.token_delay() * max(0, len(tokens) - 1))
+        return to_namespace(anthropic_message(model, tokens, input_tokens))
+
+
+class AsyncFakeMessages:
+    """In-process fake of anthropic.AsyncAnthropic().messages"""
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+
+    async def create(self, model=None, messages=None, system=None, max_tokens=1024, stream=False, **kwargs):
+        if self.llm.should_fail():
+            raise FakeAPIError(self.llm.config.error_status)
+        tokens = self.llm.reply_tokens(model, messages, max_tokens)
+        input_tokens = self.llm.input_tokens(system, messages)
+        await asyncio.sleep(self.llm.first_token_delay())
+        if stream:
+            # Like the SDK's AsyncStream: `async for event in await create(stream=True)`
+            return async_anthropic_events(self.llm, model, tokens, input_tokens)
+        await asyncio.sleep(self.llm.token_delay() * max(0, len(tokens) - 1))
+        return to_namespace(anthropic_message(model, tokens, input_tokens))
+
+
+class FakeAnthropic:
+    """Drop-in for anthropic.Anthropic"""
+
+    def __init__(self, llm: Optional[FakeLLM] = None):
+        self.messages = FakeMessages(llm or FakeLLM())
+
+
+class AsyncFakeAnthropic:
+    """Drop-in for anthropic.AsyncAnthropic"""
+
+    def __init__(self, llm: Optional[FakeLLM] = None):
+        self.messages = AsyncFakeMessages(llm or FakeLLM())
+
+
+def bedrock_response(llm: FakeLLM, model_id: str, body: Dict) -> Tuple[Dict, List[Dict]]:
+    """
+    Build the reply for a Bedrock request body
+
+    Returns:
+        tuple: (invoke_model response body, streaming events)
+    """
+    if "anthropic_version" in body:
+        tokens = llm.reply_tokens(model_id, body.get("messages"), body.get("max_tokens", 256))
+        input_tokens = llm.input_tokens(body.get("system"), body.get("messages"))
+        return anthropic_message(model_id, tokens, input_tokens), anthropic_events(llm, model_id, tokens, input_tokens)
+
+    # Text-completion models (Mistral metadata extraction): `outputs` is the
+    # Mistral shape, `completion` the one metadata_utils reads
+    text = llm.metadata_reply(body.get("prompt", ""))
+    response = {"outputs": [{"text": text, "stop_reason": "stop"}], "completion": text}
+    return response, iter([response])
+
+
+class FakeBedrockRuntime:
+    """In-process fake of the boto3 bedrock-runtime client"""
+
+    def __init__(self, llm: Optional[FakeLLM] = None):
+        self.llm = llm or FakeLLM()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        if self.llm.should_fail():
+            raise FakeClientError(self.llm.config.error_status, "InvokeModel")
+        response, events = bedrock_response(self.llm, modelId, json.loads(body))
+        time.sleep(self.llm.first_token_delay())
+        output_tokens = response.get("usage", {}).get("output_tokens", 1)
+        time.sleep(self.llm.token_delay() * max(0, output_tokens - 1))
+        return {"body": io.BytesIO(json.dumps(response).encode("utf-8")), "contentType": "application/json"}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        if self.llm.should_fail():
+            raise FakeClientError(self.llm.config.error_status, "InvokeModelWithResponseStream")
+        _, events = bedrock_response(self.llm, modelId, json.loads(body))
+        time.sleep(self.llm.first_token_delay())
+        chunks = ({"chunk": {"bytes": json.dumps(event).encode("utf-8")}} for event in events)
+        return {"body": chunks, "contentType": "application/json"}
+
+
+def encode_event_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encode one message in the AWS event stream binary format (string headers only)"""
+    header_bytes = b"".join(
+        struct.pack(">B", len(name)) + name.encode("utf-8")
+        + b"\x07" + struct.pack(">H", len(value.encode("utf-8"))) + value.encode("utf-8")
+        for name, value in headers.items()
+    )
+    total_length = 12 + len(header_bytes) + len(payload) + 4
+    prelude = struct.pack(">II", total_length, len(header_bytes))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + header_bytes + payload
+    return message + struct.pack(">I", zlib.crc32(message))
+
+
+def bedrock_chunk_message(event: Dict) -> bytes:
+    """Event stream message carrying one Bedrock response chunk"""
+    payload = json.dumps({"bytes": base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii")})
+    return encode_event_message(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        payload.encode("utf-8")
+    )
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """Serves the Anthropic Messages API and Bedrock InvokeModel(+stream) routes"""
+
+    protocol_version = "HTTP/1.1"
+    llm: FakeLLM = None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "Invalid JSON"}})
+            return
+
+        path = urlparse(self.path).path
+        if path == "/v1/messages":
+            self._anthropic(body)
+            return
+        match = re.match(r"^/model/(.+)/(invoke|invoke-with-response-stream)$", path)
+        if match:
+            self._bedrock(unquote(match.group(1)), body, stream=match.group(2) != "invoke")
+            return
+        self._send_json(404, {"message": f"No route for {path}"})
+
+    def _anthropic(self, body: Dict):
+        llm = self.llm
+        if llm.should_fail():
+            status = llm.config.error_status
+            self._send_json(status, {"type": "error", "error": {
+                "type": ANTHROPIC_ERROR_TYPES.get(status, "api_error"), "message": "Injected failure"
+            }})
+            return
+
+        model = body.get("model")
+        tokens = llm.reply_tokens(model, body.get("messages"), body.get("max_tokens", 1024))
+        input_tokens = llm.input_tokens(body.get("system"), body.get("messages"))
+        time.sleep(llm.first_token_delay())
+
+        if not body.get("stream"):
+            time.sleep(llm.token_delay() * max(0, len(tokens) - 1))
+            self._send_json(200, anthropic_message(model, tokens, input_tokens))
+            return
+
+        self._start_chunked("text/event-stream")
+        for event in anthropic_events(llm, model, tokens, input_tokens):
+            self._write_chunk(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._end_chunked()
+
+    def _bedrock(self, model_id: str, body: Dict, stream: bool):
+        llm = self.llm
+        if llm.should_fail():
+            status = llm.config.error_status
+            code = BEDROCK_ERROR_CODES.get(status, "InternalServerException")
+            self._send_json(status, {"message": "Injected failure"}, {"x-amzn-ErrorType": code})
+            return
+
+        response, events = bedrock_response(llm, model_id, body)
+        time.sleep(llm.first_token_delay())
+
+        if not stream:
+            output_tokens = response.get("usage", {}).get("output_tokens", 1)
+            time.sleep(llm.token_delay() * max(0, output_tokens - 1))
+            self._send_json(200, response)
+            return
+
+        self._start_chunked("application/vnd.amazon.eventstream")
+        for event in events:
+            self._write_chunk(bedrock_chunk_message(event))
+        self._end_chunked()
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+
+def start_server(config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the fake provider HTTP server on a daemon thread
+
+    Args:
+        config (FakeConfig): Behaviour of the fake (defaults to the environment)
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free one; see server.server_address)
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    handler = type("Handler", (FakeProviderHandler,), {"llm": FakeLLM(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-provider", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    defaults = FakeConfig.from_env()
+    parser = argparse.ArgumentParser(description='Fake Anthropic/Bedrock provider for offline load testing')
+    parser.add_argument('--host', default="127.0.0.1", help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on')
+    parser.add_argument('--latency', default=defaults.latency.spec, help='Time-to-first-token distribution')
+    parser.add_argument('--tps', type=float, default=defaults.tokens_per_second, help='Output tokens per second')
+    parser.add_argument('--reply-tokens', type=int, default=defaults.reply_tokens, help='Words per reply')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='Fraction of failing requests')
+    parser.add_argument('--error-status', type=int, default=defaults.error_status, help='HTTP status of failures')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='Random seed')
+
+    args = parser.parse_args()
+    config = FakeConfig(
+        latency=args.latency,
+        tokens_per_second=args.tps,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+
+    server = start_server(config, args.host, args.port)
+    print(f"Fake provider listening on http://{args.host}:{server.server_address[1]}")
+    print(f"  ANTHROPIC_BASE_URL=http://{args.host}:{server.server_address[1]}")
+    print(f"  BEDROCK_ENDPOINT_URL=http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -5,13 +5,11 @@ from datetime import datetime
 import glob
 import hashlib
 
-def load_metadata_cache():
-    try:
-        with open('metadata_cache.json', 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Warning: Could not load metadata cache: {e}")
-        return {}
+from response_cache import get_response_cache
+
+# Cache namespace for the keyword topic extraction below; bump the version
+# whenever the extraction rules change so stale entries aren't reused
+METADATA_EXTRACTOR = "keyword-topics-v1"
 
 def generate_chat_id(messages, chat_type, file_name):
     # Generate a consistent ID based on conversation content, chat type, and file name
@@ -19,15 +17,18 @@ def generate_chat_id(messages, chat_type, file_name):
     unique_string = f"{chat_type}:{file_name}:{content}"
     return str(abs(hash(unique_string)))
 
-def generate_metadata(messages, chat_id, metadata_cache):
-    # Check if we have existing metadata
-    if chat_id in metadata_cache and metadata_cache[chat_id].get('topics'):
-        print(f"Using existing metadata for chat {chat_id}")
-        return metadata_cache[chat_id]
-    
-    # Extract topics and generate summary
+def generate_metadata(messages):
+    # Metadata is cached in the shared response cache, keyed by conversation
+    # content, so unchanged conversations are not re-extracted on re-import
     content = ' '.join(msg['content'] for msg in messages)
-    
+    return get_response_cache().get_or_call(
+        METADATA_EXTRACTOR,
+        content,
+        {'message_count': len(messages)},
+        lambda: extract_metadata(content, len(messages))
+    )
+
+def extract_metadata(content, message_count):
     # Simple topic extraction (we can make this more sophisticated later)
     topics = []
     if 'pynchon' in content.lower():
@@ -45,17 +46,14 @@ def generate_metadata(messages, chat_id, metadata_cache):
     metadata = {
         'topics': topics,
         'summary': summary,
-        'message_count': len(messages),
+        'message_count': message_count,
         'last_updated': datetime.now().isoformat(),
-        'timestamp': metadata_cache.get(chat_id, {}).get('timestamp', datetime.now().timestamp())
+        'timestamp': datetime.now().timestamp()
     }
     
     return metadata
 
 def import_chat_logs():
-    # Load existing metadata
-    metadata_cache = load_metadata_cache()
-    
     # Connect to SQLite database
     conn = sqlite3.connect('chat_history.db')
     cursor = conn.cursor()
@@ -107,7 +105,7 @@ def import_chat_logs():
             
             # Generate chat ID and metadata
             chat_id = generate_chat_id(messages, chat_type, os.path.basename(json_file))
-            metadata = generate_metadata(messages, chat_id, metadata_cache)
+            metadata = generate_metadata(messages)
             
             # Create conversation entry
             conversation_json = json.dumps(messages)
@@ -0,0 +1,216 @@
+"""
+Incremental Summarizer Module
+
+Maintains rolling per-session summary state (topic counts, entity set and
+summary sentences) so that metadata updates only process the messages added
+since the previous run instead of the whole conversation.
+"""
+
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Entity labels that count as topics
+TOPIC_ENTITY_LABELS = {"ORG", "PERSON", "GPE", "LOC", "PRODUCT", "WORK_OF_ART"}
+
+
+class SessionSummaryState:
+    """Running summary state for a single chat session"""
+
+    def __init__(self):
+        self.processed = 0           # Number of messages already folded in
+        self.last_content = None     # Content of the last folded message, to detect a diverged log
+        self.exchanges = 0           # Number of user turns seen
+        self.topic_counts = Counter()
+        self.entities = []           # Ordered, de-duplicated entity texts
+        self.sentences = []          # Leading sentence of each user turn, oldest first
+
+    def matches(self, messages: List[Dict]) -> bool:
+        """Check whether `messages` continues the log this state was built from"""
+        if self.processed == 0:
+            return True
+        if len(messages) < self.processed:
+            return False
+        return messages[self.processed - 1].get("content") == self.last_content
+
+
+class IncrementalSummarizer:
+    def __init__(
+        self,
+        nlp,
+        max_sessions: int = 128,
+        max_topics: int = 5,
+        max_sentences: int = 5,
+        max_chars: int = 2000
+    ):
+        """
+        Initialize the incremental summarizer.
+
+        Args:
+            nlp: Loaded spaCy pipeline used for sentence, entity and noun chunk extraction
+            max_sessions: Number of session states to keep before evicting the least recently used
+            max_topics: Number of topics reported in the metadata
+            max_sentences: Number of user sentences kept for the summary
+            max_chars: Characters of each message passed to spaCy
+        """
+        self.nlp = nlp
+        self.max_sessions = max_sessions
+        self.max_topics = max_topics
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.sessions = OrderedDict()
+        # Updates may come from the background metadata worker and callers alike
+        self._lock = threading.Lock()
+
+    def update(self, session_key: Any, conversation: Dict) -> Dict[str, Any]:
+        """
+        Fold the new messages of a conversation into its session state.
+
+        Args:
+            session_key: Key identifying the chat session (e.g. chat type)
+            conversation: Conversation dict as returned by SQLiteClient
+
+        Returns:
+            Metadata dict with summary, topics and key_entities
+        """
+        with self._lock:
+            return self._update(session_key, conversation)
+
+    def checkpoint(self, session_key: Any) -> Tuple[int, Optional[str]]:
+        """
+        Where a session's state stands, so callers can load only newer messages
+
+        Returns:
+            tuple: (messages already folded in, content of the last of them)
+        """
+        with self._lock:
+            state = self.sessions.get(session_key)
+            return (state.processed, state.last_content) if state else (0, None)
+
+    def extend(
+        self,
+        session_key: Any,
+        new_messages: List[Dict],
+        offset: int,
+        timestamp: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fold messages that start at index `offset` of the session's log.
+
+        Args:
+            session_key: Key identifying the chat session (e.g. chat type)
+            new_messages: Messages from index `offset` to the end of the log
+            offset: Index of new_messages[0] in the log; 0 starts the session over
+            timestamp: Conversation timestamp used in the summary
+
+        Returns:
+            Metadata dict, or None if the state moved past `offset` since it
+            was read (the caller should reload from offset 0)
+        """
+        with self._lock:
+            state = self.sessions.get(session_key)
+            if offset == 0:
+                state = SessionSummaryState()
+            elif state is None or state.processed != offset:
+                return None
+            return self._fold(session_key, state, new_messages, offset + len(new_messages), timestamp)
+
+    def _update(self, session_key: Any, conversation: Dict) -> Dict[str, Any]:
+        """Fold new messages into the session state (caller holds the lock)"""
+        messages = conversation.get("conversation", [])
+        state = self.sessions.get(session_key)
+
+        # Start over if the log was cleared or rewritten since the last run
+        if state is None or not state.matches(messages):
+            state = SessionSummaryState()
+
+        return self._fold(
+            session_key, state, messages[state.processed:], len(messages), conversation.get("timestamp")
+        )
+
+    def _fold(
+        self,
+        session_key: Any,
+        state: SessionSummaryState,
+        new_messages: List[Dict],
+        total: int,
+        timestamp: Optional[float]
+    ) -> Dict[str, Any]:
+        """Fold new messages into `state` and store it (caller holds the lock)"""
+        for msg in new_messages:
+            if msg.get("role") == "user":
+                self._fold_user_message(state, msg.get("content", ""))
+        if new_messages:
+            state.processed = total
+            state.last_content = new_messages[-1].get("content")
+
+        self.sessions[session_key] = state
+        self.sessions.move_to_end(session_key)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+        return {
+            "summary": self._build_summary(state, timestamp),
+            "topics": self.get_topics(state),
+            "key_entities": state.entities[:10]
+        }
+
+    def reset(self, session_key: Any):
+        """Drop the state for a session"""
+        with self._lock:
+            self.sessions.pop(session_key, None)
+
+    def get_topics(self, state: SessionSummaryState) -> List[str]:
+        """Return the most frequent topics seen so far"""
+        return [topic for topic, _ in state.topic_counts.most_common(self.max_topics)]
+
+    def _fold_user_message(self, state: SessionSummaryState, content: str):
+        """Process a single user message and merge it into the state"""
+        state.exchanges += 1
+        if not content:
+            return
+
+        try:
+            doc = self.nlp(content[:self.max_chars])
+        except Exception as e:
+            logger.error("Error processing message for summary: %s", e)
+            return
+
+        sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+        if sentences and len(state.sentences) < self.max_sentences:
+            state.sentences.append(sentences[0])
+        elif sentences:
+            # Keep the opening sentences and slide the most recent one
+            state.sentences[-1] = sentences[0]
+
+        for ent in doc.ents:
+            if ent.label_ in TOPIC_ENTITY_LABELS:
+                text = ent.text.lower()
+                state.topic_counts[text] += 1
+                if text not in state.entities:
+                    state.entities.append(text)
+
+        for chunk in doc.noun_chunks:
+            if len(chunk.text.split()) >= 2:  # Only multi-word chunks
+                state.topic_counts[chunk.text.lower()] += 1
+
+    def _build_summary(self, state: SessionSummaryState, timestamp: Optional[float]) -> str:
+        """Render the summary text from the running state"""
+        try:
+            date_str = datetime.fromtimestamp(timestamp).strftime("%B %d, %Y")
+        except Exception:
+            date_str = "a previous date"
+
+        topics = self.get_topics(state)
+        topics_str = ", ".join(topics) if topics else "various topics"
+
+        summary = f"On {date_str}, we had a {state.exchanges}-exchange conversation about {topics_str}. "
+        if state.sentences:
+            summary += f"You asked about {state.sentences[0]}"
+            if len(state.sentences) > 1:
+                summary += f" and most recently about {state.sentences[-1]}"
+        return summary
@@ -0,0 +1,224 @@
+"""
+Log Config Module
+
+Structured, non-blocking logging for the app. Modules get a logger with
+`get_logger(__name__)`, which has no side effects; entry points (main.py and
+the CLIs) call `configure_logging()` once to set up the root logger from the
+environment:
+
+- Records are JSON objects (or plain text on a terminal) carrying the
+  current request id and persona, plus any `extra=` fields.
+- Handlers on the request path only put records on a bounded queue; a
+  QueueListener thread formats them and does the I/O. When the queue is
+  full, records are dropped and counted rather than blocking the request.
+- LOG_LEVEL sets the default level and LOG_LEVELS overrides it per module
+  ("bedrock_client=DEBUG,sqlite_client=WARNING"). LOG_SAMPLE keeps only a
+  fraction of a module's DEBUG/INFO records ("bedrock_client=0.1").
+  Warnings and errors are never sampled out.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from metrics import current_persona
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "json" or "text"; defaults to text on a terminal and JSON otherwise
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text" if sys.stderr.isatty() else "json")
+
+# Records buffered for the listener thread before new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse "name=value,name=value" into a dict"""
+    mapping = {}
+    for item in value.split(","):
+        name, sep, setting = item.partition("=")
+        if sep and name.strip():
+            mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+# Per-module levels, e.g. "bedrock_client=DEBUG,sqlite_client=WARNING"
+LOG_LEVELS = {name: level.upper() for name, level in _parse_mapping(os.getenv("LOG_LEVELS", "")).items()}
+
+# Per-module fraction of DEBUG/INFO records kept, e.g. "bedrock_client=0.1"
+LOG_SAMPLE = {name: float(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLE", "")).items()}
+
+current_request_id = contextvars.ContextVar("current_request_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "persona"}
+
+_setup_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """Tag every record logged inside the block with a request id"""
+    token = current_request_id.set(request_id or new_request_id())
+    try:
+        yield current_request_id.get()
+    finally:
+        current_request_id.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the request id and persona of the calling context"""
+
+    def filter(self, record):
+        record.request_id = current_request_id.get()
+        record.persona = current_persona.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a configured fraction of a module's records below WARNING"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+    def _rate_for(self, name: str) -> float:
+        # Most specific configured prefix wins: "a.b" before "a"
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "persona": getattr(record, "persona", "-")
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records when the queue is full instead of
+    blocking, and keeps records structured for the listener's formatter
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback now (arguments may change after
+        # this call returns), but leave formatting to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(force: bool = False):
+    """
+    Configure the root logger from the environment (once per process)
+
+    Args:
+        force: Reconfigure even if logging was already set up
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        _queue_handler.addFilter(ContextFilter())
+        _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, NonBlockingQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a module logger (records go nowhere useful until configure_logging runs)"""
+    return logging.getLogger(name)
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+@atexit.register
+def _flush_on_exit():
+    # Drain the queue so the last records of a CLI run aren't lost
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass
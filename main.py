@@ -1,45 +1,248 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import uuid
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from chat_manager import chat_manager
+from admission import Overloaded, admission
+from chat_manager import chat_manager, HISTORY_PAGE_SIZE
+from log_config import configure_logging, request_context
+from metrics import metrics
+from profiling import PROFILE_HEADER, profile_call, should_profile
+from resilience import ProviderError
+from static_assets import PrecompressedStaticFiles, asset_url
+from telemetry import usage_tracker
+
+configure_logging()
 
 app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Run build_static.py to serve fingerprinted, precompressed assets
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_url
+
+# Set WARMUP_ON_STARTUP=1 to build persona clients before serving (and
+# WARMUP_MEMORY=1 to load spaCy too); otherwise they are created on first use
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0") == "1"
+WARMUP_MEMORY = os.getenv("WARMUP_MEMORY", "0") == "1"
+
+@app.on_event("startup")
+async def warmup():
+    if WARMUP_ON_STARTUP:
+        await asyncio.to_thread(chat_manager.warmup, memory=WARMUP_MEMORY)
+
+# Cookie identifying a browser session; each session has its own chat history
+SESSION_COOKIE = "session_id"
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SESSION_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+@app.middleware("http")
+async def session_middleware(request: Request, call_next):
+    """Attach a session id to every request, issuing a cookie for new visitors"""
+    session_id = request.cookies.get(SESSION_COOKIE, "")
+    is_new = not SESSION_ID_PATTERN.match(session_id)
+    if is_new:
+        session_id = uuid.uuid4().hex
+    request.state.session_id = session_id
+
+    response = await call_next(request)
+    if is_new:
+        response.set_cookie(
+            SESSION_COOKIE, session_id,
+            max_age=SESSION_COOKIE_MAX_AGE, httponly=True, samesite="lax"
+        )
+    return response
+
+# Correlates every log record of a request; taken from the client or proxy
+# when it looks sane, otherwise generated
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag the request's log records with a request id and echo it back"""
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = None
+    with request_context(request_id) as request_id:
+        response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+def overloaded_response(error: Overloaded):
+    """Turn an admission rejection into a fast 429/503 the client can retry"""
+    return JSONResponse({
+        "error": str(error)
+    }, status_code=error.status_code, headers={"Retry-After": str(error.retry_after)})
 
 class ChatMessage(BaseModel):
     message: str
     chat_type: str  # Add this field to receive the chat type
 
-@app.get("/")
-async def home(request: Request):
-    # Pass "bedrock" as the chat type to the template
+async def render_chat(request: Request, chat_type: str):
+    """Render the chat page with the latest page of this session's history;
+    older pages are fetched from /history as the user scrolls up"""
+    page = await asyncio.to_thread(chat_manager.get_history, chat_type, session_id=request.state.session_id)
     return templates.TemplateResponse("home.html", {
         "request": request,
-        "chat_type": "bedrock"
+        "chat_type": chat_type,
+        "messages": page["messages"],
+        "next_before": page["next_before"]
     })
 
+@app.get("/")
+async def home(request: Request):
+    # Pass "bedrock" as the chat type to the template
+    return await render_chat(request, "bedrock")
+
 @app.get("/claude")
 async def home(request: Request):
-    return templates.TemplateResponse("home.html", {"request": request, "chat_type": "claude"})
+    return await render_chat(request, "claude")
 
 @app.post("/chat")
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, request: Request):
     try:
-        # Get response from chat manager using the provided chat type
-        response = chat_manager.send_message(
-            message.chat_type,  # Use the chat type from the request
-            message.message,
-            max_tokens=1024,
-            temperature=0.75
-        )
+        profile_id = None
+        # Wait for capacity (or fail fast) before tying up a provider call
+        async with admission.admit(message.chat_type):
+            if should_profile(request.headers.get(PROFILE_HEADER), request.query_params.get("profile")):
+                # Run the whole turn in one thread so the profile covers all of it
+                response, profile_file = await asyncio.to_thread(
+                    profile_call,
+                    f"chat-{message.chat_type}",
+                    chat_manager.send_message,
+                    message.chat_type,
+                    message.message,
+                    max_tokens=1024,
+                    temperature=0.75,
+                    session_id=request.state.session_id
+                )
+                profile_id = os.path.basename(profile_file) if profile_file else None
+            else:
+                # Get response from chat manager using the provided chat type
+                response = await chat_manager.asend_message(
+                    message.chat_type,  # Use the chat type from the request
+                    message.message,
+                    max_tokens=1024,
+                    temperature=0.75,
+                    session_id=request.state.session_id
+                )
         
         return JSONResponse({
             "response": response
-        })
+        }, headers={"X-Profile-Id": profile_id} if profile_id else None)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except ProviderError as e:
+        # Every backend failed or timed out: tell the client to try again later
+        return JSONResponse({
+            "error": str(e)
+        }, status_code=503, headers={"Retry-After": "5"})
     except Exception as e:
         return JSONResponse({
             "error": str(e)
         }, status_code=500)
+
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage, request: Request):
+    """Stream the response as server-sent events: `data` events carry text deltas,
+    followed by a final `done` event (or an `error` event)"""
+    session_id = request.state.session_id
+    try:
+        admitted_at = await admission.acquire(message.chat_type)
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    # The slot is held until the stream ends; release it exactly once whether the
+    # generator finishes or the client disconnects before it starts
+    released = threading.Lock()
+
+    def release_slot():
+        if released.acquire(blocking=False):
+            admission.release(message.chat_type, admitted_at)
+
+    try:
+        # Validate the chat type (and rehydrate the session) before the stream starts
+        await asyncio.to_thread(chat_manager.get_client, message.chat_type, session_id)
+    except Exception as e:
+        release_slot()
+        return JSONResponse({
+            "error": str(e)
+        }, status_code=400)
+
+    def event_stream():
+        try:
+            for chunk in chat_manager.stream_message(
+                message.chat_type,
+                message.message,
+                max_tokens=1024,
+                temperature=0.75,
+                session_id=session_id
+            ):
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            release_slot()
+
+    # The generator is synchronous, so Starlette runs it in a worker thread
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot)
+    )
+
+@app.get("/service-worker.js")
+async def service_worker():
+    """The service worker, served from the root so it controls every page. The
+    built copy has its cache version set from the asset manifest."""
+    path = "static/dist/service-worker.js"
+    if not os.path.exists(path):
+        path = "static/service-worker.js"
+    return FileResponse(path, media_type="application/javascript", headers={"Cache-Control": "no-cache"})
+
+@app.get("/history")
+async def history(chat_type: str, request: Request, before: int = None, limit: int = HISTORY_PAGE_SIZE):
+    """One page of this session's messages, oldest first; pass `next_before` back
+    as `before` to get the page before it"""
+    try:
+        page = await asyncio.to_thread(
+            chat_manager.get_history, chat_type, before, limit, request.state.session_id
+        )
+    except ValueError as e:
+        return JSONResponse({
+            "error": str(e)
+        }, status_code=400)
+    return JSONResponse(page)
+
+@app.get("/stats/routing")
+async def routing_stats(limit: int = 50):
+    """Recent model routing decisions"""
+    return JSONResponse({"decisions": chat_manager.router.recent_decisions(limit)})
+
+@app.get("/stats/usage")
+async def usage_stats(persona: str = None):
+    """Token and payload-size statistics per persona"""
+    return JSONResponse({"personas": usage_tracker.stats(persona)})
+
+@app.get("/stats/sessions")
+async def session_stats():
+    """Live session counts and LRU hit/eviction counters"""
+    return JSONResponse(chat_manager.sessions.stats())
+
+@app.get("/stats/admission")
+async def admission_stats():
+    """In-flight requests, queue depth and rejection counters"""
+    return JSONResponse(admission.stats())
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage, per-persona latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Memory Intent Measurement
+
+Replays stored user messages through the shared memory intent gate and reports:
+- how often the gate fires
+- false negatives / false positives against a hand-labelled sample of the logs
+  (memory_intent_labels.json); messages without a label are scored against the
+  review lexicon instead, counting every ungated candidate as a miss
+- where the gate differs from the phrase lists ChatClient and MemoryChatClient
+  used before it was shared (the gate is built from those lists, so this only
+  shows changed behaviour, not accuracy)
+- the FTS retrieval time skipped per turn now that retrieval runs only when gated
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import time
+
+from log_config import configure_logging
+from memory_intent import is_memory_query
+from sqlite_client import SQLiteClient
+
+# Phrase lists as they were in ChatClient and MemoryChatClient
+LEGACY_CHAT_CLIENT_PHRASES = [
+    r"remember when", r"remember talking about", r"we discussed", r"we talked about",
+    r"previous conversation", r"earlier we", r"before we"
+]
+LEGACY_MEMORY_CLIENT_PHRASES = [
+    r"remember when", r"remember talking about", r"we discussed", r"we talked about",
+    r"previous conversation", r"earlier you said", r"you told me", r"you mentioned", r"you said"
+]
+
+# Broad lexicon used to surface possible misses in unlabelled messages
+REVIEW_PATTERN = re.compile(
+    r"remember|recall|last time|last thing|earlier|before|discuss|talk|mention|told me|previous",
+    re.IGNORECASE
+)
+
+# Hand-labelled sample: [{"text": ..., "memory": true/false}, ...]
+DEFAULT_LABELS_PATH = "memory_intent_labels.json"
+
+
+def legacy_match(phrases, message):
+    """Match a message the way the old per-client lists did"""
+    return any(re.search(phrase, message.lower()) for phrase in phrases)
+
+
+def load_user_messages(db_path, logs_glob):
+    """Collect distinct (chat_type, user message) pairs from the DB and JSON logs"""
+    messages = {}
+    with sqlite3.connect(db_path) as conn:
+        for chat_type, conversation in conn.execute("SELECT chat_type, conversation FROM conversations"):
+            for msg in json.loads(conversation):
+                if msg.get("role") == "user" and msg.get("content"):
+                    messages.setdefault(msg["content"], chat_type)
+
+    for path in glob.glob(logs_glob):
+        with open(path, "r") as f:
+            data = json.load(f)
+        conversations = data if data and isinstance(data[0], list) else [data]
+        for conversation in conversations:
+            for msg in conversation:
+                if isinstance(msg, dict) and msg.get("role") == "user" and msg.get("content"):
+                    messages.setdefault(msg["content"], None)
+
+    return [(chat_type, content) for content, chat_type in messages.items()]
+
+
+def load_labels(path):
+    """Read hand labels as {message: is a memory query}, or {} if there is no file"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {item["text"]: bool(item["memory"]) for item in json.load(f)}
+
+
+def rates(predicted, expected):
+    """Return (false negatives, false positives, FN rate, FP rate)"""
+    fn = sum(1 for p, e in zip(predicted, expected) if e and not p)
+    fp = sum(1 for p, e in zip(predicted, expected) if p and not e)
+    positives = sum(expected) or 1
+    negatives = (len(expected) - sum(expected)) or 1
+    return fn, fp, fn / positives, fp / negatives
+
+
+def time_retrieval(db, messages, repeats):
+    """Mean seconds spent on the FTS lookup the old code ran every turn"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for chat_type, content in messages:
+            db.search_conversations(content, chat_type, limit=3)
+    return (time.perf_counter() - start) / (repeats * max(len(messages), 1))
+
+
+def time_gate(messages, repeats):
+    """Mean seconds spent evaluating the gate"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _, content in messages:
+            is_memory_query(content)
+    return (time.perf_counter() - start) / (repeats * max(len(messages), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory intent gate on stored chat logs')
+    parser.add_argument('--db', default='chat_history.db', help='SQLite database to read')
+    parser.add_argument('--logs', default='chat_logs/*.json', help='Glob of exported JSON chat logs')
+    parser.add_argument('--labels', default=DEFAULT_LABELS_PATH, help='Hand-labelled sample (JSON)')
+    parser.add_argument('--repeats', type=int, default=20, help='Timing repetitions')
+    args = parser.parse_args()
+
+    messages = load_user_messages(args.db, args.logs)
+    if not messages:
+        print("No user messages found.")
+        return
+    texts = [content for _, content in messages]
+
+    gated = [is_memory_query(t) for t in texts]
+    legacy_chat = [legacy_match(LEGACY_CHAT_CLIENT_PHRASES, t) for t in texts]
+    legacy_memory = [legacy_match(LEGACY_MEMORY_CLIENT_PHRASES, t) for t in texts]
+
+    print(f"User messages: {len(texts)}")
+    print(f"Gate fired: {sum(gated)} ({sum(gated) / len(texts):.1%})")
+
+    labels = load_labels(args.labels)
+    labelled = [(g, labels[t]) for t, g in zip(texts, gated) if t in labels]
+    if labelled:
+        predicted, expected = zip(*labelled)
+        fn, fp, fn_rate, fp_rate = rates(predicted, expected)
+        print(f"vs hand labels ({len(labelled)} messages, {sum(expected)} memory queries): "
+              f"FN {fn} ({fn_rate:.1%}), FP {fp} ({fp_rate:.1%})")
+        for text, g in zip(texts, gated):
+            if text in labels and g != labels[text]:
+                print(f"  {'missed' if labels[text] else 'false alarm'}: {text[:100]!r}")
+
+    # Unlabelled messages: every ungated review candidate counts as a miss
+    review = [t for t, g in zip(texts, gated) if t not in labels and not g and REVIEW_PATTERN.search(t)]
+    unlabelled = len(texts) - len(labelled)
+    if unlabelled:
+        print(f"Unlabelled messages: {unlabelled}; ungated review candidates (counted as misses): {len(review)}")
+        for text in review:
+            print(f"  - {text[:100]!r}")
+
+    for label, legacy in (("ChatClient list", legacy_chat), ("MemoryChatClient list", legacy_memory)):
+        added = sum(1 for g, old in zip(gated, legacy) if g and not old)
+        dropped = sum(1 for g, old in zip(gated, legacy) if old and not g)
+        print(f"vs {label}: {added} newly gated, {dropped} no longer gated")
+
+    db = SQLiteClient(db_path=args.db)
+    retrieval = time_retrieval(db, messages, args.repeats)
+    gate = time_gate(messages, args.repeats * 50)
+    skipped = 1 - sum(gated) / len(texts)
+    print(f"FTS retrieval: {retrieval * 1000:.3f} ms/turn, gate: {gate * 1e6:.2f} us/turn")
+    print(f"Retrieval skipped on {skipped:.1%} of turns, saving {retrieval * skipped * 1000:.3f} ms/turn on average")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup Measurement
+
+Times how long it takes to import the app's entry points in a fresh
+interpreter, i.e. what a gunicorn worker restart or a CLI script pays before
+doing any work. Each module is imported several times in a new process and
+the median wall time is reported, along with the slowest imports from
+`python -X importtime` so regressions are easy to trace.
+
+    python measure_startup.py
+    python measure_startup.py --modules chat_manager main --runs 10 --warmup
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = ["chat_manager", "ocean_chat", "claude_chat", "main"]
+
+# Fail the run when a module's median import exceeds this many milliseconds
+DEFAULT_BUDGET_MS = 500
+
+
+def time_import(module, warmup=False):
+    """Import a module in a fresh interpreter and return the wall time in seconds"""
+    code = f"import {module}"
+    if warmup:
+        code += "; from chat_manager import chat_manager; chat_manager.warmup()"
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL
+    )
+    return time.perf_counter() - started
+
+
+def slowest_imports(module, top=10):
+    """Run `python -X importtime` and return the slowest (cumulative_us, name) pairs"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        entries.append((int(parts[1]), parts[2].strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def baseline():
+    """Time an empty interpreter, so module numbers can be read as overhead on top of it"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure import time of the app entry points')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='Modules to import')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list per module')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='Median import budget per module')
+    parser.add_argument('--warmup', action='store_true', help='Also time chat_manager.warmup() after the import')
+
+    args = parser.parse_args()
+
+    empty = statistics.median(baseline() for _ in range(args.runs))
+    print(f"Empty interpreter: {empty * 1000:.0f} ms")
+
+    over_budget = []
+    for module in args.modules:
+        times = [time_import(module, args.warmup) for _ in range(args.runs)]
+        median_ms = (statistics.median(times) - empty) * 1000
+        print(f"\n{module}: median {median_ms:.0f} ms over {args.runs} runs "
+              f"(min {(min(times) - empty) * 1000:.0f} ms, max {(max(times) - empty) * 1000:.0f} ms)")
+        for cumulative_us, name in slowest_imports(module, args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+        if median_ms > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\nOver the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
@@ -1,11 +1,18 @@
-import json
 from datetime import datetime
-import os
-import anthropic
 from sqlite_client import SQLiteClient
+from provider_registry import registry
 from memory_manager import MemoryManager
+from metadata_worker import get_metadata_worker
+from memory_intent import is_memory_query
+from context_window import build_recalled_context, estimate_tokens
+from prompt_cache import build_system_blocks, usage_report, format_usage, system_text
+from model_router import ModelRouter, DEFAULT_POLICY
+from resilience import build_failover_clients
+from telemetry import usage_tracker
+from metrics import timed
+from profiling import PROFILE_DIR, PROFILE_MODE, PROFILE_MODES, profiled
+from log_config import configure_logging, get_logger
 from dotenv import load_dotenv
-import re
 from prompt_toolkit import prompt
 from prompt_toolkit.shortcuts import message_dialog
 from prompt_toolkit.formatted_text import HTML
@@ -15,13 +22,20 @@ from prompt_toolkit.shortcuts import input_dialog
 # Load environment variables
 load_dotenv()
 
+logger = get_logger(__name__)
+
 class MemoryChatClient:
     def __init__(
         self, 
         chat_type="claude", 
         model="claude-3-sonnet-20240229", 
         base_system_prompt="",
-        memory_tiers=None
+        memory_tiers=None,
+        background_metadata=True,
+        recall_max_tokens=600,
+        router=None,
+        client=None,
+        db_path="chat_history.db"
     ):
         """
         Initialize a chat client with human-like memory.
@@ -31,23 +45,35 @@ class MemoryChatClient:
             model (str): The model to use for chat
             base_system_prompt (str): Base system prompt without memory context
             memory_tiers (dict): Memory tier configuration for MemoryManager
+            background_metadata (bool): Update summaries and topics on a background
+                worker instead of before returning each reply
+            recall_max_tokens (int): Estimated token budget for relevant memories
+                added to a single request
+            router (ModelRouter): Picks the model and provider per request instead
+                of always using `model`
+            client: Provider client used without a router. Defaults to the
+                shared Anthropic client with retries and Bedrock failover.
+            db_path (str): SQLite database holding the conversations
         """
         self.chat_type = chat_type
         self.model = model
         self.base_system_prompt = base_system_prompt or "You are Claude, a helpful AI assistant."
         self.chat_log = []
+        self.current_chat_id = None
+        self.recall_max_tokens = recall_max_tokens
+        self.last_usage = None
+        self.router = router
+        self.metadata_worker = get_metadata_worker() if background_metadata else None
         
         # Initialize memory manager
-        self.memory_manager = MemoryManager(memory_tiers=memory_tiers)
+        self.memory_manager = MemoryManager(db_path=db_path, memory_tiers=memory_tiers)
         
         # Initialize database
-        self.db = SQLiteClient()
+        self.db = SQLiteClient(db_path)
         
-        # Initialize Anthropic client
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Same resilient Anthropic client ChatManager routes through, so
+        # failures are retried and fail over before reaching the caller
+        self.client = client or build_failover_clients("anthropic", registry)[0]
         
         # Load most recent chat as current context
         self.load_current_chat()
@@ -60,13 +86,13 @@ class MemoryChatClient:
             if results:
                 conversation = results[0]
                 self.chat_log = conversation['conversation']
-                print(f"Loaded most recent conversation ({len(self.chat_log)} messages)")
+                logger.info("[%s] Loaded most recent conversation (%d messages)", self.chat_type, len(self.chat_log))
             else:
                 # Start fresh if no previous conversation exists
                 self.chat_log = []
-                print("No previous conversation found, starting fresh")
+                logger.info("[%s] No previous conversation found, starting fresh", self.chat_type)
         except Exception as e:
-            print(f"Error loading current chat: {e}")
+            logger.error("Error loading current chat: %s", e)
             self.chat_log = []
     
     def send_message(self, user_input, max_tokens=1024, temperature=0.7):
@@ -74,50 +100,31 @@ class MemoryChatClient:
         # Add user message to chat log
         self.add_message("user", user_input)
         
+        # Only search for relevant conversations when the user refers to one
+        wants_memory = self.is_memory_query(user_input)
+        
         # Generate memory context based on the chat type and current query
         memory_context = self.memory_manager.get_memory_context(
             self.chat_type, 
-            current_query=user_input
+            current_query=user_input if wants_memory else None
         )
         
-        # Combine base system prompt with memory context
-        system_prompt = self.base_system_prompt
-        if memory_context["system_context"]:
-            system_prompt += "\n\n" + memory_context["system_context"]
-        
-        # If we have relevant memories, add them to the context
+        # Relevant memories only go into this request: they are capped, skip
+        # anything already in the chat log and are never saved back to storage
+        recalled = None
         relevant_memories = memory_context.get("relevant_memories", [])
-        if relevant_memories and self.is_memory_query(user_input):
-            # Add a natural transition to introducing memories
-            self.chat_log.append({
-                "role": "assistant",
-                "content": "I recall we've discussed something similar before. Let me think about what we talked about...",
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Add each relevant memory naturally
-            for memory in relevant_memories:
-                # Extract key information from the memory
-                messages = memory["conversation"]
-                if messages:
-                    # Find a representative user question
-                    user_messages = [m for m in messages if m.get("role") == "user"]
-                    if user_messages:
-                        user_q = user_messages[0]["content"]
-                        # Find the corresponding assistant response
-                        for i, msg in enumerate(messages):
-                            if msg.get("role") == "user" and msg["content"] == user_q and i+1 < len(messages):
-                                assistant_resp = messages[i+1].get("content", "")
-                                
-                                # Add a natural recollection
-                                recollection = f"I remember you asked me about '{user_q[:50]}...' and I explained that {assistant_resp[:100]}..."
-                                
-                                self.chat_log.append({
-                                    "role": "assistant",
-                                    "content": recollection,
-                                    "timestamp": datetime.now().isoformat()
-                                })
-                                break
+        if relevant_memories:
+            recalled = build_recalled_context(
+                relevant_memories, self.chat_log, max_tokens=self.recall_max_tokens
+            )
+        
+        # Static persona first, then the slow-changing memory context, each
+        # ending in a cache breakpoint; recalled memories are never cached
+        system_prompt = build_system_blocks(
+            self.base_system_prompt,
+            memory_context["system_context"],
+            recalled
+        )
         
         try:
             # Prepare messages for the API
@@ -126,44 +133,63 @@ class MemoryChatClient:
                 for msg in self.chat_log
             ]
             
+            client, model, _ = self.route_request(user_input, system_prompt, messages, max_tokens)
+            
+            request = {
+                "model": model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "system": system_prompt,
+                "messages": messages
+            }
+            
             # Send to Anthropic API
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system=system_prompt,
-                messages=messages
-            )
+            with timed("provider.create", self.chat_type):
+                response = client.messages.create(**request)
+            self.last_usage = usage_report(getattr(response, "usage", None))
+            logger.info("[%s] %s", self.chat_type, format_usage(self.last_usage), extra=self.last_usage)
             
             # Get the response text
             assistant_message = response.content[0].text
+            usage_tracker.record(
+                self.chat_type, request, self.last_usage, assistant_message,
+                recalled_bytes=len((recalled or "").encode("utf-8"))
+            )
             
             # Add to chat log
             self.add_message("assistant", assistant_message)
             
             # Generate summary and update metadata for the current conversation
+            # (queued on the background worker when enabled)
             self.update_conversation_metadata()
             
             return assistant_message
             
         except Exception as e:
-            print(f"Error sending message: {e}")
-            return str(e)
+            # Surface provider failures to the caller instead of replying with them
+            logger.error("Error sending message: %s", e)
+            raise
+    
+    def route_request(self, user_input, system_prompt, messages, max_tokens):
+        """
+        Choose the client and model for a request
+        
+        Returns:
+            tuple: (client, model, route); route is None without a router
+        """
+        if not self.router:
+            return self.client, self.model, None
+        
+        context_tokens = estimate_tokens(system_text(system_prompt)) + sum(
+            estimate_tokens(msg["content"]) for msg in messages
+        )
+        route = self.router.route(self.chat_type, user_input, context_tokens, max_tokens)
+        client, _ = self.router.clients_for(route.provider)
+        return client, route.model, route
     
     def is_memory_query(self, message):
         """Check if the message is asking about previous conversations"""
-        memory_phrases = [
-            r"remember when",
-            r"remember talking about",
-            r"we discussed",
-            r"we talked about",
-            r"previous conversation",
-            r"earlier you said",
-            r"you told me",
-            r"you mentioned",
-            r"you said"
-        ]
-        return any(re.search(phrase, message.lower()) for phrase in memory_phrases)
+        return is_memory_query(message)
     
     def add_message(self, role, content):
         """Add a message to the chat log"""
@@ -197,29 +223,40 @@ class MemoryChatClient:
                 "conversation": self.chat_log,
                 "metadata": metadata
             }
-            self.db.save_conversation(conversation)
+            chat_id = self.db.save_conversation(conversation)
+            if chat_id is not None:
+                self.current_chat_id = chat_id
             
             return True
         except Exception as e:
-            print(f"Error saving conversation: {e}")
+            logger.error("Error saving conversation: %s", e)
             return False
     
     def update_conversation_metadata(self):
         """Update metadata for the current conversation"""
+        # Every turn saves a new row, so the job is keyed by session and looks
+        # up the newest row when it runs: turns that arrive while it waits
+        # merge into one update
+        if self.metadata_worker:
+            return self.metadata_worker.submit(self.chat_type, self.summarize_latest)
+        return self.summarize_latest()
+    
+    def summarize_latest(self):
+        """Generate summary and topics for the newest saved row of this chat"""
         try:
-            # Get most recent conversation ID
-            results = self.db.get_conversations_by_type(self.chat_type, limit=1)
-            if results:
-                conversation = results[0]
-                chat_id = conversation["chat_id"]
-                
-                # Use memory manager to generate summary and topics
-                self.memory_manager.generate_conversation_summary(chat_id)
-                
-                return True
-            return False
+            chat_id = self.current_chat_id
+            if chat_id is None:
+                # Fall back to the most recent conversation ID
+                results = self.db.get_conversations_by_type(self.chat_type, limit=1)
+                if not results:
+                    return False
+                chat_id = results[0]["chat_id"]
+            
+            # Use memory manager to generate summary and topics, folding in
+            # only the messages added since the last update of this chat
+            return self.memory_manager.generate_conversation_summary(chat_id, session_key=self.chat_type)
         except Exception as e:
-            print(f"Error updating conversation metadata: {e}")
+            logger.error("Error updating conversation metadata: %s", e)
             return False
     
     def _extract_questions(self):
@@ -249,16 +286,22 @@ class MemoryChatClient:
     def clear_current_chat(self):
         """Clear the current chat and start a new conversation"""
         self.chat_log = []
-        print("Started a new conversation")
+        self.current_chat_id = None
+        self.memory_manager.summarizer.reset(self.chat_type)
+        logger.info("[%s] Started a new conversation", self.chat_type)
 
 # Example command-line interface for testing
 if __name__ == "__main__":
     import argparse
     
+    configure_logging()
     parser = argparse.ArgumentParser(description='Memory-enhanced chat client')
     parser.add_argument('--type', type=str, default="claude", help='Chat type (claude, bedrock)')
-    parser.add_argument('--model', type=str, default="claude-3-sonnet-20240229", help='Model name')
+    parser.add_argument('--model', type=str, default="auto", help='Model name, or "auto" to route per message')
     parser.add_argument('--clear', action='store_true', help='Clear chat history and start new chat')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_MODE, choices=PROFILE_MODES,
+                        help='Profile each turn (cprofile or sample) and write a dump to --profile-dir')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='Directory for profile dumps')
     
     args = parser.parse_args()
     
@@ -270,10 +313,13 @@ If you don't remember something specific that the user refers to, it's okay to s
 you don't recall, just as humans sometimes forget details of conversations.
 Never refer to having a "memory system" or "database" - just recall things naturally."""
     
+    # "auto" lets the router pick the model per message
+    router = ModelRouter() if args.model == "auto" else None
     chat_client = MemoryChatClient(
         chat_type=args.type,
-        model=args.model,
-        base_system_prompt=system_prompt
+        model=DEFAULT_POLICY["models"][0] if router else args.model,
+        base_system_prompt=system_prompt,
+        router=router
     )
     
     if args.clear:
@@ -308,5 +354,18 @@ Never refer to having a "memory system" or "database" - just recall things natur
         
         print("\nYou:", user_input)
         print("\nClaude: ", end="", flush=True)
-        response = chat_client.send_message(user_input)
-        print(response) 
\ No newline at end of file
+        try:
+            if args.profile:
+                # Only the turn is profiled, not the time spent typing
+                with profiled(f"memory_chat_client-{args.type}", args.profile, args.profile_dir):
+                    response = chat_client.send_message(user_input)
+            else:
+                response = chat_client.send_message(user_input)
+        except Exception as e:
+            print(f"[request failed: {e}]")
+            continue
+        print(response)
+    
+    # Let pending metadata updates finish before exiting
+    if chat_client.metadata_worker:
+        chat_client.metadata_worker.shutdown(drain=True)
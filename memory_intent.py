@@ -0,0 +1,40 @@
+"""
+Memory Intent Module
+
+Shared, precompiled gate deciding whether a user message refers to earlier
+conversations. Both ChatClient and MemoryChatClient use it before running any
+memory retrieval, so the FTS search is skipped on ordinary turns.
+"""
+
+import re
+
+# Phrases that signal the user is asking about a previous conversation.
+# Union of the lists ChatClient and MemoryChatClient used to keep separately.
+MEMORY_PHRASES = [
+    "remember when",
+    "remember talking about",
+    "we discussed",
+    "we talked about",
+    "previous conversation",
+    "earlier we",
+    "earlier you said",
+    "before we",
+    "you told me",
+    "you mentioned",
+    "you said"
+]
+
+# A single alternation compiled once; word boundaries stop matches such as
+# "before weekend" or "yousaid" that plain substring checks let through, while
+# plurals ("previous conversations") still match
+MEMORY_QUERY_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(phrase).replace(r"\ ", r"\s+") for phrase in MEMORY_PHRASES) + r")s?\b",
+    re.IGNORECASE
+)
+
+
+def is_memory_query(message: str) -> bool:
+    """Check if the message is asking about previous conversations"""
+    if not message:
+        return False
+    return MEMORY_QUERY_PATTERN.search(message) is not None
@@ -3,8 +3,12 @@ import json
 import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-import spacy
-import numpy as np
+import threading
+from incremental_summarizer import IncrementalSummarizer
+from metrics import persona_context, timed
+from log_config import configure_logging, get_logger
+
+logger = get_logger(__name__)
 
 class MemoryManager:
     def __init__(
@@ -33,15 +37,40 @@ class MemoryManager:
             "long_term": 10    # Next 10 conversations as brief mentions
         }
         
-        # Load spaCy model for NLP tasks
-        try:
-            self.nlp = spacy.load(nlp_model)
-        except:
-            # If model not found, download it
-            import sys
-            import subprocess
-            subprocess.check_call([sys.executable, "-m", "spacy", "download", nlp_model])
-            self.nlp = spacy.load(nlp_model)
+        # spaCy and the summarizer are loaded on first use (see the nlp property);
+        # importing spaCy and its model takes seconds
+        self.nlp_model = nlp_model
+        self._nlp = None
+        self._summarizer = None
+        self._load_lock = threading.Lock()
+    
+    @property
+    def nlp(self):
+        """The spaCy pipeline, loaded (and downloaded if missing) on first use"""
+        if self._nlp is None:
+            with self._load_lock:
+                if self._nlp is None:
+                    with timed("memory.spacy_load"):
+                        import spacy
+                        try:
+                            self._nlp = spacy.load(self.nlp_model)
+                        except:
+                            # If model not found, download it
+                            import sys
+                            import subprocess
+                            subprocess.check_call([sys.executable, "-m", "spacy", "download", self.nlp_model])
+                            self._nlp = spacy.load(self.nlp_model)
+        return self._nlp
+    
+    @property
+    def summarizer(self):
+        """Rolling per-session summary state, so updates only process new messages"""
+        if self._summarizer is None:
+            nlp = self.nlp
+            with self._load_lock:
+                if self._summarizer is None:
+                    self._summarizer = IncrementalSummarizer(nlp)
+        return self._summarizer
     
     def get_memory_context(
         self, 
@@ -65,6 +94,10 @@ class MemoryManager:
                 "relevant_memories": List[Dict]  # Conversations relevant to current query
             }
         """
+        with persona_context(chat_type), timed("memory.context"):
+            return self._build_memory_context(chat_type, current_query)
+    
+    def _build_memory_context(self, chat_type: str, current_query: Optional[str]) -> Dict[str, Any]:
         memory_context = {
             "system_context": "",
             "immediate_memory": [],
@@ -140,6 +173,7 @@ class MemoryManager:
                 results.append(conversation)
             return results
     
+    @timed("memory.relevant_search")
     def _find_relevant_conversations(
         self, 
         chat_type: str, 
@@ -183,9 +217,10 @@ class MemoryManager:
                 return results
                 
         except Exception as e:
-            print(f"Error finding relevant conversations: {e}")
+            logger.error("Error finding relevant conversations: %s", e)
             return []
     
+    @timed("memory.detailed_summary")
     def _generate_detailed_summary(self, conversation: Dict) -> str:
         """Generate a detailed summary of a conversation"""
         # Extract messages
@@ -227,7 +262,7 @@ class MemoryManager:
                     main_point = sentences[0]
                     summary += f"You asked about {main_point}"
             except Exception as e:
-                print(f"Error generating detailed summary: {e}")
+                logger.error("Error generating detailed summary: %s", e)
                 # Fallback to simple summary
                 first_msg = messages[0]["content"] if messages else ""
                 summary += f"You started by saying: '{first_msg[:50]}...'"
@@ -310,93 +345,71 @@ class MemoryManager:
                 return True
                 
         except Exception as e:
-            print(f"Error updating conversation metadata: {e}")
+            logger.error("Error updating conversation metadata: %s", e)
             return False
     
-    def generate_conversation_summary(self, chat_id: int):
-        """Generate and store a summary for a conversation"""
+    def generate_conversation_summary(self, chat_id: int, session_key: Optional[str] = None):
+        """
+        Generate and store a summary for a conversation
+        
+        Args:
+            chat_id: Conversation to summarize
+            session_key: Chat session the conversation belongs to. Conversations
+                saved under the same key are summarized incrementally, folding in
+                only the messages added since the previous call. Defaults to chat_id.
+        """
+        key = session_key if session_key is not None else chat_id
         try:
             with sqlite3.connect(self.db_path) as conn:
-                # Get conversation
-                conn.row_factory = sqlite3.Row
-                cursor = conn.execute(
-                    "SELECT * FROM conversations WHERE chat_id = ?", 
-                    (chat_id,)
-                )
-                row = cursor.fetchone()
+                processed, last_content = self.summarizer.checkpoint(key)
+                row = conn.execute(
+                    """
+                    SELECT timestamp, json_array_length(conversation), json_extract(conversation, ?)
+                    FROM conversations WHERE chat_id = ?
+                    """,
+                    (f"$[{max(processed - 1, 0)}].content", chat_id)
+                ).fetchone()
                 if not row:
                     return False
+                timestamp, total, boundary_content = row
                 
-                # Convert to dict
-                conversation = {
-                    "chat_id": row["chat_id"],
-                    "chat_type": row["chat_type"],
-                    "user_id": row["user_id"],
-                    "timestamp": row["timestamp"],
-                    "conversation": json.loads(row["conversation"]),
-                    "metadata": json.loads(row["metadata"])
-                }
-                
-                # Generate summary
-                summary = self._generate_detailed_summary(conversation)
-                
-                # Extract topics
-                topics = self._extract_topics(conversation)
-                
-                # Update metadata
-                metadata = {
-                    "summary": summary,
-                    "topics": topics
-                }
+                # Continue from where the session left off unless the log was
+                # cleared or rewritten since, in which case start over
+                continues = processed and total >= processed and boundary_content == last_content
+                offset = processed if continues else 0
                 
-                return self.update_conversation_metadata(chat_id, metadata)
+                with timed("memory.summarize"):
+                    metadata = self.summarizer.extend(
+                        key, self._load_messages_from(conn, chat_id, offset), offset, timestamp
+                    )
+                    if metadata is None:
+                        # Another update for this session landed in between
+                        metadata = self.summarizer.extend(
+                            key, self._load_messages_from(conn, chat_id, 0), 0, timestamp
+                        )
+            
+            return self.update_conversation_metadata(chat_id, metadata)
                 
         except Exception as e:
-            print(f"Error generating conversation summary: {e}")
+            logger.error("Error generating conversation summary: %s", e)
             return False
     
-    def _extract_topics(self, conversation: Dict) -> List[str]:
-        """Extract topics from a conversation"""
-        # Extract all user messages
-        user_messages = [
-            msg["content"] for msg in conversation["conversation"] 
-            if msg.get("role") == "user"
-        ]
-        
-        if not user_messages:
-            return []
-        
-        # Join all user messages
-        text = " ".join(user_messages)
-        
-        try:
-            # Process with spaCy
-            doc = self.nlp(text[:2000])  # Limit to first 2000 chars for efficiency
-            
-            # Extract noun chunks and named entities as potential topics
-            topics = []
-            
-            # Add named entities
-            for ent in doc.ents:
-                if ent.label_ in ["ORG", "PERSON", "GPE", "LOC", "PRODUCT", "WORK_OF_ART"]:
-                    topics.append(ent.text.lower())
-            
-            # Add noun chunks (filtered by length)
-            for chunk in doc.noun_chunks:
-                if len(chunk.text.split()) >= 2:  # Only multi-word chunks
-                    topics.append(chunk.text.lower())
-            
-            # Deduplicate and limit
-            topics = list(set(topics))[:5]  # Limit to top 5
-            
-            return topics
-            
-        except Exception as e:
-            print(f"Error extracting topics: {e}")
-            return []
+    def _load_messages_from(self, conn, chat_id: int, offset: int) -> List[Dict]:
+        """Load the messages of a conversation from index `offset` on, decoding only those"""
+        cursor = conn.execute(
+            """
+            SELECT message.value
+            FROM conversations, json_each(conversations.conversation) AS message
+            WHERE conversations.chat_id = ? AND message.key >= ?
+            ORDER BY message.key
+            """,
+            (chat_id, offset)
+        )
+        return [json.loads(value) for (value,) in cursor]
 
 # Example usage
 if __name__ == "__main__":
+    configure_logging()
     memory_manager = MemoryManager()
     
     # List chat types
@@ -7,13 +7,19 @@ Uses Mistral from AWS Bedrock to extract metadata from conversations for better
 import json
 import re
 import time
-import boto3
-import os
 from dotenv import load_dotenv
+from provider_registry import registry
+from response_cache import get_response_cache
+from log_config import configure_logging, get_logger
+
+# Bedrock model used for metadata extraction
+METADATA_MODEL_ID = 'mistral.mistral-small-2402-v1:0'
 
 # Ensure environment variables are loaded
 load_dotenv()
 
+logger = get_logger(__name__)
+
 def extract_json_from_response(response_text):
     """
     Extract JSON from Mistral's response
@@ -33,20 +39,21 @@ def extract_json_from_response(response_text):
                 json_text = json_match.group(0)
                 return json.loads(json_text)
         except Exception as e:
-            print(f"JSON parsing error: {e}")
+            logger.warning("JSON parsing error: %s", e)
 
     return {}
 
-def generate_metadata_with_mistral(text):
+def generate_metadata_with_mistral(text, use_cache=True):
     """
     Generate rich metadata from conversation text using Mistral from AWS Bedrock
+    
+    Args:
+        text: Conversation text to analyze
+        use_cache: Serve repeated requests for the same text from the on-disk response cache
     """
     try:
-        # Initialize Bedrock client
-        bedrock = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
+        # Reuse the process-wide Bedrock runtime client and its connection pool
+        bedrock = registry.bedrock_runtime()
 
         prompt = f"""
         Extract the following metadata from the given conversation:
@@ -71,28 +78,36 @@ def generate_metadata_with_mistral(text):
         """
 
         # Prepare the request body for Bedrock
-        request_body = {
-            "prompt": prompt,
+        params = {
             "max_tokens": 300,
             "temperature": 0.2,
             "top_p": 0.95,
             "stop": ["</s>"]
         }
+        request_body = {"prompt": prompt, **params}
+
+        def invoke():
+            # Call Bedrock API, within the shared Bedrock concurrency limit
+            with registry.limit("bedrock"):
+                response = bedrock.invoke_model(
+                    modelId=METADATA_MODEL_ID,
+                    body=json.dumps(request_body)
+                )
 
-        # Call Bedrock API
-        response = bedrock.invoke_model(
-            modelId='mistral.mistral-small-2402-v1:0',
-            body=json.dumps(request_body)
-        )
+            # Parse the response
+            response_body = json.loads(response.get('body').read())
+            # Empty completions are returned as None so they aren't cached
+            return response_body.get('completion', '') or None
 
-        # Parse the response
-        response_body = json.loads(response.get('body').read())
-        response_text = response_body.get('completion', '')
+        if use_cache:
+            response_text = get_response_cache().get_or_call(METADATA_MODEL_ID, prompt, params, invoke)
+        else:
+            response_text = invoke()
 
-        return extract_json_from_response(response_text)
+        return extract_json_from_response(response_text or '')
 
     except Exception as e:
-        print(f"Metadata generation error: {e}")
+        logger.error("Metadata generation error: %s", e)
         return None
 
 def analyze_conversation(conversation, analysis_type='full'):
@@ -129,6 +144,7 @@ def analyze_conversation(conversation, analysis_type='full'):
 
 
 if __name__ == "__main__":
+    configure_logging()
     # Test with a sample conversation
     test_conversation = [
         {"role": "user", "content": "Tell me about dolphins"},
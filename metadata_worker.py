@@ -0,0 +1,140 @@
+"""
+Metadata Worker Module
+
+Runs conversation metadata updates (summaries, topics) on a background thread
+so chat replies can return as soon as the model has answered.
+Jobs are de-duplicated per key and the queue is drained on shutdown.
+"""
+
+import atexit
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Sentinel placed on the queue to stop the worker thread
+_STOP = object()
+
+
+class MetadataWorker:
+    """
+    Background worker with a bounded queue and per-key de-duplication.
+
+    Submitting a job for a key that is already waiting replaces its arguments
+    instead of queueing a second run.
+    """
+
+    def __init__(self, max_queue: int = 100, name: str = "metadata-worker"):
+        """
+        Initialize the worker
+
+        Args:
+            max_queue (int): Maximum number of distinct keys waiting to run
+            name (str): Name of the worker thread
+        """
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.processed = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the worker thread if it isn't running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, key: Any, func: Callable, *args, **kwargs) -> bool:
+        """
+        Schedule func(*args, **kwargs) to run in the background
+
+        Args:
+            key: De-duplication key (e.g. chat type)
+            func: Callable to run
+
+        Returns:
+            bool: True if the job was queued or merged into a waiting job
+        """
+        if self._stopping:
+            return False
+        self.start()
+
+        with self._lock:
+            if key in self._pending:
+                # Already waiting: just refresh the arguments
+                self._pending[key] = (func, args, kwargs)
+                return True
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                self.dropped += 1
+                logger.warning("Metadata queue full, dropping update for %s", key)
+                return False
+            self._pending[key] = (func, args, kwargs)
+            return True
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting to run"""
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        """Process queued jobs until the stop sentinel is reached"""
+        while True:
+            key = self._queue.get()
+            try:
+                if key is _STOP:
+                    return
+                with self._lock:
+                    job = self._pending.pop(key, None)
+                if job is None:
+                    continue
+                func, args, kwargs = job
+                try:
+                    func(*args, **kwargs)
+                    self.processed += 1
+                except Exception as e:
+                    logger.exception("Error running metadata update for %s: %s", key, e)
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Stop the worker
+
+        Args:
+            drain (bool): Run all waiting jobs before stopping; otherwise discard them
+            timeout (float): Seconds to wait for the worker thread to finish
+        """
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+            if not drain:
+                self._pending.clear()
+        if not thread or not thread.is_alive():
+            return
+        # Blocks until there is room, so every queued key is processed first
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+
+_default_worker: Optional[MetadataWorker] = None
+_default_lock = threading.Lock()
+
+
+def get_metadata_worker() -> MetadataWorker:
+    """Get the process-wide metadata worker, creating it on first use"""
+    global _default_worker
+    with _default_lock:
+        if _default_worker is None:
+            _default_worker = MetadataWorker()
+            atexit.register(_default_worker.shutdown, True, 30)
+        return _default_worker
@@ -0,0 +1,154 @@
+"""
+Metrics Module
+
+Stage-level latency histograms for chat turns. Code wraps each stage (SQLite
+calls, FTS search, memory context, summarization, provider calls) in
+`timed(stage)`, and durations are aggregated per (stage, persona) into
+Prometheus-style cumulative histograms, exposed by `/metrics` in the text
+exposition format. The persona comes from a context variable that ChatClient
+sets for the duration of a turn, so deep helpers like SQLiteClient don't need
+it passed in.
+
+Each worker process keeps its own registry; Prometheus scrapes whichever
+worker answers, so rates are per worker.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, from a fast SQLite read to a slow completion
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Persona label for stages that run outside a chat turn
+NO_PERSONA = "none"
+
+current_persona = contextvars.ContextVar("current_persona", default=NO_PERSONA)
+
+
+@contextmanager
+def persona_context(persona: Optional[str]):
+    """Attribute every stage timed inside the block to a persona"""
+    token = current_persona.set(persona or NO_PERSONA)
+    try:
+        yield
+    finally:
+        current_persona.reset(token)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets (not thread-safe; the registry locks)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield bound, running
+        yield float("inf"), self.count
+
+
+class MetricsRegistry:
+    """Stage latency histograms and error counts keyed by (stage, persona)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, persona: Optional[str] = None, error: bool = False):
+        """Record one stage duration"""
+        key = (stage, persona or current_persona.get())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Count, mean and error count per stage and persona, for quick inspection"""
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (stage, persona), histogram in sorted(self._histograms.items()):
+                result.setdefault(stage, {})[persona] = {
+                    "count": histogram.count,
+                    "mean_seconds": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                    "errors": self._errors.get((stage, persona), 0)
+                }
+            return result
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = [
+            "# HELP chat_stage_seconds Time spent in each stage of a chat turn.",
+            "# TYPE chat_stage_seconds histogram"
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            errors = sorted(self._errors.items())
+            for (stage, persona), histogram in items:
+                labels = f'stage="{_escape(stage)}",persona="{_escape(persona)}"'
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'chat_stage_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"chat_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"chat_stage_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP chat_stage_errors_total Stages that ended in an exception.")
+        lines.append("# TYPE chat_stage_errors_total counter")
+        for (stage, persona), count in errors:
+            lines.append(f'chat_stage_errors_total{{stage="{_escape(stage)}",persona="{_escape(persona)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage: str, persona: Optional[str] = None, registry: Optional[MetricsRegistry] = None):
+    """
+    Time a block (or, as a decorator, every call of a function) as one stage
+
+    Args:
+        stage: Stage name, e.g. "sqlite.fts_search" or "provider.create"
+        persona: Persona label; defaults to the current turn's persona
+        registry: Registry to record into (defaults to the process-wide one)
+    """
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        (registry or metrics).observe(stage, time.perf_counter() - started, persona, error)
@@ -0,0 +1,214 @@
+"""
+Model Router Module
+
+Picks the model and provider for each request from the message size, the
+persona's routing policy, recently observed p95 latency and a per-request
+latency/cost budget. Short small-talk turns stay on the lightest model; long
+messages may use a heavier one when it fits the budget. Every decision is
+recorded for inspection.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from context_window import estimate_tokens
+from provider_registry import registry as default_registry
+from resilience import build_failover_clients
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Relative weight and price (USD per million tokens) of each model
+MODEL_PROFILES = {
+    "claude-3-haiku-20240307": {"tier": 1, "input_cost": 0.25, "output_cost": 1.25},
+    "claude-3-5-haiku-20241022": {"tier": 2, "input_cost": 0.80, "output_cost": 4.00},
+    "claude-3-sonnet-20240229": {"tier": 3, "input_cost": 3.00, "output_cost": 15.00},
+    "claude-3-5-sonnet-20241022": {"tier": 3, "input_cost": 3.00, "output_cost": 15.00}
+}
+
+# Routing policy used for personas without their own
+DEFAULT_POLICY = {
+    # Candidate models, lightest first
+    "models": ["claude-3-haiku-20240307", "claude-3-5-sonnet-20241022"],
+    # Providers in order of preference
+    "providers": ["anthropic", "bedrock"],
+    # Messages shorter than this (estimated tokens) always use the lightest model
+    "heavy_min_tokens": 300,
+    # A model/provider whose observed p95 exceeds this is skipped
+    "latency_budget_ms": 15000,
+    # Skip models whose estimated cost for the request exceeds this (USD)
+    "max_cost": 0.05
+}
+
+# Latency samples kept per (provider, model), and how many are needed before
+# the p95 is trusted
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 5
+
+# Latency recorded for a failed or timed-out attempt, in seconds, so a provider
+# that keeps failing drifts over its latency budget instead of looking fast
+FAILURE_PENALTY = float(os.getenv("ROUTER_FAILURE_PENALTY", "60"))
+
+
+class Route:
+    """The model and provider chosen for one request"""
+
+    def __init__(self, model: str, provider: str, reason: str):
+        self.model = model
+        self.provider = provider
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Route({self.model!r}, {self.provider!r}, {self.reason!r})"
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per (provider, model)"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, provider: str, model: str, seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault((provider, model), deque(maxlen=self.window))
+            samples.append(seconds * 1000)
+
+    def p95(self, provider: str, model: str, min_samples: int = MIN_LATENCY_SAMPLES) -> Optional[float]:
+        """p95 latency in milliseconds, or None until enough samples are recorded"""
+        with self._lock:
+            samples = sorted(self._samples.get((provider, model), ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+class ModelRouter:
+    def __init__(self, policies: Optional[Dict[str, Dict]] = None, registry=None, max_decisions: int = 500):
+        """
+        Initialize the router
+
+        Args:
+            policies (Dict[str, Dict]): Routing policy per persona; missing keys
+                fall back to DEFAULT_POLICY
+            registry: ProviderRegistry used to build provider clients
+            max_decisions (int): Number of recent decisions to keep
+        """
+        self.policies = policies or {}
+        self.registry = registry or default_registry
+        self.latency = LatencyTracker()
+        self.decisions = deque(maxlen=max_decisions)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def policy(self, persona: Optional[str]) -> Dict:
+        """Get the effective routing policy for a persona"""
+        return {**DEFAULT_POLICY, **self.policies.get(persona, {})}
+
+    def route(self, persona: Optional[str], user_input: str, context_tokens: int = 0, max_tokens: int = 1024) -> Route:
+        """
+        Choose the model and provider for a request
+
+        Args:
+            persona (str): Chat type the request belongs to
+            user_input (str): The user's new message
+            context_tokens (int): Estimated input tokens of the whole request
+            max_tokens (int): Maximum tokens the reply may use
+
+        Returns:
+            Route: The chosen model and provider
+        """
+        policy = self.policy(persona)
+        message_tokens = estimate_tokens(user_input)
+        models = policy["models"]
+
+        if message_tokens < policy["heavy_min_tokens"]:
+            candidates = models[:1]
+            reason = "short message"
+        else:
+            candidates = list(reversed(models))
+            reason = "long message"
+
+        route = None
+        for model in candidates:
+            cost = self.estimate_cost(model, context_tokens, max_tokens)
+            if cost > policy["max_cost"]:
+                reason = f"{model} over cost budget"
+                continue
+            for provider in policy["providers"]:
+                p95 = self.latency.p95(provider, model)
+                if p95 is not None and p95 > policy["latency_budget_ms"]:
+                    reason = f"{provider}/{model} over latency budget"
+                    continue
+                route = Route(model, provider, reason)
+                break
+            if route:
+                break
+
+        if route is None:
+            # Nothing fits the budget: use the lightest model on the fastest provider
+            model = models[0]
+            provider = min(
+                policy["providers"],
+                key=lambda name: self.latency.p95(name, model, min_samples=1) or 0.0
+            )
+            route = Route(model, provider, f"{reason}; fallback to lightest")
+
+        self._record(persona, route, message_tokens, context_tokens)
+        return route
+
+    def observe(self, provider: str, model: str, seconds: float, ok: bool = True):
+        """
+        Record how long an attempt on a provider took
+
+        Args:
+            provider (str): Provider that handled the attempt
+            model (str): Model the request was routed to
+            seconds (float): Time the attempt took
+            ok (bool): False for a failed or timed-out attempt, which is
+                recorded as at least FAILURE_PENALTY
+        """
+        self.latency.observe(provider, model, seconds if ok else max(seconds, FAILURE_PENALTY))
+
+    def clients_for(self, provider: str):
+        """
+        Get the (sync, async) failover clients that prefer a provider
+
+        Every attempt they make is reported to observe(), under the provider
+        that actually handled it.
+        """
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = build_failover_clients(provider, self.registry, observer=self.observe)
+            return self._clients[provider]
+
+    def recent_decisions(self, limit: int = 50) -> List[Dict]:
+        """Most recent routing decisions, newest last"""
+        return list(self.decisions)[-limit:]
+
+    @staticmethod
+    def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+        """Worst-case cost of a request in USD (assumes the reply uses all of max_tokens)"""
+        profile = MODEL_PROFILES.get(model)
+        if not profile:
+            return 0.0
+        return (input_tokens * profile["input_cost"] + output_tokens * profile["output_cost"]) / 1_000_000
+
+    def _record(self, persona: Optional[str], route: Route, message_tokens: int, context_tokens: int):
+        self.decisions.append({
+            "time": time.time(),
+            "persona": persona,
+            "model": route.model,
+            "provider": route.provider,
+            "reason": route.reason,
+            "message_tokens": message_tokens,
+            "context_tokens": context_tokens,
+            "p95_ms": self.latency.p95(route.provider, route.model)
+        })
+        logger.debug("[router] %s: %s via %s (%s)", persona or 'chat', route.model, route.provider, route.reason, extra={
+            "model": route.model, "provider": route.provider, "reason": route.reason
+        })
@@ -0,0 +1,198 @@
+"""
+Profiling Module
+
+Opt-in profiling of a single chat request or CLI run. Web requests are only
+ever profiled when PROFILE_ENABLED is set and PROFILE_SECRET is configured; a
+request is then profiled when its X-Profile header or ?profile= carries the
+secret, or when it is picked by PROFILE_SAMPLE_RATE. The whole turn runs in
+one worker thread under the profiler and a dump is written to PROFILE_DIR:
+
+- cprofile: deterministic, written as .pstats (snakeviz, gprof2dot,
+  `python -m pstats`)
+- sample: a stack sampler of the profiled thread, written as collapsed stacks
+  (.collapsed) for flamegraph.pl, speedscope or inferno
+
+When profiling is off the cost per request is one flag check. At most
+PROFILE_MAX_CONCURRENT profiles run at once; extra requests run unprofiled.
+Only the newest PROFILE_MAX_FILES dumps are kept in a directory.
+"""
+
+import cProfile
+import glob
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple
+
+from log_config import get_logger
+
+# Web request profiling is off unless this is set and PROFILE_SECRET is too
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Oldest dumps beyond this many are deleted (0 keeps them all)
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# Fraction of requests profiled without being asked (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# "cprofile" or "sample"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+
+# Seconds between stack samples in "sample" mode
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+
+# Value X-Profile / ?profile= must carry
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_MODES = ("cprofile", "sample")
+
+logger = get_logger(__name__)
+
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+
+def should_profile(header_value: Optional[str] = None, query_value: Optional[str] = None) -> bool:
+    """
+    Decide whether to profile a request
+
+    Always False unless PROFILE_ENABLED and PROFILE_SECRET are both configured.
+
+    Args:
+        header_value: Value of the X-Profile header, if any
+        query_value: Value of the ?profile= query parameter, if any
+    """
+    if not (PROFILE_ENABLED and PROFILE_SECRET):
+        return False
+    for value in (header_value, query_value):
+        if value:
+            return hmac.compare_digest(value, PROFILE_SECRET)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile_path(name: str, mode: str, directory: Optional[str] = None) -> str:
+    """Unique dump path: <directory>/<name>-<timestamp>-<pid>-<thread>.<ext>"""
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name) or "profile"
+    extension = "pstats" if mode == "cprofile" else "collapsed"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{safe_name}-{stamp}-{os.getpid()}-{threading.get_ident()}.{extension}")
+
+
+def prune_dumps(directory: str, keep: Optional[int] = None):
+    """Delete all but the newest `keep` dumps in a directory"""
+    keep = PROFILE_MAX_FILES if keep is None else keep
+    if keep <= 0:
+        return
+    dumps = []
+    for pattern in ("*.pstats", "*.collapsed"):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            try:
+                dumps.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # Removed by a concurrent prune
+    dumps.sort(reverse=True)
+    for _, path in dumps[keep:]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Could not remove old profile %s: %s", path, e)
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and counts
+    identical stacks, in the collapsed format flame graph tools read
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(name: str, mode: Optional[str] = None, directory: Optional[str] = None):
+    """
+    Profile the block in the current thread and write a dump when it ends
+
+    Yields the path the dump will be written to, or None if every profiling
+    slot is busy (the block then runs unprofiled).
+    """
+    mode = mode or PROFILE_MODE
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if not _slots.acquire(blocking=False):
+        yield None
+        return
+
+    path = profile_path(name, mode, directory)
+    profiler = cProfile.Profile() if mode == "cprofile" else StackSampler()
+    started = time.perf_counter()
+    try:
+        if mode == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+        yield path
+    finally:
+        if mode == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            profiler.write(path)
+        _slots.release()
+        prune_dumps(os.path.dirname(path))
+        elapsed = time.perf_counter() - started
+        logger.info("[profile] %s: %.3fs -> %s", name, elapsed, path, extra={"profile_path": path, "elapsed_seconds": round(elapsed, 6)})
+
+
+def profile_call(name: str, fn: Callable, *args, mode: Optional[str] = None, **kwargs) -> Tuple[Any, Optional[str]]:
+    """
+    Call fn(*args, **kwargs) under the profiler
+
+    Returns:
+        tuple: (fn's result, dump path or None if it ran unprofiled)
+    """
+    with profiled(name, mode) as path:
+        return fn(*args, **kwargs), path
@@ -0,0 +1,91 @@
+"""
+Prompt Cache Module
+
+Structures system prompts into cacheable blocks for Anthropic prompt caching:
+the static persona first, then slow-changing context (memory tiers), each
+ending in a cache breakpoint, followed by the rolling summary and per-request
+context that are never cached. Also normalizes the cache token counts reported in responses.
+"""
+
+from typing import Dict, List, Optional
+
+# Marks the end of a cacheable prefix
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def build_system_blocks(
+    static_prompt: str,
+    slow_context: Optional[str] = None,
+    request_context: Optional[str] = None,
+    summary: Optional[str] = None
+) -> List[Dict]:
+    """
+    Build the system prompt as a list of text blocks with cache breakpoints
+
+    Args:
+        static_prompt (str): Persona prompt that never changes between requests
+        slow_context (str): Context that changes rarely (memory tiers)
+        request_context (str): Context that only applies to this request (recalled memories)
+        summary (str): Rolling summary of older turns. Once the history window
+            slides it changes every turn, so a breakpoint on it would only ever
+            pay for cache writes.
+
+    Returns:
+        List[Dict]: Text blocks for the `system` parameter of messages.create
+    """
+    blocks = []
+    parts = ((static_prompt, True), (slow_context, True), (summary, False), (request_context, False))
+    for text, cacheable in parts:
+        if not text:
+            continue
+        block = {"type": "text", "text": text}
+        if cacheable:
+            block["cache_control"] = dict(CACHE_CONTROL)
+        blocks.append(block)
+    return blocks
+
+
+def strip_cache_control(system):
+    """Return the system prompt without cache breakpoints (for models without caching)"""
+    if not isinstance(system, list):
+        return system
+    return [{key: value for key, value in block.items() if key != "cache_control"} for block in system]
+
+
+def system_text(system) -> str:
+    """Flatten a system prompt given as a string or as text blocks"""
+    if isinstance(system, list):
+        return "\n\n".join(block.get("text", "") for block in system)
+    return system or ""
+
+
+def usage_report(usage) -> Dict[str, int]:
+    """
+    Normalize a response's usage object into cache-read vs uncached input counts
+
+    Args:
+        usage: `response.usage` from the Anthropic SDK or BedrockResponse
+
+    Returns:
+        Dict[str, int]: cache_read_input_tokens, cache_creation_input_tokens,
+        uncached_input_tokens and output_tokens
+    """
+    def count(name):
+        return int(getattr(usage, name, 0) or 0) if usage is not None else 0
+
+    return {
+        "cache_read_input_tokens": count("cache_read_input_tokens"),
+        "cache_creation_input_tokens": count("cache_creation_input_tokens"),
+        # Anthropic reports input_tokens as the tokens after the last cache breakpoint
+        "uncached_input_tokens": count("input_tokens"),
+        "output_tokens": count("output_tokens")
+    }
+
+
+def format_usage(report: Dict[str, int]) -> str:
+    """One-line description of a usage report"""
+    return (
+        f"input: {report['cache_read_input_tokens']} cache-read, "
+        f"{report['cache_creation_input_tokens']} cache-write, "
+        f"{report['uncached_input_tokens']} uncached; output: {report['output_tokens']}"
+    )
@@ -0,0 +1,270 @@
+"""
+Provider Registry Module
+
+Holds one client per LLM provider per process, sync and async, each with a tuned
+HTTP connection pool. Both clients of a provider share one concurrency limit.
+Every client exposes the same `messages.create(...)` shape that ChatClient
+already uses, so callers no longer build their own Anthropic/Bedrock/boto3
+clients.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+from conversation_lock import SharedSemaphore
+
+# Ensure environment variables are loaded
+load_dotenv()
+
+# Maximum concurrent in-flight requests per provider (per process)
+PROVIDER_CONCURRENCY = {
+    "anthropic": int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "16")),
+    "bedrock": int(os.getenv("BEDROCK_MAX_CONCURRENCY", "8"))
+}
+
+# HTTP pool settings shared by all provider clients
+MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROVIDER_MAX_KEEPALIVE", "16"))
+REQUEST_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "60"))
+
+# "fake" swaps every provider for the in-process fakes in fake_provider.py
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "live")
+
+# Optional Bedrock endpoint override (e.g. the fake_provider.py HTTP server)
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL")
+
+
+class LimitedMessages:
+    """
+    Wraps a provider's `messages` API so that at most N requests run at once.
+
+    Streaming requests are sent when iteration starts and hold their slot until
+    the stream is exhausted or closed.
+    """
+
+    def __init__(self, messages, semaphore: SharedSemaphore):
+        self._messages = messages
+        self._semaphore = semaphore
+
+    def create(self, **kwargs):
+        """Create a message, waiting for a free slot first"""
+        if kwargs.get("stream"):
+            return self._stream(kwargs)
+        with self._semaphore:
+            return self._messages.create(**kwargs)
+
+    def _stream(self, kwargs):
+        """Open the stream once iteration starts and hold the slot until it ends"""
+        with self._semaphore:
+            for event in self._messages.create(**kwargs):
+                yield event
+
+
+class AsyncLimitedMessages:
+    """
+    Async counterpart of LimitedMessages. Waits for a slot of the same limit
+    the provider's sync client uses, without occupying a thread.
+    """
+
+    def __init__(self, messages, semaphore: SharedSemaphore):
+        self._messages = messages
+        self._semaphore = semaphore
+
+    async def create(self, **kwargs):
+        """Create a message, waiting for a free slot first"""
+        async with self._semaphore:
+            return await self._messages.create(**kwargs)
+
+
+class AsyncBedrockMessages:
+    """
+    Async `messages` API for Bedrock, running the boto3 call in a worker thread.
+
+    The slot is taken on the event loop before handing off, so calls queued
+    behind the limit don't tie up default-executor threads that the rest of
+    the app (locks, admission, SQLite) also runs on.
+    """
+
+    def __init__(self, messages, semaphore: SharedSemaphore):
+        self._messages = messages
+        self._semaphore = semaphore
+
+    async def create(self, **kwargs):
+        if kwargs.get("stream"):
+            # Streams hold their slot while iterated (see LimitedMessages)
+            limited = LimitedMessages(self._messages, self._semaphore)
+            return await asyncio.to_thread(limited.create, **kwargs)
+        async with self._semaphore:
+            return await asyncio.to_thread(self._messages.create, **kwargs)
+
+
+class ProviderClient:
+    """A shared provider client with a concurrency-limited `messages` API"""
+
+    def __init__(self, provider: str, raw_client: Any, messages: Any, supports_streaming: bool = True):
+        self.provider = provider
+        self.raw_client = raw_client
+        self.messages = messages
+        self.supports_streaming = supports_streaming
+
+
+class ProviderRegistry:
+    """
+    Process-wide registry of provider clients.
+
+    Clients are created on first use and reused by every ChatClient,
+    MemoryChatClient and metadata call in the process.
+    """
+
+    def __init__(self, fake: bool = LLM_PROVIDER == "fake"):
+        """
+        Args:
+            fake (bool): Serve fake_provider fakes instead of live clients
+        """
+        self.fake = fake
+        self._fake_llm = None
+        self._lock = threading.Lock()
+        self._clients: Dict[str, ProviderClient] = {}
+        self._async_clients: Dict[str, ProviderClient] = {}
+        # One limit per provider, shared by its sync and async clients
+        self._semaphores = {
+            provider: SharedSemaphore(limit)
+            for provider, limit in PROVIDER_CONCURRENCY.items()
+        }
+        self._bedrock_runtime = None
+
+    def limit(self, provider: str) -> SharedSemaphore:
+        """Get the concurrency limit for a provider, usable with `with` or `async with`"""
+        return self._semaphores[provider]
+
+    def get_client(self, provider: str) -> ProviderClient:
+        """Get the shared sync client for a provider ("anthropic" or "bedrock")"""
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = self._build_client(provider)
+            return self._clients[provider]
+
+    def get_async_client(self, provider: str) -> ProviderClient:
+        """Get the shared async client for a provider ("anthropic" or "bedrock")"""
+        with self._lock:
+            if provider not in self._async_clients:
+                self._async_clients[provider] = self._build_async_client(provider)
+            return self._async_clients[provider]
+
+    def bedrock_runtime(self):
+        """Get the shared boto3 bedrock-runtime client with a pooled connection config"""
+        with self._lock:
+            return self._get_bedrock_runtime()
+
+    def _get_bedrock_runtime(self):
+        """Create the bedrock-runtime client on first use (caller holds the lock)"""
+        if self._bedrock_runtime is None and self.fake:
+            from fake_provider import FakeBedrockRuntime
+
+            self._bedrock_runtime = FakeBedrockRuntime(self._get_fake_llm())
+        if self._bedrock_runtime is None:
+            from botocore.config import Config
+            from bedrock_client import get_shared_aws_session
+
+            config = Config(
+                max_pool_connections=MAX_CONNECTIONS,
+                read_timeout=REQUEST_TIMEOUT,
+                connect_timeout=10,
+                tcp_keepalive=True
+            )
+            self._bedrock_runtime = get_shared_aws_session().client(
+                "bedrock-runtime",
+                region_name=os.getenv("AWS_REGION", "us-east-1"),
+                endpoint_url=BEDROCK_ENDPOINT_URL,
+                config=config
+            )
+        return self._bedrock_runtime
+
+    def _get_fake_llm(self):
+        """Shared fake model, so latency and error settings apply across providers"""
+        if self._fake_llm is None:
+            from fake_provider import FakeLLM
+
+            self._fake_llm = FakeLLM()
+        return self._fake_llm
+
+    def _build_client(self, provider: str) -> ProviderClient:
+        """Build the sync client for a provider"""
+        if provider == "anthropic" and self.fake:
+            from fake_provider import FakeAnthropic
+
+            raw_client = FakeAnthropic(self._get_fake_llm())
+            return ProviderClient(provider, raw_client, LimitedMessages(raw_client.messages, self._semaphores[provider]))
+
+        if provider == "anthropic":
+            import anthropic
+            import httpx
+
+            raw_client = anthropic.Anthropic(
+                api_key=self._anthropic_api_key(),
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.Client(limits=self._http_limits(), timeout=REQUEST_TIMEOUT)
+            )
+            return ProviderClient(provider, raw_client, LimitedMessages(raw_client.messages, self._semaphores[provider]))
+
+        if provider == "bedrock":
+            from bedrock_client import BedrockClient
+
+            raw_client = BedrockClient(runtime_client=self._get_bedrock_runtime())
+            return ProviderClient(provider, raw_client, LimitedMessages(raw_client.messages, self._semaphores[provider]))
+
+        raise ValueError(f"Unknown provider: {provider}")
+
+    def _build_async_client(self, provider: str) -> ProviderClient:
+        """Build the async client for a provider"""
+        semaphore = self._semaphores.get(provider)
+
+        if provider == "anthropic" and self.fake:
+            from fake_provider import AsyncFakeAnthropic
+
+            raw_client = AsyncFakeAnthropic(self._get_fake_llm())
+            return ProviderClient(provider, raw_client, AsyncLimitedMessages(raw_client.messages, semaphore))
+
+        if provider == "anthropic":
+            import anthropic
+            import httpx
+
+            raw_client = anthropic.AsyncAnthropic(
+                api_key=self._anthropic_api_key(),
+                timeout=REQUEST_TIMEOUT,
+                http_client=httpx.AsyncClient(limits=self._http_limits(), timeout=REQUEST_TIMEOUT)
+            )
+            return ProviderClient(provider, raw_client, AsyncLimitedMessages(raw_client.messages, semaphore))
+
+        if provider == "bedrock":
+            # Shares the sync client's connection pool and limit
+            sync_client = self._clients.get(provider) or self._build_client(provider)
+            self._clients[provider] = sync_client
+            raw_client = sync_client.raw_client
+            return ProviderClient(provider, raw_client, AsyncBedrockMessages(raw_client.messages, semaphore))
+
+        raise ValueError(f"Unknown provider: {provider}")
+
+    @staticmethod
+    def _anthropic_api_key() -> str:
+        api_key = os.getenv('ANTHROPIC_API_KEY')
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        return api_key
+
+    @staticmethod
+    def _http_limits():
+        import httpx
+
+        return httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+        )
+
+
+# Create an instance for import
+registry = ProviderRegistry()
@@ -0,0 +1,511 @@
+"""
+Resilience Module
+
+Wraps provider `messages` APIs with per-call deadlines, jittered exponential
+retries on retryable errors, optional hedged requests for tail latency and a
+circuit breaker per backend that fails over between the Anthropic API and
+Bedrock for the same Claude model.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Overall deadline for one provider call, including retries and failover
+PROVIDER_DEADLINE = float(os.getenv("PROVIDER_DEADLINE", "60"))
+
+# Send a hedged second request if the first hasn't answered after this many
+# seconds (unset disables hedging; streams are never hedged)
+HEDGE_AFTER = float(os.getenv("PROVIDER_HEDGE_AFTER")) if os.getenv("PROVIDER_HEDGE_AFTER") else None
+
+# Cap on a single attempt, in seconds. Unset, an attempt may use its backend's
+# share of the deadline (see backend_share)
+ATTEMPT_TIMEOUT = float(os.getenv("PROVIDER_ATTEMPT_TIMEOUT")) if os.getenv("PROVIDER_ATTEMPT_TIMEOUT") else None
+
+# Anthropic API model IDs and their Bedrock equivalents
+BEDROCK_MODEL_IDS = {
+    "claude-3-haiku-20240307": "anthropic.claude-3-haiku-20240307-v1:0",
+    "claude-3-sonnet-20240229": "anthropic.claude-3-sonnet-20240229-v1:0",
+    "claude-3-opus-20240229": "anthropic.claude-3-opus-20240229-v1:0",
+    "claude-3-5-haiku-20241022": "anthropic.claude-3-5-haiku-20241022-v1:0",
+    "claude-3-5-sonnet-20240620": "anthropic.claude-3-5-sonnet-20240620-v1:0",
+    "claude-3-5-sonnet-20241022": "anthropic.claude-3-5-sonnet-20241022-v2:0"
+}
+ANTHROPIC_MODEL_IDS = {bedrock: anthropic for anthropic, bedrock in BEDROCK_MODEL_IDS.items()}
+
+# HTTP statuses worth retrying (529 is Anthropic's "overloaded")
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Bedrock / botocore error codes worth retrying
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "RequestTimeout",
+    "TooManyRequestsException"
+}
+
+# Exception class names for transport failures, checked by name so this module
+# doesn't need to import anthropic or botocore
+RETRYABLE_EXCEPTION_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "RateLimitError",
+    "OverloadedError",
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ConnectionClosedError"
+}
+
+
+class ProviderError(Exception):
+    """Raised when a provider call fails on every backend"""
+
+
+class ProviderTimeout(ProviderError):
+    """Raised when a provider call exceeds its deadline"""
+
+
+class CircuitOpenError(ProviderError):
+    """Raised when every backend's circuit breaker is open"""
+
+
+def model_for_provider(model: str, provider: str) -> str:
+    """Translate a Claude model ID to the ID the given provider expects"""
+    if provider == "bedrock":
+        return BEDROCK_MODEL_IDS.get(model, model)
+    if provider == "anthropic":
+        return ANTHROPIC_MODEL_IDS.get(model, model)
+    return model
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check if an error is transient and the call may succeed if repeated"""
+    if isinstance(error, (ProviderTimeout, TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in RETRYABLE_ERROR_CODES:
+            return True
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0):
+        """
+        Jittered exponential backoff
+
+        Args:
+            max_attempts (int): Attempts per backend, including the first
+            base_delay (float): Backoff before the first retry, in seconds
+            max_delay (float): Upper bound on any single backoff
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter backoff for the given retry number (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    Other callers are rejected until the trial reports success or failure; a
+    trial that never reports back is given up on after `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None  # Start of the in-flight trial call, if any
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check if a call may go through. A True answer while open or half-open
+        makes the caller the trial call, which must report its outcome.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True
+            if not self._available(now):
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_started = now
+            return True
+
+    def available(self) -> bool:
+        """Check, without becoming the trial call, whether allow() would let a call through"""
+        with self._lock:
+            return self._available(time.monotonic())
+
+    def _available(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        return self.probe_started is None or now - self.probe_started >= self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_started = None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a backend"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker()
+        return _breakers[name]
+
+
+class Backend:
+    """A provider `messages` API plus the breaker guarding it"""
+
+    def __init__(self, name: str, messages: Any, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.messages = messages
+        self.breaker = breaker or get_breaker(name)
+
+    def request(self, kwargs: Dict) -> Dict:
+        """Adapt request arguments to this backend's model IDs"""
+        request = dict(kwargs)
+        if request.get("model"):
+            request["model"] = model_for_provider(request["model"], self.name)
+        return request
+
+
+def backend_share(backends: List[Backend], index: int, remaining: float) -> float:
+    """
+    Seconds of the remaining deadline that backends[index] may spend, an equal
+    split with the later backends that could still be tried, so a backend that
+    hangs can't use up the time failover needs
+    """
+    later = sum(1 for backend in backends[index + 1:] if backend.breaker.available())
+    return remaining / (later + 1)
+
+
+def report_attempt(observer, backend: Backend, kwargs: Dict, seconds: float, ok: bool):
+    """Tell an attempt observer how long a backend took, keyed by the model the caller asked for"""
+    if observer is None:
+        return
+    try:
+        observer(backend.name, kwargs.get("model"), seconds, ok)
+    except Exception as e:
+        logger.warning("Attempt observer failed: %s", e)
+
+
+# Threads that run sync provider calls so they can be abandoned at the deadline.
+# An abandoned call can't be interrupted: it keeps its thread and provider slot
+# until the provider client's own PROVIDER_TIMEOUT ends it. The pool size caps
+# how many can pile up; calls queued behind them are cancelled instead.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider-call")
+
+
+class ResilientMessages:
+    """
+    `messages` API that tries each backend in order (skipping open circuits),
+    retrying retryable errors with backoff, all within one overall deadline.
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        retry: Optional[RetryPolicy] = None,
+        timeout: float = PROVIDER_DEADLINE,
+        hedge_after: Optional[float] = HEDGE_AFTER,
+        attempt_timeout: Optional[float] = ATTEMPT_TIMEOUT,
+        observer: Optional[Callable[[str, str, float, bool], None]] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            backends (List[Backend]): Backends in order of preference
+            retry (RetryPolicy): Retry policy applied per backend
+            timeout (float): Overall deadline for a call, in seconds
+            hedge_after (float): If set, send a second identical request to the same
+                backend when the first hasn't answered after this many seconds
+            attempt_timeout (float): If set, the most a single attempt may take
+            observer: Called after each attempt with (backend name, requested
+                model, seconds, succeeded); a stream counts up to its first event.
+                Requests the backend rejected (e.g. a 400) aren't reported
+            sleep: Sleep function (injectable for tests)
+        """
+        self.backends = backends
+        self.retry = retry or RetryPolicy()
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.attempt_timeout = attempt_timeout
+        self.observer = observer
+        self._sleep = sleep
+
+    def create(self, **kwargs):
+        """Create a message with deadlines, retries, hedging and failover"""
+        deadline = time.monotonic() + self.timeout
+        last_error = None
+
+        for index, backend in enumerate(self.backends):
+            # Checked in failover order, so an open backend only turns
+            # half-open when it is actually about to be called
+            if not backend.breaker.allow():
+                continue
+            request = backend.request(kwargs)
+            now = time.monotonic()
+            backend_deadline = now + backend_share(self.backends, index, deadline - now)
+            for attempt in range(self.retry.max_attempts):
+                now = time.monotonic()
+                if now >= deadline:
+                    raise ProviderTimeout(f"Provider call exceeded {self.timeout}s deadline") from last_error
+                if now >= backend_deadline:
+                    break  # This backend's share is spent: fail over
+                try:
+                    response = self._call(backend, request, self._attempt_timeout(backend_deadline - now))
+                    backend.breaker.record_success()
+                    report_attempt(self.observer, backend, kwargs, time.monotonic() - now, True)
+                    return response
+                except Exception as e:
+                    last_error = e
+                    if not is_retryable(e):
+                        # The backend answered; the request itself was bad
+                        # (e.g. a 400), which says nothing about its health
+                        backend.breaker.record_success()
+                        raise
+                    backend.breaker.record_failure()
+                    report_attempt(self.observer, backend, kwargs, time.monotonic() - now, False)
+                    logger.warning("%s call failed (%s), attempt %d/%d", backend.name, e, attempt + 1, self.retry.max_attempts)
+                    if attempt + 1 < self.retry.max_attempts:
+                        self._sleep(min(self.retry.delay(attempt), max(0.0, backend_deadline - time.monotonic())))
+                if not backend.breaker.allow():
+                    break  # Circuit opened mid-retry: fail over now
+
+        if last_error is None:
+            raise CircuitOpenError("All provider backends are unavailable")
+        raise ProviderError(f"All provider backends failed: {last_error}") from last_error
+
+    def _attempt_timeout(self, budget: float) -> float:
+        return min(budget, self.attempt_timeout) if self.attempt_timeout else budget
+
+    def _call(self, backend: Backend, request: Dict, timeout: float):
+        """Run one (possibly hedged) call with a deadline"""
+        invoke = self._open_stream if request.get("stream") else backend.messages.create
+        call = (lambda: invoke(backend, request)) if request.get("stream") else (lambda: invoke(**request))
+
+        first = _executor.submit(call)
+        futures = {first}
+        if self.hedge_after is not None and not request.get("stream") and timeout > self.hedge_after:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                futures.add(_executor.submit(call))
+
+        end = time.monotonic() + timeout
+        error = None
+        try:
+            while futures:
+                done, futures = wait(futures, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise ProviderTimeout(f"{backend.name} call exceeded {timeout:.1f}s deadline")
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # Drops calls still queued for a thread; running ones can't be
+            # stopped (see _executor)
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _open_stream(backend: Backend, request: Dict):
+        """
+        Open a stream and wait for its first event, so connection failures are
+        retried before any text reaches the caller. Errors after that propagate.
+        """
+        stream = iter(backend.messages.create(**request))
+        try:
+            first = next(stream)
+        except StopIteration:
+            return iter(())
+
+        def events():
+            yield first
+            yield from stream
+
+        return events()
+
+
+class AsyncResilientMessages:
+    """Async counterpart of ResilientMessages for async provider clients"""
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        retry: Optional[RetryPolicy] = None,
+        timeout: float = PROVIDER_DEADLINE,
+        hedge_after: Optional[float] = HEDGE_AFTER,
+        attempt_timeout: Optional[float] = ATTEMPT_TIMEOUT,
+        observer: Optional[Callable[[str, str, float, bool], None]] = None
+    ):
+        self.backends = backends
+        self.retry = retry or RetryPolicy()
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.attempt_timeout = attempt_timeout
+        self.observer = observer
+
+    async def create(self, **kwargs):
+        """Create a message with deadlines, retries, hedging and failover"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        last_error = None
+
+        for index, backend in enumerate(self.backends):
+            if not backend.breaker.allow():
+                continue
+            request = backend.request(kwargs)
+            now = loop.time()
+            backend_deadline = now + backend_share(self.backends, index, deadline - now)
+            for attempt in range(self.retry.max_attempts):
+                now = loop.time()
+                if now >= deadline:
+                    raise ProviderTimeout(f"Provider call exceeded {self.timeout}s deadline") from last_error
+                if now >= backend_deadline:
+                    break
+                try:
+                    budget = backend_deadline - now
+                    timeout = min(budget, self.attempt_timeout) if self.attempt_timeout else budget
+                    response = await self._call(backend, request, timeout)
+                    backend.breaker.record_success()
+                    report_attempt(self.observer, backend, kwargs, loop.time() - now, True)
+                    return response
+                except Exception as e:
+                    last_error = e
+                    if not is_retryable(e):
+                        # The backend answered; the request itself was bad
+                        # (e.g. a 400), which says nothing about its health
+                        backend.breaker.record_success()
+                        raise
+                    backend.breaker.record_failure()
+                    report_attempt(self.observer, backend, kwargs, loop.time() - now, False)
+                    logger.warning("%s call failed (%s), attempt %d/%d", backend.name, e, attempt + 1, self.retry.max_attempts)
+                    if attempt + 1 < self.retry.max_attempts:
+                        await asyncio.sleep(min(self.retry.delay(attempt), max(0.0, backend_deadline - loop.time())))
+                if not backend.breaker.allow():
+                    break
+
+        if last_error is None:
+            raise CircuitOpenError("All provider backends are unavailable")
+        raise ProviderError(f"All provider backends failed: {last_error}") from last_error
+
+    async def _call(self, backend: Backend, request: Dict, timeout: float):
+        """Run one (possibly hedged) call with a deadline"""
+        tasks = {asyncio.ensure_future(backend.messages.create(**request))}
+        try:
+            if self.hedge_after is not None and timeout > self.hedge_after:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    tasks.add(asyncio.ensure_future(backend.messages.create(**request)))
+
+            end = asyncio.get_running_loop().time() + timeout
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks,
+                    timeout=max(0.0, end - asyncio.get_running_loop().time()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise ProviderTimeout(f"{backend.name} call exceeded {timeout:.1f}s deadline")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class ResilientClient:
+    """Client exposing a resilient `messages` API over several backends"""
+
+    supports_streaming = True
+
+    def __init__(self, messages):
+        self.messages = messages
+
+
+def build_failover_clients(primary: str, registry, **options):
+    """
+    Build sync and async resilient clients that prefer `primary` ("anthropic"
+    or "bedrock") and fail over to the other provider for the same model.
+
+    Args:
+        primary (str): Preferred provider
+        registry: ProviderRegistry supplying the shared provider clients
+        **options: timeout, hedge_after, attempt_timeout, observer and retry for
+            the resilient wrappers
+
+    Returns:
+        tuple: (sync client, async client)
+    """
+    order = [primary] + [name for name in ("anthropic", "bedrock") if name != primary]
+    sync_backends = []
+    async_backends = []
+    for name in order:
+        try:
+            sync_client = registry.get_client(name)
+            async_client = registry.get_async_client(name)
+        except Exception as e:
+            # e.g. no ANTHROPIC_API_KEY: run without that backend
+            logger.warning("Provider %s unavailable for failover: %s", name, e)
+            continue
+        sync_backends.append(Backend(name, sync_client.messages))
+        async_backends.append(Backend(name, async_client.messages))
+
+    if not sync_backends:
+        raise ProviderError(f"No provider backends could be created for {primary}")
+
+    return (
+        ResilientClient(ResilientMessages(sync_backends, **options)),
+        ResilientClient(AsyncResilientMessages(async_backends, **options))
+    )
@@ -0,0 +1,177 @@
+"""
+Response Cache Module
+
+On-disk cache for deterministic LLM calls, keyed by a hash of
+(model, prompt, params). Entries expire after a TTL and the cache is kept
+under a size limit by evicting the least recently used entries.
+Deterministic provider calls (such as metadata extraction) opt in through
+ResponseCache.get_or_call.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        db_path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the response cache
+
+        Args:
+            db_path: SQLite file holding cached responses
+            ttl: Seconds an entry stays valid
+            max_bytes: Total size of cached values before LRU eviction kicks in
+            clock: Time source (injectable for tests)
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the cache table"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,         -- JSON encoded response
+                    size INTEGER,       -- Length of value in bytes
+                    created REAL,
+                    accessed REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+
+    @staticmethod
+    def make_key(model: str, prompt: Any, params: Optional[Dict] = None) -> str:
+        """Hash (model, prompt, params) into a cache key"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "params": params or {}},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        now = self._clock()
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self._count(hit=True)
+                return json.loads(row[0])
+            if row:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._count(hit=False)
+        return None
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value and evict entries over the size limit"""
+        now = self._clock()
+        encoded = json.dumps(value)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, value, size, created, accessed)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, encoded, len(encoded.encode("utf-8")), now, now)
+            )
+            self._evict(conn, now)
+
+    def get_or_call(self, model: str, prompt: Any, params: Optional[Dict], call: Callable[[], Any]) -> Any:
+        """
+        Return the cached response for (model, prompt, params), or call and cache it
+
+        Args:
+            model: Model ID
+            prompt: Prompt text or message list
+            params: Generation parameters that affect the output
+            call: Zero-argument function making the provider call; None results
+                are returned but not cached
+        """
+        key = self.make_key(model, prompt, params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value = call()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counts for this process plus current cache size"""
+        with sqlite3.connect(self.db_path) as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def clear(self):
+        """Remove all cached responses"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM responses")
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _evict(self, conn, now: float):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evict = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, creating it on first use"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
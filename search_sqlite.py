@@ -6,6 +6,8 @@ A standalone script for searching conversations in SQLite database.
 
 import json
 from sqlite_client import SQLiteClient
+from log_config import configure_logging
+from profiling import PROFILE_DIR, PROFILE_MODE, PROFILE_MODES, profiled
 import argparse
 from typing import List, Dict, Any
 from datetime import datetime
@@ -80,9 +82,19 @@ def main():
     parser.add_argument('--limit', type=int, default=5, help='Maximum number of results')
     parser.add_argument('--full', action='store_true', help='Show full conversation content')
     parser.add_argument('--types', action='store_true', help='List all chat types and their counts')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_MODE, choices=PROFILE_MODES,
+                        help='Profile the run (cprofile or sample) and write a dump to --profile-dir')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='Directory for profile dumps')
     
     args = parser.parse_args()
     
+    if args.profile:
+        with profiled("search_sqlite", args.profile, args.profile_dir):
+            run(parser, args)
+    else:
+        run(parser, args)
+
+def run(parser, args):
     db = SQLiteClient()
     
     if args.types:
@@ -95,4 +107,5 @@ def main():
         parser.print_help()
 
 if __name__ == "__main__":
+    configure_logging()
     main() 
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Session Store Module
+
+Keeps live chat state per (session, persona) in a bounded LRU. Sessions idle
+for longer than the TTL are evicted, and a session that isn't in memory is
+rehydrated from SQLite by its factory on the next request, so memory use
+follows the number of active users rather than the size of the history.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Live sessions kept in memory per process
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "256"))
+
+# Seconds a session may sit unused before it is evicted
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+
+# Session used by callers that don't have one (CLI tools, scripts)
+DEFAULT_SESSION = "default"
+
+
+class SessionStore:
+    """
+    LRU of live chat clients keyed by (session_id, chat_type).
+
+    Lookups refresh an entry's position and idle timer. Inserting past
+    max_sessions evicts the least recently used entry; entries idle longer
+    than idle_ttl are dropped whenever the store is touched.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, str], Any],
+        max_sessions: int = MAX_SESSIONS,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        is_busy: Optional[Callable[[Any], bool]] = None
+    ):
+        """
+        Initialize the store
+
+        Args:
+            factory: Builds the chat state for (session_id, chat_type), loading
+                any saved history for that session
+            max_sessions: Maximum live entries
+            idle_ttl: Seconds before an unused entry is evicted
+            is_busy: Returns True for entries that must not be evicted yet (e.g. a
+                turn is in flight), so a conversation never has two live copies
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.is_busy = is_busy or (lambda value: False)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str, chat_type: str) -> Any:
+        """Get the live chat state for a session, rehydrating it on a miss"""
+        key = (session_id, chat_type)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock: rehydration reads SQLite
+        value = self.factory(session_id, chat_type)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another request rehydrated the same session first
+                self._entries.move_to_end(key)
+                return entry[0]
+            self._entries[key] = (value, now)
+            self._evict_overflow()
+            return value
+
+    def values(self):
+        """Live chat states, least recently used first"""
+        with self._lock:
+            return [value for value, _ in self._entries.values()]
+
+    def session_values(self, session_id: str):
+        """Live chat states belonging to one session"""
+        with self._lock:
+            return [value for (sid, _), (value, _) in self._entries.items() if sid == session_id]
+
+    def drop(self, session_id: str):
+        """Forget every live chat state for a session"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            return {
+                "live": len(self._entries),
+                "sessions": len({session_id for session_id, _ in self._entries}),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict_idle(self, now: float):
+        """Drop entries idle longer than idle_ttl (caller holds the lock)"""
+        expired = []
+        for key, (value, last_used) in self._entries.items():
+            if now - last_used <= self.idle_ttl:
+                break
+            if not self.is_busy(value):
+                expired.append(key)
+        for key in expired:
+            del self._entries[key]
+            self.evictions += 1
+
+    def _evict_overflow(self):
+        """Drop least recently used idle entries past max_sessions (caller holds the lock)"""
+        overflow = len(self._entries) - self.max_sessions
+        if overflow <= 0:
+            return
+        victims = [key for key, (value, _) in self._entries.items() if not self.is_busy(value)][:overflow]
+        for key in victims:
+            del self._entries[key]
+            self.evictions += 1
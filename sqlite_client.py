@@ -3,6 +3,10 @@ import json
 from typing import List, Dict, Any
 from datetime import datetime
 import time
+from metrics import timed
+from log_config import get_logger
+
+logger = get_logger(__name__)
 
 class SQLiteClient:
     def __init__(self, db_path="chat_history.db"):
@@ -12,6 +16,9 @@ class SQLiteClient:
     def setup_database(self):
         """Create necessary tables with FTS support"""
         with sqlite3.connect(self.db_path) as conn:
+            # Readers don't block the writer, so several workers can share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            
             # Main conversations table
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS conversations (
@@ -35,6 +42,35 @@ class SQLiteClient:
                 )
             """)
             
+            # Latest conversation per chat type and user (session rehydration)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conversations_type_user
+                ON conversations(chat_type, user_id, timestamp)
+            """)
+            
+            # Authoritative chat history: one row per message, append-only. The
+            # message_id sequence lets each worker fetch only what it hasn't seen.
+            # A row with role 'clear' marks where the history was cleared.
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_type TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT,
+                    timestamp TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_messages_conversation
+                ON messages(chat_type, user_id, message_id)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_messages_clear
+                ON messages(chat_type, user_id, role, message_id)
+            """)
+            
+    @timed("sqlite.save_conversation")
     def save_conversation(self, conversation: Dict[str, Any]) -> int:
         """Save a conversation and update search index"""
         try:
@@ -77,11 +113,12 @@ class SQLiteClient:
                 return chat_id
                 
         except Exception as e:
-            print(f"Error saving conversation: {e}")
+            logger.error("Error saving conversation: %s", e)
             return None
             
-    def search_conversations(self, query: str, chat_type: str = None, limit: int = 5) -> List[Dict]:
-        """Search conversations using FTS"""
+    @timed("sqlite.fts_search")
+    def search_conversations(self, query: str, chat_type: str = None, limit: int = 5, user_id: str = None) -> List[Dict]:
+        """Search conversations using FTS, optionally only those of one user"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 # Format query for FTS5
@@ -92,26 +129,26 @@ class SQLiteClient:
                 # Search in both content and topics columns
                 search_query = f'content:({formatted_query}) OR topics:({formatted_query})'
                 
+                filters = ""
+                params = [search_query]
                 if chat_type:
-                    sql = """
-                        SELECT c.* 
-                        FROM conversation_fts fts
-                        JOIN conversations c ON c.chat_id = fts.chat_id
-                        WHERE conversation_fts MATCH ? AND fts.chat_type = ?
-                        ORDER BY rank
-                        LIMIT ?
-                    """
-                    cursor = conn.execute(sql, (search_query, chat_type, limit))
-                else:
-                    sql = """
-                        SELECT c.* 
-                        FROM conversation_fts fts
-                        JOIN conversations c ON c.chat_id = fts.chat_id
-                        WHERE conversation_fts MATCH ?
-                        ORDER BY rank
-                        LIMIT ?
-                    """
-                    cursor = conn.execute(sql, (search_query, limit))
+                    filters += " AND fts.chat_type = ?"
+                    params.append(chat_type)
+                if user_id:
+                    # Imported conversations without a user belong to "default"
+                    filters += " AND (c.user_id = ? OR (c.user_id IS NULL AND ? = 'default'))"
+                    params.extend([user_id, user_id])
+                
+                sql = f"""
+                    SELECT c.* 
+                    FROM conversation_fts fts
+                    JOIN conversations c ON c.chat_id = fts.chat_id
+                    WHERE conversation_fts MATCH ?{filters}
+                    ORDER BY rank
+                    LIMIT ?
+                """
+                params.append(limit)
+                cursor = conn.execute(sql, params)
                 
                 results = []
                 for row in cursor:
@@ -128,9 +165,10 @@ class SQLiteClient:
                 return results
                 
         except Exception as e:
-            print(f"Error searching conversations: {e}")
+            logger.error("Error searching conversations: %s", e)
             return []
 
+    @timed("sqlite.chat_type_counts")
     def get_chat_type_counts(self):
         """Get count of conversations by chat type"""
         with sqlite3.connect(self.db_path) as conn:
@@ -142,6 +180,7 @@ class SQLiteClient:
             """)
             return cursor.fetchall()
 
+    @timed("sqlite.get_conversations")
     def get_conversations_by_type(self, chat_type: str, limit: int = 5):
         """Get conversations of a specific type"""
         with sqlite3.connect(self.db_path) as conn:
@@ -163,4 +202,165 @@ class SQLiteClient:
                     "metadata": json.loads(row[5])
                 }
                 results.append(conversation)
-            return results 
\ No newline at end of file
+            return results 
+
+    @timed("sqlite.get_latest_conversation")
+    def get_latest_conversation(self, chat_type: str, user_id: str):
+        """
+        Get the most recent conversation of a type for one user, or None
+        
+        Imported conversations without a user belong to the "default" user.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT * FROM conversations 
+                WHERE chat_type = ? AND (user_id = ? OR (user_id IS NULL AND ? = 'default'))
+                ORDER BY timestamp DESC 
+                LIMIT 1
+            """, (chat_type, user_id, user_id)).fetchone()
+            
+            if not row:
+                return None
+            return {
+                "chat_id": row[0],
+                "chat_type": row[1],
+                "user_id": row[2],
+                "timestamp": row[3],
+                "conversation": json.loads(row[4]),
+                "metadata": json.loads(row[5])
+            }
+
+    @timed("sqlite.append_message")
+    def append_message(self, chat_type: str, user_id: str, message: Dict[str, Any]) -> int:
+        """
+        Append one message to a conversation's authoritative history
+        
+        Returns:
+            int: The new message_id, or None if the write failed
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO messages (chat_type, user_id, role, content, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (chat_type, user_id, message["role"], message["content"], message.get("timestamp"))
+                )
+                return cursor.lastrowid
+        except Exception as e:
+            logger.error("Error appending message: %s", e)
+            return None
+
+    def clear_messages(self, chat_type: str, user_id: str) -> int:
+        """Mark a conversation's history as cleared (older messages stay on disk)"""
+        return self.append_message(chat_type, user_id, {
+            "role": "clear",
+            "content": "",
+            "timestamp": datetime.now().isoformat()
+        })
+
+    @timed("sqlite.sync_messages")
+    def get_messages_since(self, chat_type: str, user_id: str, after_id: int = 0) -> Dict[str, Any]:
+        """
+        Get the messages of a conversation newer than after_id
+        
+        Both lookups are index range scans, so a worker whose cache is current
+        pays for two empty seeks rather than a reload.
+        
+        Returns:
+            Dict with "messages" (role, content, timestamp dicts in order),
+            "last_id" (the id to pass next time) and "cleared" (True if the
+            history was cleared after after_id; "messages" then starts after the clear)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            clear_id = conn.execute("""
+                SELECT MAX(message_id) FROM messages
+                WHERE chat_type = ? AND user_id = ? AND role = 'clear'
+            """, (chat_type, user_id)).fetchone()[0] or 0
+            start = max(after_id, clear_id)
+            rows = conn.execute("""
+                SELECT message_id, role, content, timestamp FROM messages
+                WHERE chat_type = ? AND user_id = ? AND message_id > ?
+                ORDER BY message_id
+            """, (chat_type, user_id, start)).fetchall()
+        return {
+            "messages": [{"role": role, "content": content, "timestamp": timestamp} for _, role, content, timestamp in rows],
+            "last_id": rows[-1][0] if rows else start,
+            "cleared": clear_id > after_id
+        }
+
+    @timed("sqlite.history_page")
+    def get_messages_page(self, chat_type: str, user_id: str, before: int = None, limit: int = 30) -> Dict[str, Any]:
+        """
+        Get one page of a conversation's messages, newest page first
+        
+        Keyset pagination over message_id: each page is an index range scan
+        of at most limit + 1 rows, however long the history is.
+        
+        Args:
+            before: Only messages with a smaller message_id (None for the latest page)
+            limit: Maximum messages in the page
+        
+        Returns:
+            Dict with "messages" (id, role, content, timestamp dicts, oldest
+            first) and "next_before" (pass as before for the previous page,
+            None when there are no older messages)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            clear_id = conn.execute("""
+                SELECT MAX(message_id) FROM messages
+                WHERE chat_type = ? AND user_id = ? AND role = 'clear'
+            """, (chat_type, user_id)).fetchone()[0] or 0
+            rows = conn.execute("""
+                SELECT message_id, role, content, timestamp FROM messages
+                WHERE chat_type = ? AND user_id = ? AND message_id > ? AND message_id < ?
+                ORDER BY message_id DESC
+                LIMIT ?
+            """, (chat_type, user_id, clear_id, before or 2 ** 63 - 1, limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return {
+            "messages": [
+                {"id": message_id, "role": role, "content": content, "timestamp": timestamp}
+                for message_id, role, content, timestamp in rows
+            ],
+            "next_before": rows[0][0] if has_more else None
+        }
+
+    @timed("sqlite.seed_messages")
+    def seed_messages(self, chat_type: str, user_id: str) -> int:
+        """
+        Copy a conversation's latest snapshot into the messages table if it has
+        no messages yet (history saved before the table existed)
+        
+        Returns:
+            int: Number of messages copied
+        """
+        exists_sql = "SELECT 1 FROM messages WHERE chat_type = ? AND user_id = ? LIMIT 1"
+        with sqlite3.connect(self.db_path) as conn:
+            if conn.execute(exists_sql, (chat_type, user_id)).fetchone():
+                return 0
+        conversation = self.get_latest_conversation(chat_type, user_id)
+        if not conversation or not conversation["conversation"]:
+            return 0
+        with sqlite3.connect(self.db_path, isolation_level=None) as conn:
+            # Take the write lock before re-checking so two workers can't both seed
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute(exists_sql, (chat_type, user_id)).fetchone():
+                    conn.execute("ROLLBACK")
+                    return 0
+                conn.executemany(
+                    "INSERT INTO messages (chat_type, user_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (chat_type, user_id, msg["role"], msg["content"], msg.get("timestamp"))
+                        for msg in conversation["conversation"]
+                    ]
+                )
+                conn.execute("COMMIT")
+                return len(conversation["conversation"])
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
@@ -48,6 +48,46 @@ const getChatType = () => {
     return path.substring(1) || 'bedrock';
 };
 
+// Parse a server-sent event stream, calling onEvent(eventName, data) per event
+async function readEventStream(body, onEvent) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            onEvent(event, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
+// Re-render the streamed text at most once per animation frame
+let pendingRender = null;
+function scheduleRender(element, text) {
+    const shouldFollow = chatBody.scrollHeight - chatBody.scrollTop - chatBody.clientHeight < 50;
+    pendingRender = { element, text };
+    requestAnimationFrame(() => {
+        if (!pendingRender) return;
+        pendingRender.element.innerHTML = formatMessage(pendingRender.text);
+        pendingRender = null;
+        if (shouldFollow) chatBody.scrollTop = chatBody.scrollHeight;
+    });
+}
+
 async function sendMessage() {
     const message = textarea.value.trim();
     if (message) {
@@ -64,8 +104,8 @@ async function sendMessage() {
         setLoading(true);
         
         try {
-            // Send POST request
-            const response = await fetch('/chat', {
+            // Send POST request and render the reply as it streams in
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -76,13 +116,33 @@ async function sendMessage() {
                 })
             });
             
-            const data = await response.json();
-            
             // Create and append assistant message
             const assistantDiv = document.createElement("div");
             assistantDiv.className = "chat-message ai-response";
-            assistantDiv.innerHTML = formatMessage(data.response);
-            chatHistory.appendChild(assistantDiv);
+            
+            if (!response.ok || !response.body) {
+                const data = await response.json();
+                assistantDiv.innerHTML = formatMessage(data.response || data.error || '');
+                chatHistory.appendChild(assistantDiv);
+                return;
+            }
+            
+            let text = '';
+            await readEventStream(response.body, (event, data) => {
+                if (event === 'error') {
+                    text += data.error;
+                } else if (data.delta) {
+                    text += data.delta;
+                } else {
+                    return;
+                }
+                if (!assistantDiv.isConnected) {
+                    // First token: swap the loading indicator for the reply
+                    setLoading(false);
+                    chatHistory.appendChild(assistantDiv);
+                }
+                scheduleRender(assistantDiv, text);
+            });
         } catch (error) {
             console.error('Error:', error);
         } finally {
@@ -98,6 +158,63 @@ async function sendMessage() {
     }
 }
 
+// Create a message element for a stored history message
+function renderHistoryMessage(message) {
+    const div = document.createElement("div");
+    div.className = message.role === 'user' ? "chat-message user-message" : "chat-message ai-response";
+    div.innerHTML = formatMessage(message.content || '');
+    return div;
+}
+
+// Older history is fetched a page at a time as the user scrolls to the top
+let nextBefore = chatHistory.dataset.nextBefore || null;
+let loadingHistory = false;
+
+async function loadOlderMessages() {
+    if (!nextBefore || loadingHistory) return;
+    loadingHistory = true;
+    try {
+        const params = new URLSearchParams({ chat_type: getChatType(), before: nextBefore });
+        const response = await fetch(`/history?${params}`);
+        if (!response.ok) {
+            nextBefore = null;
+            return;
+        }
+        const page = await response.json();
+        
+        // Prepend without moving what the user is looking at
+        const previousHeight = chatBody.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        page.messages.forEach(message => fragment.appendChild(renderHistoryMessage(message)));
+        chatHistory.insertBefore(fragment, chatHistory.firstChild);
+        chatBody.scrollTop += chatBody.scrollHeight - previousHeight;
+        
+        nextBefore = page.next_before;
+    } catch (error) {
+        console.error('Error loading history:', error);
+        nextBefore = null;
+    } finally {
+        loadingHistory = false;
+    }
+    fillViewport();
+}
+
+// Keep loading while the history is too short to scroll
+function fillViewport() {
+    if (nextBefore && chatBody.scrollHeight <= chatBody.clientHeight) loadOlderMessages();
+}
+
+chatBody.addEventListener('scroll', () => {
+    if (chatBody.scrollTop < 200) loadOlderMessages();
+}, { passive: true });
+
+// Format the server-rendered page of history and start at the newest message
+chatHistory.querySelectorAll('[data-format]').forEach(div => {
+    div.innerHTML = formatMessage(div.textContent.trim());
+});
+chatBody.scrollTop = chatBody.scrollHeight;
+fillViewport();
+
 // Handle Enter key
 textarea.addEventListener('keydown', (e) => {
     if (e.key === 'Enter' && !e.shiftKey) {
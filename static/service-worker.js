@@ -1,19 +1,65 @@
-var staticCacheName = "pwa";
+// Replaced by build_static.py with the manifest version and the hashed asset URLs
+var CACHE_VERSION = "dev";
+var PRECACHE_URLS = ["/"];
+
+var staticCacheName = "pwa-" + CACHE_VERSION;
 
 self.addEventListener("install", function (e) {
   e.waitUntil(
     caches.open(staticCacheName).then(function (cache) {
-      return cache.addAll(["/"]);
+      return cache.addAll(PRECACHE_URLS);
     })
   );
+  self.skipWaiting();
 });
 
-self.addEventListener("fetch", function (event) {
-  console.log(event.request.url);
-
-  event.respondWith(
-    caches.match(event.request).then(function (response) {
-      return response || fetch(event.request);
+// Drop the caches of previous builds
+self.addEventListener("activate", function (e) {
+  e.waitUntil(
+    caches.keys().then(function (names) {
+      return Promise.all(
+        names
+          .filter(function (name) {
+            return name.indexOf("pwa") === 0 && name !== staticCacheName;
+          })
+          .map(function (name) {
+            return caches.delete(name);
+          })
+      );
+    }).then(function () {
+      return self.clients.claim();
     })
   );
-});
\ No newline at end of file
+});
+
+self.addEventListener("fetch", function (event) {
+  var request = event.request;
+  if (request.method !== "GET") return;
+  var url = new URL(request.url);
+
+  // Hashed assets never change: serve from the cache, filling it on a miss
+  if (url.origin === location.origin && url.pathname.indexOf("/static/dist/") === 0) {
+    event.respondWith(
+      caches.open(staticCacheName).then(function (cache) {
+        return cache.match(request).then(function (cached) {
+          return cached || fetch(request).then(function (response) {
+            if (response.ok) cache.put(request, response.clone());
+            return response;
+          });
+        });
+      })
+    );
+    return;
+  }
+
+  // Pages: network first so history is current, the cached shell when offline
+  if (request.mode === "navigate") {
+    event.respondWith(
+      fetch(request).catch(function () {
+        return caches.match(request).then(function (cached) {
+          return cached || caches.match("/");
+        });
+      })
+    );
+  }
+});
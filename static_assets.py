@@ -0,0 +1,115 @@
+"""
+Static Assets Module
+
+Serves the output of build_static.py. asset_url() maps a source path to its
+fingerprinted URL for the templates, and PrecompressedStaticFiles serves the
+prebuilt .br/.gz variant a client accepts, marking hashed files immutable so
+browsers never revalidate them. Without a build, everything falls back to
+the plain files under static/.
+"""
+
+import os
+import threading
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from build_static import DIST_DIRNAME, MANIFEST_FILENAME, SERVICE_WORKER, STATIC_DIR, STATIC_URL, load_manifest
+
+# Hashed filenames change with their content, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Everything else keeps its URL across deploys and must be revalidated
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred encodings, best first, with the suffix build_static.py writes
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    """The built asset manifest, read once per process"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = load_manifest(STATIC_DIR)
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """
+    URL of a static asset, fingerprinted when the build has run
+
+    Args:
+        path: Path relative to static/, e.g. "css/chat.css"
+    """
+    name = get_manifest()["assets"].get(path)
+    if name:
+        return f"{STATIC_URL}/{DIST_DIRNAME}/{name}"
+    return f"{STATIC_URL}/{path}"
+
+
+def is_fingerprinted(path: str) -> bool:
+    """Check if a request path (relative to static/) is a hashed build output"""
+    return path.startswith(f"{DIST_DIRNAME}/") and path not in (
+        f"{DIST_DIRNAME}/{MANIFEST_FILENAME}", f"{DIST_DIRNAME}/{SERVICE_WORKER}"
+    )
+
+
+def accepted_encodings(scope) -> set:
+    """Content codings the client accepts (ignoring q-values other than 0)"""
+    accepted = set()
+    for item in Headers(scope=scope).get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that negotiates Content-Encoding using the .br/.gz files
+    written by build_static.py, instead of compressing on every request
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            path = path.replace(os.sep, "/")
+            if response.status_code == 200:
+                response = await self._encoded_response(path, scope, response)
+            response.headers["Cache-Control"] = (
+                IMMUTABLE_CACHE_CONTROL if is_fingerprinted(path) else REVALIDATE_CACHE_CONTROL
+            )
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _encoded_response(self, path: str, scope, response: Response) -> Response:
+        """
+        Swap in the best precompressed variant the client accepts, if one exists
+
+        The variant has its own ETag and Last-Modified, so a revalidation of it
+        is checked against those rather than the uncompressed file's, which
+        super().get_response already compared (and found changed).
+        """
+        accepted = accepted_encodings(scope)
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await run_in_threadpool(self.lookup_path, path + suffix)
+            if stat_result is None:
+                continue
+            encoded = FileResponse(full_path, stat_result=stat_result)
+            encoded.headers["Content-Type"] = response.headers["Content-Type"]
+            encoded.headers["Content-Encoding"] = encoding
+            if self.is_not_modified(encoded.headers, Headers(scope=scope)):
+                not_modified = NotModifiedResponse(encoded.headers)
+                not_modified.headers["Content-Encoding"] = encoding
+                return not_modified
+            return encoded
+        return response
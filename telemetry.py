@@ -0,0 +1,172 @@
+"""
+Telemetry Module
+
+Records the size of every provider request per persona: input/output tokens
+(from the response usage, or estimated locally when the provider doesn't
+report them), system-prompt bytes, message count and recalled-context bytes.
+Numbers are aggregated in memory so runaway contexts show up before they
+turn into latency and cost.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from context_window import estimate_tokens
+from prompt_cache import system_text
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Requests kept per persona for percentiles and inspection
+TELEMETRY_WINDOW = int(os.getenv("TELEMETRY_WINDOW", "1000"))
+
+# Warn when a single request's input grows past this many tokens
+CONTEXT_WARN_TOKENS = int(os.getenv("CONTEXT_WARN_TOKENS", "20000"))
+
+# Fields summarized by UsageTracker.stats
+_SIZE_FIELDS = ("input_tokens", "output_tokens", "system_bytes", "message_count", "recalled_bytes")
+
+
+def _utf8_len(text: Optional[str]) -> int:
+    return len((text or "").encode("utf-8"))
+
+
+def request_sizes(request: Dict) -> Dict[str, int]:
+    """
+    Measure a messages.create request
+
+    Recalled context is the part of the system prompt without a cache
+    breakpoint (see prompt_cache.build_system_blocks). This includes the
+    rolling summary, so callers that send one pass recalled_bytes to
+    UsageTracker.record.
+    """
+    system = request.get("system")
+    messages = request.get("messages") or []
+    recalled = ""
+    if isinstance(system, list):
+        recalled = "\n\n".join(block.get("text", "") for block in system if "cache_control" not in block)
+    return {
+        "system_bytes": _utf8_len(system_text(system)),
+        "message_count": len(messages),
+        "message_bytes": sum(_utf8_len(msg.get("content") if isinstance(msg.get("content"), str) else "") for msg in messages),
+        "recalled_bytes": _utf8_len(recalled),
+        "estimated_input_tokens": estimate_tokens(system_text(system)) + sum(
+            estimate_tokens(msg.get("content") if isinstance(msg.get("content"), str) else "") for msg in messages
+        )
+    }
+
+
+class UsageTracker:
+    """Per-persona request size statistics"""
+
+    def __init__(self, window: int = TELEMETRY_WINDOW, warn_tokens: int = CONTEXT_WARN_TOKENS):
+        self.window = window
+        self.warn_tokens = warn_tokens
+        self._records: Dict[str, deque] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        persona: Optional[str],
+        request: Dict,
+        usage: Optional[Dict[str, int]] = None,
+        reply: Optional[str] = None,
+        recalled_bytes: Optional[int] = None
+    ) -> Dict:
+        """
+        Record one provider call
+
+        Args:
+            persona (str): Chat type the request belongs to
+            request (Dict): The messages.create keyword arguments
+            usage (Dict[str, int]): prompt_cache.usage_report of the response, if any
+            reply (str): Reply text, used to estimate output tokens without usage
+            recalled_bytes (int): Size of recalled context, when the caller knows it
+                better than the system blocks do
+
+        Returns:
+            Dict: The stored record
+        """
+        sizes = request_sizes(request)
+        reported_input = sum(
+            (usage or {}).get(key, 0)
+            for key in ("uncached_input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+        )
+        estimated = not reported_input
+        record = {
+            "time": time.time(),
+            "persona": persona or "chat",
+            "model": request.get("model"),
+            "input_tokens": reported_input or sizes["estimated_input_tokens"],
+            "output_tokens": (usage or {}).get("output_tokens") or estimate_tokens(reply or ""),
+            "cache_read_tokens": (usage or {}).get("cache_read_input_tokens", 0),
+            "estimated": estimated,
+            "system_bytes": sizes["system_bytes"],
+            "message_count": sizes["message_count"],
+            "message_bytes": sizes["message_bytes"],
+            "recalled_bytes": sizes["recalled_bytes"] if recalled_bytes is None else recalled_bytes
+        }
+
+        with self._lock:
+            records = self._records.setdefault(record["persona"], deque(maxlen=self.window))
+            records.append(record)
+            totals = self._totals.setdefault(record["persona"], {"requests": 0, "estimated_requests": 0})
+            totals["requests"] += 1
+            totals["estimated_requests"] += int(estimated)
+            for field in ("input_tokens", "output_tokens", "cache_read_tokens", "system_bytes", "recalled_bytes"):
+                totals[field] = totals.get(field, 0) + record[field]
+
+        if record["input_tokens"] > self.warn_tokens:
+            logger.warning(
+                "[%s] Large request: ~%d input tokens, %d messages, %d system bytes",
+                record['persona'], record['input_tokens'], record['message_count'], record['system_bytes']
+            )
+        return record
+
+    def stats(self, persona: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Aggregated statistics per persona
+
+        Totals cover every request since startup; mean, p95 and max cover the
+        last `window` requests.
+        """
+        with self._lock:
+            personas = [persona] if persona else sorted(self._records)
+            snapshot = {
+                name: (list(self._records.get(name, ())), dict(self._totals.get(name, {})))
+                for name in personas
+            }
+
+        stats = {}
+        for name, (records, totals) in snapshot.items():
+            if not records:
+                continue
+            summary = {"totals": totals}
+            for field in _SIZE_FIELDS:
+                values = sorted(record[field] for record in records)
+                summary[field] = {
+                    "mean": round(sum(values) / len(values), 1),
+                    "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                    "max": values[-1]
+                }
+            summary["last"] = records[-1]
+            stats[name] = summary
+        return stats
+
+    def recent(self, persona: str, limit: int = 20) -> List[Dict]:
+        """Most recent records for a persona, newest last"""
+        with self._lock:
+            return list(self._records.get(persona, ()))[-limit:]
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._totals.clear()
+
+
+# Create an instance for import
+usage_tracker = UsageTracker()
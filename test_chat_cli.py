@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import argparse
 from chat_client import ChatClient
+from log_config import configure_logging
+from model_router import ModelRouter, DEFAULT_POLICY
 import sys
 import json
 from datetime import datetime
@@ -11,7 +13,7 @@ def format_message(role: str, content: str):
     role_color = "\033[94m" if role == "assistant" else "\033[92m"  # Blue for assistant, green for user
     return f"{role_color}[{timestamp}] {role.upper()}\033[0m: {content}"
 
-def start_chat_session(chat_type: str, model: str = "claude-3-sonnet-20240229"):
+def start_chat_session(chat_type: str, model: str = "auto"):
     """Start an interactive chat session"""
     print(f"\n🤖 Starting chat session with {chat_type} using model {model}")
     print("Type 'exit' or 'quit' to end the session")
@@ -20,7 +22,11 @@ def start_chat_session(chat_type: str, model: str = "claude-3-sonnet-20240229"):
     print("-" * 50)
 
     # Initialize chat client without saving to database
-    client = ChatClient(model=model, system_prompt="", chat_type=None)  # chat_type=None prevents database saving
+    # "auto" lets the router pick the model per message
+    router = ModelRouter() if model == "auto" else None
+    if router:
+        model = DEFAULT_POLICY["models"][0]
+    client = ChatClient(model=model, system_prompt="", chat_type=None, router=router)  # chat_type=None prevents database saving
     
     while True:
         try:
@@ -58,8 +64,8 @@ def main():
     parser = argparse.ArgumentParser(description='Interactive chat testing tool')
     parser.add_argument('--type', '-t', default='chat',
                       help='Type of chat (e.g., ocean, vampire, etc.)')
-    parser.add_argument('--model', '-m', default='claude-3-sonnet-20240229',
-                      help='Model to use (default: claude-3-sonnet-20240229)')
+    parser.add_argument('--model', '-m', default='auto',
+                      help='Model to use, or "auto" to route per message (default: auto)')
     
     args = parser.parse_args()
     
@@ -70,4 +76,5 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    configure_logging()
     main() 
\ No newline at end of file
@@ -4,21 +4,20 @@ Test script to process a single conversation using AWS Bedrock's Mistral model.
 
 import json
 import time
-import boto3
 from datetime import datetime
 from sqlite_client import SQLiteClient
+from log_config import configure_logging
+from response_cache import get_response_cache
+from provider_registry import registry
 from dotenv import load_dotenv
 
 # Ensure environment variables are loaded
 load_dotenv()
 
 def initialize_bedrock_client():
-    """Initialize AWS Bedrock client"""
+    """Initialize AWS Bedrock client (a local fake when LLM_PROVIDER=fake)"""
     try:
-        client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name='us-east-1'
-        )
+        client = registry.bedrock_runtime()
         print("Successfully initialized Bedrock client")
         return client
     except Exception as e:
@@ -129,15 +128,22 @@ def process_single_conversation():
     message = prepare_message(conversation)
     
     try:
-        # Call Bedrock API
+        # Call Bedrock API (repeated runs over the same conversation hit the cache)
         print("\nCalling Bedrock API...")
-        response = bedrock_client.invoke_model(
-            modelId='mistral.mistral-small-2402-v1:0',
-            body=json.dumps(message)
-        )
+        model_id = 'mistral.mistral-small-2402-v1:0'
+        params = {k: v for k, v in message.items() if k != "prompt"}
+        
+        def invoke():
+            response = bedrock_client.invoke_model(
+                modelId=model_id,
+                body=json.dumps(message)
+            )
+            # Parse the response
+            return json.loads(response.get('body').read())
         
-        # Parse the response
-        response_body = json.loads(response.get('body').read())
+        cache = get_response_cache()
+        response_body = cache.get_or_call(model_id, message["prompt"], params, invoke)
+        print(f"\nResponse cache: {cache.stats()}")
         print("\nRaw response body:")
         print(json.dumps(response_body, indent=2))
         
@@ -169,4 +175,5 @@ def process_single_conversation():
         print(traceback.format_exc())
 
 if __name__ == "__main__":
+    configure_logging()
     process_single_conversation() 
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 from sqlite_client import SQLiteClient
+from log_config import configure_logging
 from datetime import datetime
 
 def test_sqlite_memory():
@@ -68,4 +69,5 @@ def test_sqlite_memory():
     print("\nTest completed and test database removed.")
 
 if __name__ == "__main__":
+    configure_logging()
     test_sqlite_memory() 
\ No newline at end of file
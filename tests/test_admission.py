@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test admission control: in-flight limits, the bounded queue and deadlines
+"""
+
+import asyncio
+import threading
+
+from admission import AdmissionController, Overloaded
+
+
+def test_limits_queue_and_handoff():
+    async def run():
+        controller = AdmissionController(max_inflight=2, persona_limit=2, max_queue=2, queue_timeout=5)
+        first = await controller.acquire("ocean")
+        second = await controller.acquire("ocean")
+
+        waiting = asyncio.ensure_future(controller.acquire("mkm"))
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+
+        controller.release("ocean", first)
+        await asyncio.wait_for(waiting, 1)
+        stats = controller.stats()
+        assert stats["inflight_by_persona"] == {"ocean": 1, "mkm": 1}
+        assert stats["queue_depth"] == 0 and stats["max_queue_depth"] == 1
+
+        controller.release("ocean", second)
+        controller.release("mkm")
+        assert controller.stats()["inflight"] == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejects_with_429():
+    async def run():
+        controller = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=5)
+        await controller.acquire("ocean")
+        queued = asyncio.ensure_future(controller.acquire("ocean"))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire("ocean")
+            assert False, "expected Overloaded"
+        except Overloaded as e:
+            assert e.status_code == 429 and e.retry_after >= 1
+        queued.cancel()
+        assert controller.stats()["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_deadline_rejects_with_503():
+    async def run():
+        controller = AdmissionController(max_inflight=1, max_queue=4, queue_timeout=0.05)
+        await controller.acquire("ocean")
+        try:
+            await controller.acquire("ocean")
+            assert False, "expected Overloaded"
+        except Overloaded as e:
+            assert e.status_code == 503
+        stats = controller.stats()
+        assert stats["timed_out"] == 1 and stats["queue_depth"] == 0
+
+    asyncio.run(run())
+
+
+def test_busy_persona_does_not_block_others():
+    async def run():
+        controller = AdmissionController(max_inflight=4, persona_limit=1, max_queue=4, queue_timeout=5)
+        await controller.acquire("ocean")
+        blocked = asyncio.ensure_future(controller.acquire("ocean"))
+        await asyncio.sleep(0)
+        # mkm has room, so it is admitted even though an ocean request is queued ahead
+        await asyncio.wait_for(controller.acquire("mkm"), 1)
+        assert not blocked.done()
+        controller.release("ocean")
+        await asyncio.wait_for(blocked, 1)
+
+    asyncio.run(run())
+
+
+def test_release_from_worker_thread():
+    async def run():
+        controller = AdmissionController(max_inflight=1, max_queue=4, queue_timeout=5)
+        admitted_at = await controller.acquire("ocean")
+        waiting = asyncio.ensure_future(controller.acquire("ocean"))
+        await asyncio.sleep(0)
+        threading.Thread(target=controller.release, args=("ocean", admitted_at)).start()
+        await asyncio.wait_for(waiting, 1)
+        assert controller.stats()["inflight"] == 1
+
+    asyncio.run(run())
+
+
+def test_burst_never_exceeds_limits():
+    async def run():
+        controller = AdmissionController(max_inflight=5, persona_limit=3, max_queue=1000, queue_timeout=5)
+        active = {"total": 0, "peak": 0}
+
+        async def request(persona):
+            async with controller.admit(persona):
+                active["total"] += 1
+                active["peak"] = max(active["peak"], active["total"])
+                assert controller.stats()["inflight_by_persona"][persona] <= 3
+                await asyncio.sleep(0.001)
+                active["total"] -= 1
+
+        await asyncio.gather(*(request(("ocean", "mkm", "claude")[i % 3]) for i in range(300)))
+        stats = controller.stats()
+        assert active["peak"] <= 5
+        assert stats["admitted"] == 300 and stats["inflight"] == 0 and stats["queue_depth"] == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_limits_queue_and_handoff()
+    test_full_queue_rejects_with_429()
+    test_deadline_rejects_with_503()
+    test_busy_persona_does_not_block_others()
+    test_release_from_worker_thread()
+    test_burst_never_exceeds_limits()
+    print("Admission tests passed")
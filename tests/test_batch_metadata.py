@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the batch metadata pipeline against a temporary database and a fake analyzer
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+from batch_metadata import BatchMetadataPipeline
+from sqlite_client import SQLiteClient
+
+
+def make_db(directory, conversations):
+    db_path = os.path.join(directory, "chat.db")
+    client = SQLiteClient(db_path)
+    ids = []
+    for text, metadata in conversations:
+        ids.append(client.save_conversation({
+            "chat_type": "claude",
+            "user_id": "default",
+            "conversation": [{"role": "user", "content": text}, {"role": "assistant", "content": "Noted."}],
+            "metadata": metadata
+        }))
+    return db_path, ids
+
+
+def fake_analyze(messages):
+    """Stands in for the Bedrock call: the first word of the user message is the topic"""
+    topic = messages[0]["content"].split()[0].lower()
+    return {"topics": [topic], "summary": f"Talked about {topic}"}
+
+
+def test_backfills_metadata_and_fts():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path, ids = make_db(directory, [
+            ("Lighthouses at dusk", {"summary": "Chat history", "topics": []}),
+            ("Crabcakes recipe", {}),
+            ("Already done", {"summary": "Done", "topics": ["done"]})
+        ])
+        pipeline = BatchMetadataPipeline(
+            db_path, analyze_fn=fake_analyze, batch_size=1, max_workers=2,
+            checkpoint_path=os.path.join(directory, "checkpoint.json")
+        )
+
+        result = pipeline.run()
+        assert result == {"pending": 2, "updated": 2, "failed": 0}
+
+        with sqlite3.connect(db_path) as conn:
+            metadata = json.loads(conn.execute("SELECT metadata FROM conversations WHERE chat_id = ?", (ids[0],)).fetchone()[0])
+            hits = conn.execute("SELECT chat_id FROM conversation_fts WHERE conversation_fts MATCH 'topics:crabcakes'").fetchall()
+        assert metadata["topics"] == ["lighthouses"]
+        assert metadata["summary"] == "Talked about lighthouses"
+        assert [row[0] for row in hits] == [ids[1]]
+
+
+def test_checkpoint_resumes_and_records_failures():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path, ids = make_db(directory, [("Tides", {}), ("Storms", {}), ("Gulls", {})])
+        checkpoint_path = os.path.join(directory, "checkpoint.json")
+        calls = []
+        lock = threading.Lock()
+
+        def flaky_analyze(messages):
+            with lock:
+                calls.append(messages[0]["content"])
+            if messages[0]["content"] == "Storms":
+                raise RuntimeError("ThrottlingException")
+            return fake_analyze(messages)
+
+        result = BatchMetadataPipeline(db_path, flaky_analyze, checkpoint_path=checkpoint_path).run()
+        assert result["updated"] == 2 and result["failed"] == 1
+
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        assert str(ids[1]) in checkpoint["failed"]
+
+        # A resumed run only retries the failure
+        calls.clear()
+        result = BatchMetadataPipeline(db_path, flaky_analyze, checkpoint_path=checkpoint_path).run()
+        assert calls == ["Storms"]
+        assert result["pending"] == 1
+
+
+def test_updates_fts_rows_by_rowid():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        SQLiteClient(db_path)
+        with sqlite3.connect(db_path) as conn:
+            # An FTS row left behind by an earlier import shifts every rowid
+            # away from its chat_id
+            conn.execute("INSERT INTO conversation_fts (chat_id, content, chat_type) VALUES (-1, 'stray', 'claude')")
+        _, ids = make_db(directory, [(f"Topic{i} and more", {}) for i in range(300)])
+
+        pipeline = BatchMetadataPipeline(
+            db_path, analyze_fn=fake_analyze, batch_size=100,
+            checkpoint_path=os.path.join(directory, "checkpoint.json")
+        )
+        assert pipeline.run()["updated"] == 300
+
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT chat_id, topics, summary, content FROM conversation_fts WHERE chat_id >= 0").fetchall()
+            hits = conn.execute("SELECT chat_id FROM conversation_fts WHERE conversation_fts MATCH 'topics:topic123'").fetchall()
+        assert len(rows) == 300
+        for chat_id, topics, summary, content in rows:
+            topic = content.split()[0].lower()
+            assert (topics, summary) == (topic, f"Talked about {topic}")
+        assert hits == [(ids[123],)]
+
+
+if __name__ == "__main__":
+    test_backfills_metadata_and_fts()
+    test_checkpoint_resumes_and_records_failures()
+    test_updates_fts_rows_by_rowid()
+    print("Batch metadata tests passed")
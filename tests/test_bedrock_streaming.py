@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test Bedrock streaming against a local fake of invoke_model_with_response_stream
+"""
+
+import json
+
+from bedrock_client import BedrockMessages
+
+
+def make_chunk(event):
+    """Encode an event the way Bedrock's EventStream delivers it"""
+    return {"chunk": {"bytes": json.dumps(event).encode("utf-8")}}
+
+
+class FakeBedrockRuntime:
+    """Stand-in for the boto3 bedrock-runtime client"""
+
+    def __init__(self, deltas, fail_with=None):
+        self.deltas = deltas
+        self.fail_with = fail_with
+        self.requests = []
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        self.requests.append({"modelId": modelId, "body": json.loads(body)})
+        events = [
+            make_chunk({"type": "message_start", "message": {
+                "role": "assistant", "content": [], "usage": {"input_tokens": 12, "output_tokens": 1}
+            }}),
+            make_chunk({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+        ]
+        for text in self.deltas:
+            events.append(make_chunk({
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}
+            }))
+        if self.fail_with:
+            events.append({self.fail_with: {"message": "upstream hiccup"}})
+        events += [
+            make_chunk({"type": "content_block_stop", "index": 0}),
+            make_chunk({"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 3}}),
+            make_chunk({"type": "message_stop"}),
+        ]
+        return {"body": iter(events)}
+
+
+def collect_text(stream):
+    """Consume a stream the way ChatClient.stream_message does"""
+    chunks = []
+    for event in stream:
+        if event.type == "content_block_delta":
+            text = getattr(event.delta, "text", None)
+            if text:
+                chunks.append(text)
+    return chunks
+
+
+def test_stream_yields_anthropic_style_deltas():
+    runtime = FakeBedrockRuntime(["Hello", ", ", "honey"])
+    messages = BedrockMessages(runtime)
+
+    stream = messages.create(
+        model="anthropic.claude-3-haiku-20240307-v1:0",
+        max_tokens=64,
+        system="Be brief",
+        messages=[{"role": "user", "content": "Hi"}],
+        stream=True
+    )
+
+    assert collect_text(stream) == ["Hello", ", ", "honey"]
+    request = runtime.requests[0]
+    assert request["modelId"] == "anthropic.claude-3-haiku-20240307-v1:0"
+    assert request["body"]["system"] == "Be brief"
+    assert request["body"]["messages"] == [{"role": "user", "content": "Hi"}]
+
+
+def test_stream_exposes_event_fields():
+    runtime = FakeBedrockRuntime(["ok"])
+    stream = BedrockMessages(runtime).create(
+        model="m", messages=[{"role": "user", "content": "Hi"}], stream=True
+    )
+
+    events = list(stream)
+    assert [event.type for event in events] == [
+        "message_start", "content_block_start", "content_block_delta",
+        "content_block_stop", "message_delta", "message_stop"
+    ]
+    assert events[0].message.usage.input_tokens == 12
+    assert events[4].delta.stop_reason == "end_turn"
+
+
+def test_text_stream():
+    runtime = FakeBedrockRuntime(["a", "b"])
+    stream = BedrockMessages(runtime).create(
+        model="m", messages=[{"role": "user", "content": "Hi"}], stream=True
+    )
+    assert "".join(stream.text_stream) == "ab"
+
+
+def test_mid_stream_exception_is_raised():
+    runtime = FakeBedrockRuntime(["partial"], fail_with="internalServerException")
+    stream = BedrockMessages(runtime).create(
+        model="m", messages=[{"role": "user", "content": "Hi"}], stream=True
+    )
+
+    received = []
+    try:
+        for event in stream:
+            received.append(event.type)
+        raise AssertionError("expected the stream to fail")
+    except RuntimeError as e:
+        assert "internalServerException" in str(e)
+    assert "content_block_delta" in received
+
+
+if __name__ == "__main__":
+    test_stream_yields_anthropic_style_deltas()
+    test_stream_exposes_event_fields()
+    test_text_stream()
+    test_mid_stream_exception_is_raised()
+    print("Bedrock streaming tests passed")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the fingerprinted, precompressed static build
+"""
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+
+from build_static import build, load_manifest
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def make_static(directory):
+    static_dir = os.path.join(directory, "static")
+    write(os.path.join(static_dir, "css", "chat.css"), ".chat { color: red; }\n" * 50)
+    write(os.path.join(static_dir, "js", "chat.js"), "console.log('hi');\n" * 50)
+    write(os.path.join(static_dir, "manifest.json"), '{"icons": []}')
+    write(os.path.join(static_dir, "service-worker.js"),
+          'var CACHE_VERSION = "dev";\nvar PRECACHE_URLS = ["/"];\nvar staticCacheName = "pwa-" + CACHE_VERSION;\n')
+    return static_dir
+
+
+def test_build_hashes_and_compresses():
+    with tempfile.TemporaryDirectory() as directory:
+        static_dir = make_static(directory)
+        manifest = build(static_dir)
+
+        assert set(manifest["assets"]) == {"css/chat.css", "js/chat.js"}
+        name = manifest["assets"]["css/chat.css"]
+        assert name.startswith("css/chat.") and name.endswith(".css") and name != "css/chat.css"
+
+        built = os.path.join(static_dir, "dist", name)
+        with open(os.path.join(static_dir, "css", "chat.css"), "rb") as f:
+            original = f.read()
+        with open(built, "rb") as f:
+            assert f.read() == original
+        with gzip.open(built + ".gz", "rb") as f:
+            assert f.read() == original
+
+        assert load_manifest(static_dir) == manifest
+
+
+def test_hash_and_version_follow_content():
+    with tempfile.TemporaryDirectory() as directory:
+        static_dir = make_static(directory)
+        first = build(static_dir)
+        assert build(static_dir) == first
+
+        write(os.path.join(static_dir, "js", "chat.js"), "console.log('changed');\n")
+        second = build(static_dir)
+        assert second["assets"]["css/chat.css"] == first["assets"]["css/chat.css"]
+        assert second["assets"]["js/chat.js"] != first["assets"]["js/chat.js"]
+        assert second["version"] != first["version"]
+        # The previous build's files are gone
+        assert not os.path.exists(os.path.join(static_dir, "dist", first["assets"]["js/chat.js"]))
+
+
+def test_service_worker_is_versioned():
+    with tempfile.TemporaryDirectory() as directory:
+        static_dir = make_static(directory)
+        manifest = build(static_dir)
+        with open(os.path.join(static_dir, "dist", "service-worker.js")) as f:
+            script = f.read()
+        assert f'var CACHE_VERSION = "{manifest["version"]}";' in script
+        precache = json.loads(script.split("var PRECACHE_URLS = ")[1].split(";")[0])
+        assert "/" in precache
+        assert f"/static/dist/{manifest['assets']['css/chat.css']}" in precache
+
+
+def test_missing_build_falls_back():
+    with tempfile.TemporaryDirectory() as directory:
+        assert load_manifest(directory) == {"version": "dev", "assets": {}}
+
+
+def test_unreadable_manifest_is_logged():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger("build_static")
+    logger.addHandler(handler)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "dist"))
+            with open(os.path.join(directory, "dist", "manifest.json"), "w") as f:
+                f.write("{not json")
+            assert load_manifest(directory) == {"version": "dev", "assets": {}}
+    finally:
+        logger.removeHandler(handler)
+    assert [record.levelno for record in records] == [logging.WARNING]
+    assert "Could not load static manifest" in records[0].getMessage()
+
+
+if __name__ == "__main__":
+    test_build_hashes_and_compresses()
+    test_hash_and_version_follow_content()
+    test_service_worker_is_versioned()
+    test_missing_build_falls_back()
+    test_unreadable_manifest_is_logged()
+    print("Static build tests passed")
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
 Test the Claude chat with memory integration
+
+Run with LLM_PROVIDER=fake to use the local fake provider instead of the Anthropic API.
 """
 
 from chat_manager import chat_manager
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Stress test concurrent turns on ChatClient through the fake provider
+
+Fires thousands of parallel turns at a set of conversations (threads and
+asyncio tasks) and checks that every conversation's history alternates
+user/assistant with each reply answering the message before it, and that
+SQLite holds exactly one snapshot row per message, each a prefix of the final log.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_client import ChatClient
+from fake_provider import AsyncFakeAnthropic, FakeAnthropic, FakeConfig, FakeLLM
+
+CONVERSATIONS = 50
+TURNS_PER_CONVERSATION = 20
+
+
+def make_clients(db_path):
+    llm = FakeLLM(FakeConfig(latency="uniform:0:0.002", tokens_per_second=0, reply_tokens=8, seed=7))
+    return [
+        ChatClient(
+            chat_type="ocean",
+            model="claude-3-haiku-20240307",
+            client=FakeAnthropic(llm),
+            async_client=AsyncFakeAnthropic(llm),
+            user_id=f"user-{i}",
+            db_path=db_path
+        )
+        for i in range(CONVERSATIONS)
+    ]
+
+
+def check_consistency(clients, db_path):
+    for client in clients:
+        log = client.chat_log
+        assert len(log) == 2 * TURNS_PER_CONVERSATION, (client.user_id, len(log))
+        for user_msg, assistant_msg in zip(log[0::2], log[1::2]):
+            assert user_msg["role"] == "user" and assistant_msg["role"] == "assistant"
+            # The fake echoes the last user message, so each reply must follow its question
+            assert f"You said: {user_msg['content']}" in assistant_msg["content"]
+        assert sorted(msg["content"] for msg in log[0::2]) == sorted(
+            f"{client.user_id} turn {turn}" for turn in range(TURNS_PER_CONVERSATION)
+        )
+
+        with sqlite3.connect(db_path) as conn:
+            rows = [json.loads(row[0]) for row in conn.execute(
+                "SELECT conversation FROM conversations WHERE user_id = ? ORDER BY chat_id", (client.user_id,)
+            )]
+        assert len(rows) == 2 * TURNS_PER_CONVERSATION
+        for length, snapshot in enumerate(rows, start=1):
+            assert snapshot == log[:length]
+
+
+def test_threaded_turns_stay_ordered():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        clients = make_clients(db_path)
+        turns = [(client, turn) for turn in range(TURNS_PER_CONVERSATION) for client in clients]
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            list(executor.map(
+                lambda item: item[0].send_message(f"{item[0].user_id} turn {item[1]}", max_tokens=32),
+                turns
+            ))
+
+        check_consistency(clients, db_path)
+
+
+def test_async_turns_stay_ordered():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        clients = make_clients(db_path)
+
+        async def run_all():
+            await asyncio.gather(*(
+                client.asend_message(f"{client.user_id} turn {turn}", max_tokens=32)
+                for turn in range(TURNS_PER_CONVERSATION)
+                for client in clients
+            ))
+
+        asyncio.run(run_all())
+        check_consistency(clients, db_path)
+
+
+def test_streams_and_sends_interleave_safely():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        clients = make_clients(db_path)[:10]
+
+        def turn(item):
+            client, number = item
+            message = f"{client.user_id} turn {number}"
+            if number % 2:
+                return "".join(client.stream_message(message, max_tokens=32))
+            return client.send_message(message, max_tokens=32)
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            list(executor.map(turn, [(c, t) for t in range(TURNS_PER_CONVERSATION) for c in clients]))
+
+        check_consistency(clients, db_path)
+
+
+if __name__ == "__main__":
+    test_threaded_turns_stay_ordered()
+    test_async_turns_stay_ordered()
+    test_streams_and_sends_interleave_safely()
+    print("Concurrency tests passed")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test the history window and recalled context that keep requests bounded as a chat grows
+"""
+
+from context_window import HistoryWindow, build_recalled_context, estimate_tokens
+
+
+def chat(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}. More detail here"})
+        messages.append({"role": "assistant", "content": f"Answer {i}. With an explanation"})
+    return messages
+
+
+def test_split_keeps_the_latest_turns():
+    messages = chat(5)
+    older, recent = HistoryWindow(max_turns=2).split(messages)
+    assert older == messages[:6] and recent == messages[6:]
+    assert recent[0]["role"] == "user"
+
+
+def test_split_respects_the_token_budget():
+    messages = chat(5)
+    # Each message is about 7 tokens, so two turns (~28 tokens) fit in 30
+    older, recent = HistoryWindow(max_tokens=30).split(messages)
+    assert len(recent) == 4 and recent[0]["content"] == "Question 3. More detail here"
+
+    # The latest user turn is kept even when it alone is over budget
+    messages.append({"role": "user", "content": "x" * 400})
+    older, recent = HistoryWindow(max_tokens=10).split(messages)
+    assert recent == messages[-1:]
+
+
+def test_summary_is_folded_incrementally():
+    window = HistoryWindow(max_turns=1)
+    messages = chat(3)
+    older, _ = window.split(messages)
+    summary = window.summarize(older)
+    assert summary.splitlines() == [
+        "Earlier in this conversation:",
+        "- The user said: Question 0.",
+        "- You replied: Answer 0.",
+        "- The user said: Question 1.",
+        "- You replied: Answer 1."
+    ]
+
+    # Sliding forward only appends the newly overflowed messages
+    messages += chat(4)[6:]
+    older, _ = window.split(messages)
+    assert window.summarize(older).splitlines()[-2:] == ["- The user said: Question 2.", "- You replied: Answer 2."]
+    assert window._folded == 6
+
+
+def test_summary_restarts_when_the_log_changes():
+    window = HistoryWindow(max_turns=1)
+    window.summarize(chat(3)[:4])
+
+    # A log that no longer ends where the folded one did (e.g. after a clear)
+    fresh = [{"role": "user", "content": "Something else entirely"}, {"role": "assistant", "content": "Sure."}]
+    assert window.summarize(fresh).splitlines()[1:] == ["- The user said: Something else entirely", "- You replied: Sure."]
+
+    edited = chat(3)[:3] + [{"role": "assistant", "content": "A revised answer."}]
+    window.summarize(chat(3)[:4])
+    assert window.summarize(edited).splitlines()[-1] == "- You replied: A revised answer."
+    assert len(window.summarize(edited).splitlines()) == 5
+
+
+def test_summary_keeps_the_newest_lines_within_budget():
+    window = HistoryWindow(max_turns=1, summary_chars=60)
+    lines = window.summarize(chat(10)[:18]).splitlines()[1:]
+    assert lines[-1] == "- You replied: Answer 8."
+    assert sum(len(line) + 1 for line in lines) <= 60
+
+
+def test_from_policy():
+    assert HistoryWindow.from_policy(None) is None
+    assert HistoryWindow.from_policy({"summary_chars": 100}) is None
+    assert HistoryWindow.from_policy({"max_turns": 4}).max_turns == 4
+
+
+def test_recalled_context_skips_duplicates():
+    window = [{"role": "user", "content": "Tell me about tides"}]
+    conversations = [
+        {"conversation": [
+            {"role": "user", "content": "Tell me about tides"},
+            {"role": "assistant", "content": "Tides follow the moon."}
+        ]},
+        {"conversation": [
+            {"role": "assistant", "content": "Tides follow the moon."},
+            {"role": "user", "content": "And storms?"},
+            {"role": "assistant", "content": ""}
+        ]}
+    ]
+    assert build_recalled_context(conversations, window).splitlines() == [
+        "Relevant moments from earlier conversations:",
+        "- You replied: Tides follow the moon.",
+        "- The user said: And storms?"
+    ]
+
+
+def test_recalled_context_is_capped():
+    conversations = [{"conversation": [
+        {"role": "user", "content": f"Message {i} " + "word " * 200} for i in range(20)
+    ]}]
+    context = build_recalled_context(conversations, [], max_tokens=200, line_chars=100)
+    lines = context.splitlines()[1:]
+    assert len(lines) == 6
+    assert all(line.endswith("...") and len(line) <= len("- The user said: ") + 103 for line in lines)
+    assert sum(estimate_tokens(line) for line in lines) <= 200
+
+
+def test_nothing_recalled():
+    assert build_recalled_context([], []) == ""
+    assert build_recalled_context(None, []) == ""
+    window = [{"role": "user", "content": "Same"}]
+    assert build_recalled_context([{"conversation": window}], window) == ""
+
+
+if __name__ == "__main__":
+    test_split_keeps_the_latest_turns()
+    test_split_respects_the_token_budget()
+    test_summary_is_folded_incrementally()
+    test_summary_restarts_when_the_log_changes()
+    test_summary_keeps_the_newest_lines_within_budget()
+    test_from_policy()
+    test_recalled_context_skips_duplicates()
+    test_recalled_context_is_capped()
+    test_nothing_recalled()
+    print("Context window tests passed")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test that ConversationLock hands the lock between threads and coroutines without losing wakeups
+"""
+
+import asyncio
+import threading
+
+from conversation_lock import ConversationLock
+
+
+def test_thread_release_wakes_async_waiter():
+    lock = ConversationLock()
+    lock.acquire()
+
+    async def main():
+        waiter = asyncio.create_task(lock.acquire_async())
+        await asyncio.sleep(0.01)
+        threading.Timer(0.01, lock.release).start()
+        await asyncio.wait_for(waiter, 1)
+        assert lock.locked()
+        lock.release()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_passes_its_wakeup_on():
+    lock = ConversationLock()
+
+    async def main():
+        lock.acquire()
+        first = asyncio.create_task(lock.acquire_async())
+        second = asyncio.create_task(lock.acquire_async())
+        await asyncio.sleep(0.01)
+
+        # The release picks `first`, which is cancelled before it runs
+        lock.release()
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        assert first.cancelled()
+        assert lock.locked()
+        lock.release()
+        assert not lock.locked()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    test_thread_release_wakes_async_waiter()
+    test_cancelled_waiter_passes_its_wakeup_on()
+    print("Conversation lock tests passed")
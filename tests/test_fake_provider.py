@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test the fake Anthropic/Bedrock provider in process and over HTTP
+"""
+
+import asyncio
+import base64
+import json
+import struct
+import time
+import urllib.error
+import urllib.request
+import zlib
+
+from fake_provider import (
+    AsyncFakeAnthropic,
+    FakeAnthropic,
+    FakeAPIError,
+    FakeBedrockRuntime,
+    FakeClientError,
+    FakeConfig,
+    FakeLLM,
+    LatencyDistribution,
+    start_server
+)
+
+MESSAGES = [{"role": "user", "content": "Tell me about the harbor"}]
+
+
+def fast_config(**overrides):
+    options = {"latency": "fixed:0", "tokens_per_second": 0, "reply_tokens": 12, "seed": 1}
+    options.update(overrides)
+    return FakeConfig(**options)
+
+
+def decode_event_stream(data):
+    """Decode AWS event stream messages, checking both CRCs"""
+    messages = []
+    while data:
+        total_length, headers_length = struct.unpack(">II", data[:8])
+        assert struct.unpack(">I", data[8:12])[0] == zlib.crc32(data[:8])
+        message = data[:total_length]
+        assert struct.unpack(">I", message[-4:])[0] == zlib.crc32(message[:-4])
+        payload = message[12 + headers_length:-4]
+        messages.append(json.loads(payload))
+        data = data[total_length:]
+    return messages
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_latency_distributions():
+    import random
+    rng = random.Random(0)
+    assert LatencyDistribution("fixed:0.2").sample(rng) == 0.2
+    assert 0.1 <= LatencyDistribution("uniform:0.1:0.3").sample(rng) <= 0.3
+    assert LatencyDistribution("lognormal:0.4:0.5").sample(rng) > 0
+    try:
+        LatencyDistribution("pareto:1")
+        raise AssertionError("expected an unknown distribution to fail")
+    except ValueError:
+        pass
+
+
+def test_anthropic_shape_and_determinism():
+    client = FakeAnthropic(FakeLLM(fast_config()))
+    first = client.messages.create(model="claude-3-haiku-20240307", max_tokens=64, system="Be kind", messages=MESSAGES)
+    second = client.messages.create(model="claude-3-haiku-20240307", max_tokens=64, system="Be kind", messages=MESSAGES)
+
+    assert first.content[0].text == second.content[0].text
+    assert "harbor" in first.content[0].text
+    assert first.usage.output_tokens == 12
+    assert first.usage.input_tokens > 0
+
+
+def test_anthropic_stream_events():
+    client = FakeAnthropic(FakeLLM(fast_config()))
+    events = list(client.messages.create(model="m", max_tokens=64, messages=MESSAGES, stream=True))
+
+    assert events[0].type == "message_start"
+    assert events[0].message.usage.input_tokens > 0
+    text = "".join(event.delta.text for event in events if event.type == "content_block_delta")
+    assert len(text.split()) == 12
+    assert events[-2].usage.output_tokens == 12
+    assert events[-1].type == "message_stop"
+
+
+def test_async_stream_matches_sync_events():
+    async def collect():
+        client = AsyncFakeAnthropic(FakeLLM(fast_config()))
+        stream = await client.messages.create(model="m", max_tokens=64, messages=MESSAGES, stream=True)
+        return [event async for event in stream]
+
+    events = asyncio.run(collect())
+    sync_events = list(FakeAnthropic(FakeLLM(fast_config())).messages.create(
+        model="m", max_tokens=64, messages=MESSAGES, stream=True
+    ))
+    assert [event.type for event in events] == [event.type for event in sync_events]
+    text = "".join(event.delta.text for event in events if event.type == "content_block_delta")
+    assert text == "".join(event.delta.text for event in sync_events if event.type == "content_block_delta")
+    assert events[-2].usage.output_tokens == 12
+
+
+def test_token_rate_paces_stream():
+    client = FakeAnthropic(FakeLLM(fast_config(tokens_per_second=200, reply_tokens=11)))
+    started = time.monotonic()
+    list(client.messages.create(model="m", max_tokens=64, messages=MESSAGES, stream=True))
+    # 10 gaps between 11 tokens at 200 tokens/s
+    assert time.monotonic() - started >= 0.05
+
+
+def test_error_injection():
+    client = FakeAnthropic(FakeLLM(fast_config(error_rate=1.0, error_status=529)))
+    try:
+        client.messages.create(model="m", max_tokens=64, messages=MESSAGES)
+        raise AssertionError("expected an injected failure")
+    except FakeAPIError as e:
+        assert e.status_code == 529
+
+    runtime = FakeBedrockRuntime(FakeLLM(fast_config(error_rate=1.0, error_status=429)))
+    try:
+        runtime.invoke_model(modelId="m", body=json.dumps({"anthropic_version": "bedrock-2023-05-31", "messages": MESSAGES}))
+        raise AssertionError("expected an injected failure")
+    except FakeClientError as e:
+        assert e.response["Error"]["Code"] == "ThrottlingException"
+
+
+def test_bedrock_invoke_shapes():
+    runtime = FakeBedrockRuntime(FakeLLM(fast_config()))
+    response = runtime.invoke_model(
+        modelId="anthropic.claude-3-haiku-20240307-v1:0",
+        body=json.dumps({"anthropic_version": "bedrock-2023-05-31", "max_tokens": 64, "messages": MESSAGES})
+    )
+    body = json.loads(response["body"].read())
+    assert body["content"][0]["type"] == "text"
+
+    # Mistral-style metadata prompt
+    prompt = "Conversation:\nuser: Pynchon wrote Gravity's Rainbow? Pynchon is great.\nRespond with JSON"
+    response = runtime.invoke_model(modelId="mistral.mistral-small-2402-v1:0", body=json.dumps({"prompt": prompt}))
+    metadata = json.loads(json.loads(response["body"].read())["completion"])
+    assert "pynchon" in metadata["topics"]
+    assert "Pynchon" in metadata["key_entities"]
+
+    stream = runtime.invoke_model_with_response_stream(
+        modelId="m", body=json.dumps({"anthropic_version": "bedrock-2023-05-31", "messages": MESSAGES})
+    )
+    events = [json.loads(item["chunk"]["bytes"]) for item in stream["body"]]
+    assert events[0]["type"] == "message_start"
+    assert events[-1]["type"] == "message_stop"
+
+
+def test_http_server_routes():
+    server = start_server(fast_config())
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        reply = json.load(post(f"{base}/v1/messages", {"model": "m", "max_tokens": 64, "messages": MESSAGES}))
+        assert reply["type"] == "message"
+
+        sse = post(f"{base}/v1/messages", {"model": "m", "max_tokens": 64, "messages": MESSAGES, "stream": True}).read()
+        event_types = [line[len("event: "):] for line in sse.decode("utf-8").splitlines() if line.startswith("event: ")]
+        assert event_types[0] == "message_start" and event_types[-1] == "message_stop"
+
+        body = {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 64, "messages": MESSAGES}
+        reply = json.load(post(f"{base}/model/anthropic.claude-3-haiku-20240307-v1%3A0/invoke", body))
+        assert reply["model"] == "anthropic.claude-3-haiku-20240307-v1:0"
+
+        raw = post(f"{base}/model/m/invoke-with-response-stream", body).read()
+        chunks = [json.loads(base64.b64decode(message["bytes"])) for message in decode_event_stream(raw)]
+        assert chunks[0]["type"] == "message_start"
+        assert any(chunk["type"] == "content_block_delta" for chunk in chunks)
+    finally:
+        server.shutdown()
+
+
+def test_http_error_injection():
+    server = start_server(fast_config(error_rate=1.0, error_status=529))
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        post(f"{base}/v1/messages", {"model": "m", "max_tokens": 64, "messages": MESSAGES})
+        raise AssertionError("expected an HTTP error")
+    except urllib.error.HTTPError as e:
+        assert e.code == 529
+        assert json.load(e)["error"]["type"] == "overloaded_error"
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_latency_distributions()
+    test_anthropic_shape_and_determinism()
+    test_anthropic_stream_events()
+    test_async_stream_matches_sync_events()
+    test_token_rate_paces_stream()
+    test_error_injection()
+    test_bedrock_invoke_shapes()
+    test_http_server_routes()
+    test_http_error_injection()
+    print("Fake provider tests passed")
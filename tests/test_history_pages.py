@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test keyset pagination of stored messages and recent-message lookups
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from sqlite_client import SQLiteClient
+
+
+def fill(db, count, user_id="alice"):
+    for i in range(count):
+        db.append_message("ocean", user_id, {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"})
+
+
+def test_pages_walk_back_to_the_start():
+    with tempfile.TemporaryDirectory() as directory:
+        db = SQLiteClient(os.path.join(directory, "chat.db"))
+        fill(db, 25)
+        fill(db, 5, user_id="bob")
+
+        seen = []
+        before = None
+        while True:
+            page = db.get_messages_page("ocean", "alice", before, limit=10)
+            seen = [msg["content"] for msg in page["messages"]] + seen
+            before = page["next_before"]
+            if before is None:
+                break
+        assert seen == [f"message {i}" for i in range(25)]
+
+        latest = db.get_messages_page("ocean", "alice", limit=10)
+        assert [msg["content"] for msg in latest["messages"]] == [f"message {i}" for i in range(15, 25)]
+        assert latest["messages"][0]["id"] == latest["next_before"]
+
+
+def test_pages_stop_at_clear():
+    with tempfile.TemporaryDirectory() as directory:
+        db = SQLiteClient(os.path.join(directory, "chat.db"))
+        fill(db, 4)
+        db.clear_messages("ocean", "alice")
+        fill(db, 3)
+        page = db.get_messages_page("ocean", "alice", limit=10)
+        assert [msg["content"] for msg in page["messages"]] == ["message 0", "message 1", "message 2"]
+        assert page["next_before"] is None
+
+
+def test_page_query_uses_index():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        SQLiteClient(db_path)
+        with sqlite3.connect(db_path) as conn:
+            plan = " ".join(row[-1] for row in conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT message_id, role, content, timestamp FROM messages
+                WHERE chat_type = ? AND user_id = ? AND message_id > ? AND message_id < ?
+                ORDER BY message_id DESC LIMIT ?
+            """, ("ocean", "alice", 0, 100, 11)))
+        assert "idx_messages_conversation" in plan and "TEMP B-TREE" not in plan
+
+
+def test_recent_messages_from_chat_client():
+    from chat_client import ChatClient
+    from fake_provider import FakeAnthropic, FakeConfig, FakeLLM
+
+    with tempfile.TemporaryDirectory() as directory:
+        llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=4))
+        client = ChatClient(chat_type="ocean", client=FakeAnthropic(llm), db_path=os.path.join(directory, "chat.db"))
+        assert client.get_recent_messages() == []
+        client.send_message("first")
+        client.send_message("second")
+        recent = client.get_recent_messages(2)
+        assert [msg["role"] for msg in recent] == ["user", "assistant"]
+        assert recent[0]["content"] == "second"
+        assert len(client.get_recent_messages(10)) == 4
+
+
+if __name__ == "__main__":
+    test_pages_walk_back_to_the_start()
+    test_pages_stop_at_clear()
+    test_page_query_uses_index()
+    test_recent_messages_from_chat_client()
+    print("History page tests passed")
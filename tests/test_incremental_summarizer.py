@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test incremental conversation summaries: only new messages are processed and
+a cleared or rewritten log starts the session over
+"""
+
+import json
+import sqlite3
+import tempfile
+
+from incremental_summarizer import IncrementalSummarizer
+from memory_manager import MemoryManager
+from sqlite_client import SQLiteClient
+
+
+class Span:
+    def __init__(self, text, label_=None):
+        self.text = text
+        self.label_ = label_
+
+
+class Doc:
+    def __init__(self, text):
+        self.sents = [Span(part) for part in text.split(".") if part.strip()]
+        self.ents = [Span(word, "PERSON") for word in text.replace(".", "").split() if word.istitle()]
+        self.noun_chunks = []
+
+
+class CountingNLP:
+    """Minimal stand-in for a spaCy pipeline that records what it was given"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return Doc(text)
+
+
+def turns(*user_messages):
+    log = []
+    for content in user_messages:
+        log.append({"role": "user", "content": content})
+        log.append({"role": "assistant", "content": f"reply to {content}"})
+    return log
+
+
+def test_only_new_messages_are_processed():
+    nlp = CountingNLP()
+    summarizer = IncrementalSummarizer(nlp)
+
+    summarizer.update("ocean", {"conversation": turns("tell me about Pynchon"), "timestamp": 0})
+    metadata = summarizer.update("ocean", {
+        "conversation": turns("tell me about Pynchon", "and Gaddis too"), "timestamp": 0
+    })
+
+    assert nlp.calls == ["tell me about Pynchon", "and Gaddis too"]
+    assert "2-exchange" in metadata["summary"]
+    assert metadata["key_entities"] == ["pynchon", "gaddis"]
+    assert summarizer.checkpoint("ocean") == (4, "reply to and Gaddis too")
+
+
+def test_diverged_log_starts_over():
+    nlp = CountingNLP()
+    summarizer = IncrementalSummarizer(nlp)
+    summarizer.update("ocean", {"conversation": turns("about Pynchon", "about Gaddis"), "timestamp": 0})
+
+    # Same length or longer, but the message at the boundary changed
+    nlp.calls.clear()
+    metadata = summarizer.update("ocean", {
+        "conversation": turns("about Melville", "about Woolf", "about Joyce"), "timestamp": 0
+    })
+    assert nlp.calls == ["about Melville", "about Woolf", "about Joyce"]
+    assert "3-exchange" in metadata["summary"]
+    assert "pynchon" not in metadata["key_entities"]
+
+    # A shorter log (e.g. after a clear) also starts over
+    nlp.calls.clear()
+    metadata = summarizer.update("ocean", {"conversation": turns("about Austen"), "timestamp": 0})
+    assert nlp.calls == ["about Austen"]
+    assert metadata["key_entities"] == ["austen"]
+
+
+def test_extend_rejects_stale_offset():
+    summarizer = IncrementalSummarizer(CountingNLP())
+    summarizer.extend("ocean", turns("about Pynchon"), 0)
+    assert summarizer.extend("ocean", turns("about Gaddis"), 4) is None
+    assert summarizer.extend("ocean", turns("about Gaddis"), 2) is not None
+    assert summarizer.checkpoint("ocean")[0] == 4
+
+
+def test_memory_manager_loads_only_new_messages():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = f"{tmp}/chat.db"
+        db = SQLiteClient(db_path)
+        nlp = CountingNLP()
+        manager = MemoryManager(db_path=db_path)
+        manager._summarizer = IncrementalSummarizer(nlp)
+
+        # Each turn saves a new row holding the whole log so far
+        log = []
+        for content in ["about Pynchon", "about Gaddis", "about Melville"]:
+            log += turns(content)
+            chat_id = db.save_conversation({"chat_type": "ocean", "user_id": "u", "conversation": log})
+            assert manager.generate_conversation_summary(chat_id, session_key="ocean")
+
+        assert nlp.calls == ["about Pynchon", "about Gaddis", "about Melville"]
+        with sqlite3.connect(db_path) as conn:
+            metadata = json.loads(conn.execute(
+                "SELECT metadata FROM conversations WHERE chat_id = ?", (chat_id,)
+            ).fetchone()[0])
+        assert "3-exchange" in metadata["summary"]
+        assert metadata["key_entities"] == ["pynchon", "gaddis", "melville"]
+
+        # A new conversation under the same session key starts over
+        nlp.calls.clear()
+        chat_id = db.save_conversation({"chat_type": "ocean", "user_id": "u", "conversation": turns("about Woolf")})
+        assert manager.generate_conversation_summary(chat_id, session_key="ocean")
+        assert nlp.calls == ["about Woolf"]
+        assert manager.summarizer.checkpoint("ocean") == (2, "reply to about Woolf")
+
+
+if __name__ == "__main__":
+    test_only_new_messages_are_processed()
+    test_diverged_log_starts_over()
+    test_extend_rejects_stale_offset()
+    test_memory_manager_loads_only_new_messages()
+    print("Incremental summarizer tests passed")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test that importing the chat entry points doesn't load heavy dependencies
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["spacy", "anthropic", "boto3", "memory_manager", "bedrock_client"]
+
+
+def test_import_is_lazy():
+    code = (
+        "import json, sys; import ocean_chat, claude_chat; "
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PACKAGE_DIR, os.environ.get("PYTHONPATH", "")]))
+    with tempfile.TemporaryDirectory() as directory:
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=directory, env=env,
+            capture_output=True, text=True, check=True
+        )
+        assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+        # No database is opened until a chat needs it
+        assert not os.path.exists(os.path.join(directory, "chat_history.db"))
+
+
+def test_memory_manager_defers_spacy():
+    from memory_manager import MemoryManager
+
+    manager = MemoryManager(db_path=os.path.join(tempfile.gettempdir(), "unused.db"))
+    assert manager._nlp is None and manager._summarizer is None
+
+
+if __name__ == "__main__":
+    test_import_is_lazy()
+    test_memory_manager_defers_spacy()
+    print("Lazy startup tests passed")
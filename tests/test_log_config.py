@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test structured, queue-based logging
+"""
+
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from logging.handlers import QueueListener
+
+import log_config
+from log_config import (
+    ContextFilter, JsonFormatter, NonBlockingQueueHandler, SamplingFilter,
+    current_request_id, request_context
+)
+from metrics import persona_context
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.done = threading.Event()
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+        self.done.set()
+
+
+def make_logger(name, log_queue):
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, handler
+
+
+def test_json_record_carries_context_and_extras():
+    log_queue = queue.Queue()
+    logger, _ = make_logger("test_log_config.json", log_queue)
+    output = ListHandler()
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    try:
+        with request_context("req-1"), persona_context("ocean"):
+            logger.info("Calling %s", "model", extra={"model": "claude", "message_count": 3})
+        output.done.wait(5)
+    finally:
+        listener.stop()
+
+    entry = json.loads(output.lines[0])
+    assert entry["msg"] == "Calling model"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test_log_config.json"
+    assert entry["request_id"] == "req-1"
+    assert entry["persona"] == "ocean"
+    assert entry["model"] == "claude" and entry["message_count"] == 3
+    assert "args" not in entry and "thread" not in entry
+
+
+def test_exception_is_formatted_before_queueing():
+    log_queue = queue.Queue()
+    logger, _ = make_logger("test_log_config.exc", log_queue)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+    record = log_queue.get_nowait()
+    assert record.exc_info is None and "ValueError: boom" in record.exc_text
+    assert "ValueError: boom" in json.loads(JsonFormatter().format(record))["exc"]
+
+
+def test_request_context():
+    assert current_request_id.get() == "-"
+    with request_context("abc") as request_id:
+        assert request_id == "abc" and current_request_id.get() == "abc"
+        with request_context() as inner:
+            assert len(inner) == 32 and inner != "abc"
+        assert current_request_id.get() == "abc"
+    assert current_request_id.get() == "-"
+
+
+def test_sampling_keeps_warnings():
+    sampler = SamplingFilter({"noisy": 0.0, "noisy.kept": 1.0})
+
+    def record(name, level):
+        return logging.LogRecord(name, level, __file__, 0, "msg", (), None)
+
+    assert not sampler.filter(record("noisy", logging.INFO))
+    assert not sampler.filter(record("noisy.child", logging.DEBUG))
+    assert sampler.filter(record("noisy.kept", logging.INFO))
+    assert sampler.filter(record("noisy", logging.WARNING))
+    assert sampler.filter(record("quiet", logging.DEBUG))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    log_queue = queue.Queue(maxsize=2)
+    logger, handler = make_logger("test_log_config.full", log_queue)
+    for i in range(5):
+        logger.info("record %d", i)
+    assert log_queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_per_module_levels():
+    saved = dict(log_config.LOG_LEVELS)
+    log_config.LOG_LEVELS.clear()
+    log_config.LOG_LEVELS.update({"test_log_config.verbose": "DEBUG", "test_log_config.quiet": "ERROR"})
+    try:
+        log_config.configure_logging(force=True)
+        assert logging.getLogger("test_log_config.verbose").isEnabledFor(logging.DEBUG)
+        assert not logging.getLogger("test_log_config.quiet").isEnabledFor(logging.WARNING)
+        root_handlers = [h for h in logging.getLogger().handlers if isinstance(h, NonBlockingQueueHandler)]
+        assert len(root_handlers) == 1
+    finally:
+        log_config.LOG_LEVELS.clear()
+        log_config.LOG_LEVELS.update(saved)
+        log_config.configure_logging(force=True)
+
+
+def test_importing_modules_does_not_configure_logging():
+    code = (
+        "import logging, build_static, log_config; "
+        "before = len(logging.getLogger().handlers); "
+        "log_config.configure_logging(); "
+        "print(before, len(logging.getLogger().handlers))"
+    )
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_dir, os.environ.get("PYTHONPATH", "")]))
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["0", "1"]
+
+
+if __name__ == "__main__":
+    test_json_record_carries_context_and_extras()
+    test_exception_is_formatted_before_queueing()
+    test_request_context()
+    test_sampling_keeps_warnings()
+    test_full_queue_drops_instead_of_blocking()
+    test_per_module_levels()
+    test_importing_modules_does_not_configure_logging()
+    print("Log config tests passed")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test MemoryChatClient's background metadata updates and error handling
+"""
+
+import tempfile
+import threading
+
+from incremental_summarizer import IncrementalSummarizer
+from memory_chat_client import MemoryChatClient
+from metadata_worker import MetadataWorker
+from test_incremental_summarizer import CountingNLP
+
+
+class FailingMessages:
+    def create(self, **kwargs):
+        raise RuntimeError("provider exploded")
+
+
+class FailingClient:
+    messages = FailingMessages()
+
+
+def make_client(db_path, client=None, background_metadata=False):
+    chat_client = MemoryChatClient(
+        chat_type="ocean", client=client or FailingClient(), db_path=db_path,
+        background_metadata=background_metadata
+    )
+    chat_client.memory_manager._summarizer = IncrementalSummarizer(CountingNLP())
+    return chat_client
+
+
+def test_quick_turns_merge_into_one_metadata_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_client = make_client(f"{tmp}/chat.db")
+        worker = chat_client.metadata_worker = MetadataWorker()
+
+        writes = []
+        update = chat_client.memory_manager.update_conversation_metadata
+
+        def record_write(chat_id, metadata):
+            writes.append(chat_id)
+            return update(chat_id, metadata)
+
+        chat_client.memory_manager.update_conversation_metadata = record_write
+
+        # Hold the worker busy while the turns arrive
+        release = threading.Event()
+        worker.submit("blocker", release.wait, 5)
+        for content in ["about Pynchon", "about Gaddis", "about Melville"]:
+            chat_client.add_message("user", content)
+            chat_client.add_message("assistant", f"reply to {content}")
+            assert chat_client.update_conversation_metadata()
+        release.set()
+        worker.shutdown(drain=True, timeout=5)
+
+        # One write, against the newest row, covering every turn
+        assert writes == [chat_client.current_chat_id]
+        latest = chat_client.db.get_conversations_by_type("ocean", limit=1)[0]
+        assert "3-exchange" in latest["metadata"]["summary"]
+
+
+def test_provider_errors_propagate():
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_client = make_client(f"{tmp}/chat.db")
+        try:
+            chat_client.send_message("hello")
+        except RuntimeError as e:
+            assert "provider exploded" in str(e)
+        else:
+            raise AssertionError("send_message returned instead of raising")
+        assert [msg["role"] for msg in chat_client.chat_log] == ["user"]
+
+
+if __name__ == "__main__":
+    test_quick_turns_merge_into_one_metadata_write()
+    test_provider_errors_propagate()
+    print("Memory chat client tests passed")
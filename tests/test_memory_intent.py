@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test the shared gate that decides when to search earlier conversations
+"""
+
+from memory_intent import MEMORY_PHRASES, is_memory_query
+
+
+def test_every_phrase_triggers():
+    for phrase in MEMORY_PHRASES:
+        assert is_memory_query(f"Hey, {phrase} the lighthouse?"), phrase
+
+
+def test_case_and_spacing_are_ignored():
+    assert is_memory_query("REMEMBER WHEN we sailed?")
+    assert is_memory_query("We  talked\nabout tides")
+
+
+def test_word_boundaries():
+    assert not is_memory_query("Let's go before weekend traffic")
+    assert not is_memory_query("yousaid nothing")
+    assert not is_memory_query("Before weeknight dinners")
+    assert is_memory_query("As you said, the tide turns at six")
+
+
+def test_plurals_match():
+    assert is_memory_query("Do you recall our previous conversations?")
+    assert is_memory_query("The previous conversations feature")
+
+
+def test_ordinary_turns_skip_memory():
+    assert not is_memory_query("")
+    assert not is_memory_query(None)
+    assert not is_memory_query("What's a good crabcake recipe?")
+
+
+if __name__ == "__main__":
+    test_every_phrase_triggers()
+    test_case_and_spacing_are_ignored()
+    test_word_boundaries()
+    test_plurals_match()
+    test_ordinary_turns_skip_memory()
+    print("Memory intent tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test stage timing, per-persona histograms and the Prometheus text output
+"""
+
+import os
+import tempfile
+import threading
+
+from metrics import MetricsRegistry, metrics, persona_context, timed
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.005, 0.05, 0.05, 0.5, 5.0):
+        registry.observe("provider.create", seconds, "ocean")
+    text = registry.render()
+    assert 'chat_stage_seconds_bucket{stage="provider.create",persona="ocean",le="0.01"} 1' in text
+    assert 'chat_stage_seconds_bucket{stage="provider.create",persona="ocean",le="0.1"} 3' in text
+    assert 'chat_stage_seconds_bucket{stage="provider.create",persona="ocean",le="1.0"} 4' in text
+    assert 'chat_stage_seconds_bucket{stage="provider.create",persona="ocean",le="+Inf"} 5' in text
+    assert 'chat_stage_seconds_count{stage="provider.create",persona="ocean"} 5' in text
+    assert "# TYPE chat_stage_seconds histogram" in text
+
+
+def test_timed_uses_persona_context_and_counts_errors():
+    registry = MetricsRegistry()
+
+    @timed("sqlite.fts_search", registry=registry)
+    def search(fail=False):
+        if fail:
+            raise RuntimeError("boom")
+
+    search()
+    with persona_context("vampire"):
+        search()
+        try:
+            search(fail=True)
+        except RuntimeError:
+            pass
+
+    summary = registry.summary()["sqlite.fts_search"]
+    assert summary["none"]["count"] == 1
+    assert summary["vampire"]["count"] == 2 and summary["vampire"]["errors"] == 1
+    assert 'chat_stage_errors_total{stage="sqlite.fts_search",persona="vampire"} 1' in registry.render()
+
+
+def test_registry_is_thread_safe():
+    registry = MetricsRegistry()
+
+    def work():
+        for _ in range(1000):
+            registry.observe("chat.turn", 0.01, "ocean")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.summary()["chat.turn"]["ocean"]["count"] == 8000
+
+
+def test_chat_turn_records_stages():
+    from chat_client import ChatClient
+    from fake_provider import FakeAnthropic, FakeConfig, FakeLLM
+
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as directory:
+        llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=4))
+        client = ChatClient(chat_type="ocean", client=FakeAnthropic(llm), db_path=os.path.join(directory, "chat.db"),
+                            history_policy={"max_turns": 2})
+        client.send_message("hello")
+        "".join(client.stream_message("and again"))
+
+    summary = metrics.summary()
+    for stage in ("chat.turn", "provider.create", "provider.stream", "provider.first_token",
+                  "sqlite.append_message", "history.summarize"):
+        assert summary[stage]["ocean"]["count"] >= 1, stage
+    assert summary["chat.turn"]["ocean"]["count"] == 2
+
+
+if __name__ == "__main__":
+    test_histogram_buckets_are_cumulative()
+    test_timed_uses_persona_context_and_counts_errors()
+    test_registry_is_thread_safe()
+    test_chat_turn_records_stages()
+    print("Metrics tests passed")
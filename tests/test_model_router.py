@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test model routing decisions and the latency samples that feed them
+"""
+
+from model_router import DEFAULT_POLICY, FAILURE_PENALTY, ModelRouter
+from provider_registry import ProviderRegistry
+from resilience import Backend, CircuitBreaker, ResilientMessages, RetryPolicy
+from test_resilience import REQUEST, FakeMessages, FakeStatusError
+
+LIGHT, HEAVY = DEFAULT_POLICY["models"]
+LONG_MESSAGE = "word " * 2000
+
+
+def test_short_messages_use_the_lightest_model():
+    route = ModelRouter().route("ocean", "hi there")
+    assert (route.model, route.provider) == (LIGHT, "anthropic")
+    assert route.reason == "short message"
+
+
+def test_long_messages_use_the_heavy_model_within_budget():
+    router = ModelRouter()
+    assert router.route("ocean", LONG_MESSAGE).model == HEAVY
+
+    # Too expensive for this persona's budget: fall back to the light model
+    router = ModelRouter({"ocean": {"max_cost": 0.01}})
+    route = router.route("ocean", LONG_MESSAGE, context_tokens=2000)
+    assert route.model == LIGHT
+    assert route.reason == f"{HEAVY} over cost budget"
+
+
+def test_slow_provider_is_skipped():
+    router = ModelRouter()
+    for _ in range(5):
+        router.observe("anthropic", LIGHT, 20.0)
+        router.observe("bedrock", LIGHT, 1.0)
+
+    route = router.route("ocean", "hi")
+    assert route.provider == "bedrock"
+    assert router.recent_decisions()[-1]["provider"] == "bedrock"
+
+
+def test_failures_count_against_latency_budget():
+    router = ModelRouter()
+    for _ in range(5):
+        router.observe("anthropic", LIGHT, 0.1, ok=False)
+    assert router.latency.p95("anthropic", LIGHT) == FAILURE_PENALTY * 1000
+    assert router.route("ocean", "hi").provider == "bedrock"
+
+
+def test_samples_go_to_the_backend_that_answered():
+    router = ModelRouter()
+    anthropic = FakeMessages("anthropic", [FakeStatusError(529)] * 2)
+    bedrock = FakeMessages("bedrock")
+    messages = ResilientMessages(
+        [Backend(fake.name, fake, CircuitBreaker()) for fake in (anthropic, bedrock)],
+        retry=RetryPolicy(max_attempts=2, base_delay=0.0),
+        hedge_after=None,
+        observer=router.observe
+    )
+    messages.create(**REQUEST)
+
+    model = REQUEST["model"]
+    assert router.latency.p95("anthropic", model, min_samples=2) == FAILURE_PENALTY * 1000
+    assert router.latency.p95("bedrock", model, min_samples=1) < 1000
+
+
+def test_router_clients_report_attempts():
+    router = ModelRouter(registry=ProviderRegistry(fake=True))
+    client, async_client = router.clients_for("bedrock")
+    assert client.messages.observer == router.observe
+    assert async_client.messages.observer == router.observe
+
+
+if __name__ == "__main__":
+    test_short_messages_use_the_lightest_model()
+    test_long_messages_use_the_heavy_model_within_budget()
+    test_slow_provider_is_skipped()
+    test_failures_count_against_latency_budget()
+    test_samples_go_to_the_backend_that_answered()
+    test_router_clients_report_attempts()
+    print("Model router tests passed")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the on-demand profiling hook
+"""
+
+import os
+import pstats
+import tempfile
+import threading
+import time
+
+import profiling
+from profiling import profile_call, profiled, should_profile
+
+
+def busy_work(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_should_profile_needs_opt_in_and_secret():
+    # Off by default, whatever the request asks for
+    assert not should_profile()
+    assert not should_profile(header_value="1")
+
+    profiling.PROFILE_ENABLED = True
+    try:
+        # Enabled without a secret is still off
+        assert not should_profile(header_value="1")
+
+        profiling.PROFILE_SECRET = "s3cret"
+        assert not should_profile(header_value="1")
+        assert not should_profile(query_value="true")
+        assert should_profile(header_value="s3cret")
+        assert should_profile(query_value="s3cret")
+        assert not should_profile()
+
+        profiling.PROFILE_SAMPLE_RATE = 1.0
+        assert should_profile()
+    finally:
+        profiling.PROFILE_ENABLED = False
+        profiling.PROFILE_SECRET = ""
+        profiling.PROFILE_SAMPLE_RATE = 0.0
+
+
+def test_old_dumps_are_pruned():
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(5):
+            path = os.path.join(directory, f"old-{i}.pstats")
+            open(path, "w").close()
+            os.utime(path, (1000 + i, 1000 + i))
+        open(os.path.join(directory, "notes.txt"), "w").close()
+
+        profiling.PROFILE_MAX_FILES = 3
+        try:
+            with profiled("chat-ocean", "cprofile", directory) as path:
+                busy_work(0.01)
+        finally:
+            profiling.PROFILE_MAX_FILES = 50
+
+        assert sorted(os.listdir(directory)) == sorted([os.path.basename(path), "notes.txt", "old-3.pstats", "old-4.pstats"])
+
+
+def test_cprofile_dump():
+    with tempfile.TemporaryDirectory() as directory:
+        with profiled("chat-ocean", "cprofile", directory) as path:
+            busy_work()
+        stats = pstats.Stats(path)
+        assert any(func[2] == "busy_work" for func in stats.stats)
+        assert path.endswith(".pstats") and os.path.dirname(path) == directory
+
+
+def test_sampled_collapsed_stacks():
+    with tempfile.TemporaryDirectory() as directory:
+        with profiled("search_sqlite", "sample", directory) as path:
+            busy_work(0.1)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("test_profiling.py:busy_work" in line for line in lines)
+
+
+def test_profile_call_returns_result_and_limits_concurrency():
+    with tempfile.TemporaryDirectory() as directory:
+        profiling.PROFILE_DIR = directory
+        try:
+            result, path = profile_call("work", busy_work, 0.01)
+            assert result > 0 and os.path.exists(path)
+
+            # Only one profile at a time: a second concurrent one runs unprofiled
+            inside = threading.Event()
+            release = threading.Event()
+            paths = []
+
+            def hold():
+                with profiled("holder", "cprofile", directory) as held:
+                    paths.append(held)
+                    inside.set()
+                    release.wait(5)
+
+            thread = threading.Thread(target=hold)
+            thread.start()
+            inside.wait(5)
+            result, second = profile_call("work", busy_work, 0.01)
+            release.set()
+            thread.join()
+            assert paths[0] is not None and second is None and result > 0
+        finally:
+            profiling.PROFILE_DIR = "profiles"
+
+
+if __name__ == "__main__":
+    test_should_profile_needs_opt_in_and_secret()
+    test_old_dumps_are_pruned()
+    test_cprofile_dump()
+    test_sampled_collapsed_stacks()
+    test_profile_call_returns_result_and_limits_concurrency()
+    print("Profiling tests passed")
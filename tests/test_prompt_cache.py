@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test cacheable system prompt blocks and usage reporting
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+from chat_client import ChatClient
+from fake_provider import FakeAnthropic, FakeConfig, FakeLLM
+from prompt_cache import build_system_blocks, format_usage, strip_cache_control, system_text, usage_report
+
+
+def test_cacheable_blocks_come_first():
+    blocks = build_system_blocks("You are Ocean.", "Memory tiers.", "Recalled: tides.", summary="Summary so far.")
+    assert [block["text"] for block in blocks] == ["You are Ocean.", "Memory tiers.", "Summary so far.", "Recalled: tides."]
+    assert [block.get("cache_control") for block in blocks] == [{"type": "ephemeral"}, {"type": "ephemeral"}, None, None]
+
+    # Each block gets its own dict, so editing one request can't leak into another
+    blocks[0]["cache_control"]["type"] = "changed"
+    assert build_system_blocks("You are Ocean.")[0]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_empty_parts_are_skipped():
+    blocks = build_system_blocks("You are Ocean.", "", None)
+    assert blocks == [{"type": "text", "text": "You are Ocean.", "cache_control": {"type": "ephemeral"}}]
+    assert build_system_blocks("", None, "Recalled.") == [{"type": "text", "text": "Recalled."}]
+
+
+def test_rolling_summary_is_not_cached():
+    llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=4, seed=1))
+    with tempfile.TemporaryDirectory() as directory:
+        client = ChatClient(
+            chat_type="ocean", system_prompt="You are Ocean.", client=FakeAnthropic(llm),
+            history_policy={"max_turns": 1}, db_path=os.path.join(directory, "chat.db")
+        )
+        for i in range(3):
+            client.send_message(f"Question {i}")
+        messages, system = client.build_context()
+
+    # Only the persona carries a breakpoint: the summary changes every turn
+    assert system[0] == {"type": "text", "text": "You are Ocean.", "cache_control": {"type": "ephemeral"}}
+    assert system[1]["text"].startswith("Earlier in this conversation:")
+    assert "cache_control" not in system[1]
+    assert client.last_recalled_bytes == 0
+
+
+def test_flatten_and_strip():
+    blocks = build_system_blocks("A", "B", "C")
+    assert system_text(blocks) == "A\n\nB\n\nC"
+    assert system_text("plain") == "plain" and system_text(None) == ""
+    assert all("cache_control" not in block for block in strip_cache_control(blocks))
+    assert strip_cache_control("plain") == "plain"
+
+
+def test_usage_report():
+    usage = SimpleNamespace(input_tokens=12, output_tokens=40, cache_read_input_tokens=900, cache_creation_input_tokens=None)
+    report = usage_report(usage)
+    assert report == {
+        "cache_read_input_tokens": 900,
+        "cache_creation_input_tokens": 0,
+        "uncached_input_tokens": 12,
+        "output_tokens": 40
+    }
+    assert format_usage(report) == "input: 900 cache-read, 0 cache-write, 12 uncached; output: 40"
+    assert set(usage_report(None).values()) == {0}
+
+
+if __name__ == "__main__":
+    test_cacheable_blocks_come_first()
+    test_empty_parts_are_skipped()
+    test_rolling_summary_is_not_cached()
+    test_flatten_and_strip()
+    test_usage_report()
+    print("Prompt cache tests passed")
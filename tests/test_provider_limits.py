@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the per-provider concurrency limit shared by sync and async clients
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conversation_lock import SharedSemaphore
+from provider_registry import AsyncBedrockMessages, AsyncLimitedMessages, LimitedMessages, ProviderRegistry
+
+
+class ConcurrencyProbe:
+    """Counts how many calls are in flight at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+
+class SyncMessages:
+    def __init__(self, probe, seconds=0.02):
+        self.probe = probe
+        self.seconds = seconds
+
+    def create(self, **kwargs):
+        self.probe.enter()
+        try:
+            time.sleep(self.seconds)
+            return "ok"
+        finally:
+            self.probe.leave()
+
+
+class AsyncMessages:
+    def __init__(self, probe):
+        self.probe = probe
+
+    async def create(self, **kwargs):
+        self.probe.enter()
+        try:
+            await asyncio.sleep(0.02)
+            return "ok"
+        finally:
+            self.probe.leave()
+
+
+def test_sync_and_async_share_one_limit():
+    probe = ConcurrencyProbe()
+    semaphore = SharedSemaphore(3)
+    sync_messages = LimitedMessages(SyncMessages(probe), semaphore)
+    async_messages = AsyncLimitedMessages(AsyncMessages(probe), semaphore)
+
+    async def run_async():
+        return await asyncio.gather(*(async_messages.create() for _ in range(12)))
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        futures = [pool.submit(sync_messages.create) for _ in range(12)]
+        results = asyncio.run(run_async())
+        results += [future.result() for future in futures]
+
+    assert results == ["ok"] * 24
+    assert probe.peak <= 3
+
+
+def test_registry_clients_share_a_limit():
+    registry = ProviderRegistry(fake=True)
+    sync_client = registry.get_client("anthropic")
+    async_client = registry.get_async_client("anthropic")
+    assert sync_client.messages._semaphore is async_client.messages._semaphore is registry.limit("anthropic")
+
+    bedrock_sync = registry.get_client("bedrock")
+    bedrock_async = registry.get_async_client("bedrock")
+    assert bedrock_sync.messages._semaphore is bedrock_async.messages._semaphore is registry.limit("bedrock")
+
+
+def test_queued_bedrock_calls_leave_executor_threads_free():
+    probe = ConcurrencyProbe()
+    messages = AsyncBedrockMessages(SyncMessages(probe, seconds=0.1), SharedSemaphore(1))
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2))
+        calls = [asyncio.create_task(messages.create(model="m")) for _ in range(8)]
+        await asyncio.sleep(0.01)
+
+        # Seven calls wait for the slot on the loop, so other to_thread work still runs
+        started = time.monotonic()
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: 42), 1) == 42
+        waited = time.monotonic() - started
+
+        assert await asyncio.gather(*calls) == ["ok"] * 8
+        return waited
+
+    assert asyncio.run(main()) < 0.1
+    assert probe.peak == 1
+
+
+if __name__ == "__main__":
+    test_sync_and_async_share_one_limit()
+    test_registry_clients_share_a_limit()
+    test_queued_bedrock_calls_leave_executor_threads_free()
+    print("Provider limit tests passed")
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Test retries, deadlines, hedging and failover against a fault-injecting fake provider
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import resilience
+from resilience import (
+    AsyncResilientMessages,
+    Backend,
+    CircuitBreaker,
+    ProviderError,
+    ProviderTimeout,
+    ResilientMessages,
+    RetryPolicy,
+    is_retryable
+)
+
+
+class FakeStatusError(Exception):
+    """Looks like an Anthropic APIStatusError"""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeThrottling(Exception):
+    """Looks like a botocore ClientError"""
+
+    def __init__(self):
+        super().__init__("ThrottlingException")
+        self.response = {"Error": {"Code": "ThrottlingException"}}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.content = [type("Content", (), {"text": text})()]
+
+
+class FakeMessages:
+    """
+    Provider `messages` API that plays back a script of faults: each entry is
+    an exception to raise, a number of seconds to stall, or None to succeed.
+    """
+
+    def __init__(self, name, faults=(), delay=0.0):
+        self.name = name
+        self.faults = list(faults)
+        self.delay = delay
+        self.requests = []
+
+    def _next_fault(self, kwargs):
+        self.requests.append(kwargs)
+        return self.faults.pop(0) if self.faults else None
+
+    def create(self, **kwargs):
+        fault = self._next_fault(kwargs)
+        if isinstance(fault, Exception):
+            raise fault
+        time.sleep(fault if isinstance(fault, (int, float)) else self.delay)
+        if kwargs.get("stream"):
+            return iter([f"{self.name}-event-1", f"{self.name}-event-2"])
+        return FakeResponse(f"{self.name}:{kwargs.get('model')}")
+
+
+class AsyncFakeMessages(FakeMessages):
+    async def create(self, **kwargs):
+        fault = self._next_fault(kwargs)
+        if isinstance(fault, Exception):
+            raise fault
+        await asyncio.sleep(fault if isinstance(fault, (int, float)) else self.delay)
+        return FakeResponse(f"{self.name}:{kwargs.get('model')}")
+
+
+def make_messages(*backends, **options):
+    options.setdefault("retry", RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02))
+    options.setdefault("timeout", 2.0)
+    options.setdefault("hedge_after", None)
+    return ResilientMessages(
+        [Backend(fake.name, fake, CircuitBreaker(failure_threshold=5, reset_timeout=60)) for fake in backends],
+        **options
+    )
+
+
+REQUEST = {"model": "claude-3-haiku-20240307", "max_tokens": 16, "messages": [{"role": "user", "content": "Hi"}]}
+
+
+def test_classifies_retryable_errors():
+    assert is_retryable(FakeStatusError(529))
+    assert is_retryable(FakeStatusError(429))
+    assert is_retryable(FakeThrottling())
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(FakeStatusError(400))
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_retries_transient_errors():
+    anthropic = FakeMessages("anthropic", [FakeStatusError(529), FakeStatusError(503)])
+    response = make_messages(anthropic).create(**REQUEST)
+
+    assert response.content[0].text == "anthropic:claude-3-haiku-20240307"
+    assert len(anthropic.requests) == 3
+
+
+def test_does_not_retry_client_errors():
+    anthropic = FakeMessages("anthropic", [FakeStatusError(400)])
+    bedrock = FakeMessages("bedrock")
+    try:
+        make_messages(anthropic, bedrock).create(**REQUEST)
+        raise AssertionError("expected the 400 to propagate")
+    except FakeStatusError as e:
+        assert e.status_code == 400
+    assert len(anthropic.requests) == 1
+    assert bedrock.requests == []
+
+
+def test_client_errors_do_not_open_the_breaker():
+    anthropic = FakeMessages("anthropic", [FakeStatusError(400)] * 6)
+    messages = make_messages(anthropic)
+    for _ in range(6):
+        try:
+            messages.create(**REQUEST)
+        except FakeStatusError:
+            pass
+    assert messages.backends[0].breaker.state == CircuitBreaker.CLOSED
+
+    # Transient failures still count
+    anthropic.faults = [FakeStatusError(503)] * 5
+    messages.retry = RetryPolicy(max_attempts=5, base_delay=0.0)
+    try:
+        messages.create(**REQUEST)
+    except ProviderError:
+        pass
+    assert messages.backends[0].breaker.state == CircuitBreaker.OPEN
+
+
+def test_fails_over_with_translated_model():
+    anthropic = FakeMessages("anthropic", [FakeStatusError(529)] * 3)
+    bedrock = FakeMessages("bedrock")
+    response = make_messages(anthropic, bedrock).create(**REQUEST)
+
+    assert response.content[0].text == "bedrock:anthropic.claude-3-haiku-20240307-v1:0"
+    assert len(anthropic.requests) == 3
+
+
+def test_open_circuit_skips_backend():
+    anthropic = FakeMessages("anthropic", [FakeThrottling()] * 5)
+    bedrock = FakeMessages("bedrock")
+    messages = make_messages(anthropic, bedrock, retry=RetryPolicy(max_attempts=5, base_delay=0.0))
+
+    messages.create(**REQUEST)
+    assert messages.backends[0].breaker.state == CircuitBreaker.OPEN
+
+    # The next call goes straight to Bedrock
+    messages.create(**REQUEST)
+    assert len(anthropic.requests) == 5
+    assert len(bedrock.requests) == 2
+
+
+def test_half_open_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Everyone else waits for the trial's outcome
+    assert not breaker.available() and not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_abandoned_trial_call_is_given_up():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_unused_backends_stay_open():
+    anthropic = FakeMessages("anthropic")
+    bedrock = FakeMessages("bedrock")
+    messages = make_messages(anthropic, bedrock)
+    standby = messages.backends[1].breaker
+    standby.failure_threshold = 1
+    standby.reset_timeout = 0.0
+    standby.record_failure()
+
+    messages.create(**REQUEST)
+    # Bedrock wasn't needed, so it wasn't made the trial call
+    assert standby.state == CircuitBreaker.OPEN
+    assert bedrock.requests == []
+
+
+def test_deadline_abandons_stalled_call():
+    anthropic = FakeMessages("anthropic", [1.0])
+    started = time.monotonic()
+    try:
+        make_messages(anthropic, timeout=0.2, retry=RetryPolicy(max_attempts=1)).create(**REQUEST)
+        raise AssertionError("expected a timeout")
+    except ProviderError as e:
+        assert isinstance(e.__cause__, ProviderTimeout)
+    assert time.monotonic() - started < 0.5
+
+
+def test_stalled_backend_fails_over_within_deadline():
+    # Anthropic gets half the deadline, leaving Bedrock the other half
+    anthropic = FakeMessages("anthropic", [1.0])
+    bedrock = FakeMessages("bedrock")
+    started = time.monotonic()
+    response = make_messages(anthropic, bedrock, timeout=0.4).create(**REQUEST)
+
+    assert response.content[0].text.startswith("bedrock:")
+    assert len(anthropic.requests) == 1
+    assert time.monotonic() - started < 0.35
+
+
+def test_attempt_timeout_retries_a_stalled_call():
+    anthropic = FakeMessages("anthropic", [1.0])
+    bedrock = FakeMessages("bedrock")
+    response = make_messages(anthropic, bedrock, attempt_timeout=0.1).create(**REQUEST)
+
+    assert response.content[0].text.startswith("anthropic:")
+    assert len(anthropic.requests) == 2
+    assert bedrock.requests == []
+
+
+def test_queued_calls_are_cancelled_at_the_deadline():
+    executor = resilience._executor
+    resilience._executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        # The hedge queues behind the stalled first call and is dropped with it
+        anthropic = FakeMessages("anthropic", [0.4])
+        messages = make_messages(anthropic, timeout=0.2, hedge_after=0.05, retry=RetryPolicy(max_attempts=1))
+        try:
+            messages.create(**REQUEST)
+            raise AssertionError("expected a timeout")
+        except ProviderError as e:
+            assert isinstance(e.__cause__, ProviderTimeout)
+        resilience._executor.shutdown(wait=True)
+        assert len(anthropic.requests) == 1
+    finally:
+        resilience._executor = executor
+
+
+def test_hedged_request_beats_slow_first_attempt():
+    # First request stalls, the hedge (second request) answers quickly
+    anthropic = FakeMessages("anthropic", [0.8, 0.0])
+    started = time.monotonic()
+    response = make_messages(anthropic, hedge_after=0.05).create(**REQUEST)
+
+    assert response.content[0].text.startswith("anthropic:")
+    assert len(anthropic.requests) == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_stream_fails_over_before_first_event():
+    anthropic = FakeMessages("anthropic", [FakeStatusError(529)])
+    bedrock = FakeMessages("bedrock")
+    stream = make_messages(anthropic, bedrock, retry=RetryPolicy(max_attempts=1)).create(stream=True, **REQUEST)
+
+    assert list(stream) == ["bedrock-event-1", "bedrock-event-2"]
+
+
+def test_async_retry_and_failover():
+    anthropic = AsyncFakeMessages("anthropic", [FakeStatusError(529)] * 2)
+    bedrock = AsyncFakeMessages("bedrock")
+    messages = AsyncResilientMessages(
+        [Backend(fake.name, fake, CircuitBreaker()) for fake in (anthropic, bedrock)],
+        retry=RetryPolicy(max_attempts=2, base_delay=0.01),
+        timeout=2.0,
+        hedge_after=None
+    )
+
+    response = asyncio.run(messages.create(**REQUEST))
+    assert response.content[0].text == "bedrock:anthropic.claude-3-haiku-20240307-v1:0"
+
+
+def test_async_stalled_backend_fails_over():
+    anthropic = AsyncFakeMessages("anthropic", [1.0])
+    bedrock = AsyncFakeMessages("bedrock")
+    messages = AsyncResilientMessages(
+        [Backend(fake.name, fake, CircuitBreaker()) for fake in (anthropic, bedrock)],
+        timeout=0.4,
+        hedge_after=None
+    )
+
+    started = time.monotonic()
+    response = asyncio.run(messages.create(**REQUEST))
+    assert response.content[0].text.startswith("bedrock:")
+    assert time.monotonic() - started < 0.35
+
+
+if __name__ == "__main__":
+    test_classifies_retryable_errors()
+    test_retries_transient_errors()
+    test_does_not_retry_client_errors()
+    test_client_errors_do_not_open_the_breaker()
+    test_fails_over_with_translated_model()
+    test_open_circuit_skips_backend()
+    test_half_open_lets_one_trial_call_through()
+    test_abandoned_trial_call_is_given_up()
+    test_unused_backends_stay_open()
+    test_deadline_abandons_stalled_call()
+    test_stalled_backend_fails_over_within_deadline()
+    test_attempt_timeout_retries_a_stalled_call()
+    test_queued_calls_are_cancelled_at_the_deadline()
+    test_hedged_request_beats_slow_first_attempt()
+    test_stream_fails_over_before_first_event()
+    test_async_retry_and_failover()
+    test_async_stalled_backend_fails_over()
+    print("Resilience tests passed")
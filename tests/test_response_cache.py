@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the response cache: TTL expiry, LRU eviction and get_or_call
+"""
+
+import tempfile
+
+from response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = Clock()
+        cache = ResponseCache(f"{tmp}/cache.db", ttl=60, clock=clock)
+        cache.set("a", {"text": "hello"})
+
+        clock.now += 60
+        assert cache.get("a") == {"text": "hello"}
+
+        # Reading an entry doesn't extend its life
+        clock.now += 1
+        assert cache.get("a") is None
+        assert cache.stats()["entries"] == 0
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = Clock()
+        value = "x" * 98  # 100 bytes once JSON encoded
+        cache = ResponseCache(f"{tmp}/cache.db", max_bytes=300, clock=clock)
+        for key in ("a", "b", "c"):
+            clock.now += 1
+            cache.set(key, value)
+
+        # "a" is read, so "b" is now the least recently used
+        clock.now += 1
+        assert cache.get("a") == value
+        clock.now += 1
+        cache.set("d", value)
+
+        assert cache.get("b") is None
+        assert all(cache.get(key) == value for key in ("a", "c", "d"))
+        assert cache.stats()["bytes"] == 300
+
+
+def test_expired_entries_are_dropped_before_lru():
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = Clock()
+        cache = ResponseCache(f"{tmp}/cache.db", ttl=10, max_bytes=250, clock=clock)
+        cache.set("old", "x" * 98)
+        clock.now += 5
+        cache.set("recent", "x" * 98)
+        clock.now += 6
+        cache.set("new", "x" * 98)
+
+        assert cache.get("old") is None
+        assert cache.get("recent") == "x" * 98
+        assert cache.get("new") == "x" * 98
+
+
+def test_get_or_call():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(f"{tmp}/cache.db", clock=Clock())
+        calls = []
+
+        def call():
+            calls.append(1)
+            return "reply"
+
+        params = {"temperature": 0}
+        assert cache.get_or_call("model", "prompt", params, call) == "reply"
+        assert cache.get_or_call("model", "prompt", params, call) == "reply"
+        assert len(calls) == 1
+
+        # Any change to model, prompt or params is a different entry
+        cache.get_or_call("model", "prompt", {"temperature": 0.5}, call)
+        cache.get_or_call("other", "prompt", params, call)
+        assert len(calls) == 3
+
+        # None results are returned but not cached
+        assert cache.get_or_call("model", "empty", None, lambda: None) is None
+        assert cache.get_or_call("model", "empty", None, call) == "reply"
+        assert cache.stats()["hit_rate"] == 1 / 6
+
+
+if __name__ == "__main__":
+    test_entries_expire_after_ttl()
+    test_least_recently_used_entries_are_evicted()
+    test_expired_entries_are_dropped_before_lru()
+    test_get_or_call()
+    print("Response cache tests passed")
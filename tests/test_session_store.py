@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the per-session LRU of live chat states
+"""
+
+import os
+import tempfile
+import time
+
+from session_store import SessionStore
+from sqlite_client import SQLiteClient
+
+
+class FakeChat:
+    def __init__(self, session_id, chat_type):
+        self.session_id = session_id
+        self.chat_type = chat_type
+
+
+def test_sessions_are_isolated_and_cached():
+    created = []
+    store = SessionStore(lambda sid, chat_type: created.append((sid, chat_type)) or FakeChat(sid, chat_type))
+
+    alice = store.get("alice", "ocean")
+    bob = store.get("bob", "ocean")
+    assert alice is not bob
+    assert store.get("alice", "ocean") is alice
+    assert created == [("alice", "ocean"), ("bob", "ocean")]
+    assert store.stats()["hits"] == 1
+
+
+def test_lru_eviction_and_rehydration():
+    store = SessionStore(FakeChat, max_sessions=2)
+    first = store.get("a", "ocean")
+    store.get("b", "ocean")
+    store.get("a", "ocean")      # "a" is now most recently used
+    store.get("c", "ocean")      # evicts "b"
+
+    assert len(store) == 2
+    assert store.get("a", "ocean") is first
+    assert store.stats()["evictions"] == 1
+    # An evicted session is rebuilt by the factory on its next request
+    assert store.get("b", "ocean").session_id == "b"
+
+
+def test_idle_eviction():
+    store = SessionStore(FakeChat, idle_ttl=0.05)
+    first = store.get("a", "ocean")
+    time.sleep(0.1)
+    assert store.stats()["live"] == 0
+    assert store.get("a", "ocean") is not first
+
+
+def test_latest_conversation_per_user():
+    with tempfile.TemporaryDirectory() as directory:
+        db = SQLiteClient(os.path.join(directory, "chat.db"))
+        for user_id, text in (("alice", "Hi from Alice"), ("bob", "Hi from Bob")):
+            db.save_conversation({
+                "chat_type": "ocean", "user_id": user_id,
+                "conversation": [{"role": "user", "content": text}]
+            })
+
+        assert db.get_latest_conversation("ocean", "alice")["conversation"][0]["content"] == "Hi from Alice"
+        assert db.get_latest_conversation("ocean", "carol") is None
+        results = db.search_conversations("Hi", "ocean", user_id="bob")
+        assert [r["user_id"] for r in results] == ["bob"]
+
+
+if __name__ == "__main__":
+    test_sessions_are_isolated_and_cached()
+    test_lru_eviction_and_rehydration()
+    test_idle_eviction()
+    test_latest_conversation_per_user()
+    print("Session store tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test that chat history stays consistent when several workers share a database
+
+Each ChatClient stands in for the copy of a conversation held by one worker
+process; they share nothing but the SQLite file.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+
+from chat_client import ChatClient
+from fake_provider import FakeAnthropic, FakeConfig, FakeLLM
+from sqlite_client import SQLiteClient
+
+
+def make_worker(db_path, user_id="alice"):
+    llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=4))
+    return ChatClient(chat_type="ocean", client=FakeAnthropic(llm), user_id=user_id, db_path=db_path)
+
+
+def test_workers_see_each_others_turns():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        first, second = make_worker(db_path), make_worker(db_path)
+
+        first.send_message("hello from worker one")
+        second.send_message("hello from worker two")
+        first.send_message("back on worker one")
+
+        # The third request was built from the full history, not worker one's stale copy
+        assert [msg["content"] for msg in first.chat_log[0::2]] == [
+            "hello from worker one", "hello from worker two", "back on worker one"
+        ]
+        assert second.sync_history()
+        assert second.chat_log == first.chat_log
+        assert not second.sync_history()
+
+        # Another user's conversation is untouched
+        assert make_worker(db_path, user_id="bob").chat_log == []
+
+
+def test_clear_reaches_other_workers_and_reloads():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        first, second = make_worker(db_path), make_worker(db_path)
+        first.send_message("something to forget")
+        second.sync_history()
+        assert len(second.chat_log) == 2
+
+        first.clear_history()
+        assert second.sync_history() and second.chat_log == []
+
+        second.send_message("fresh start")
+        assert [msg["content"] for msg in first.chat_log] == []
+        first.sync_history()
+        assert first.chat_log == second.chat_log
+        assert make_worker(db_path).chat_log == second.chat_log
+
+
+def test_snapshot_history_is_seeded_once():
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "chat.db")
+        legacy = [
+            {"role": "user", "content": "old question", "timestamp": "2024-01-01T00:00:00"},
+            {"role": "assistant", "content": "old answer", "timestamp": "2024-01-01T00:00:01"}
+        ]
+        SQLiteClient(db_path).save_conversation({
+            "chat_type": "ocean", "user_id": "alice", "conversation": legacy
+        })
+
+        first, second = make_worker(db_path), make_worker(db_path)
+        assert first.chat_log == legacy and second.chat_log == legacy
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 2
+
+        first.send_message("new question")
+        with sqlite3.connect(db_path) as conn:
+            latest = conn.execute("SELECT conversation FROM conversations ORDER BY chat_id DESC LIMIT 1").fetchone()[0]
+        assert json.loads(latest)[:2] == legacy and len(json.loads(latest)) == 4
+
+
+if __name__ == "__main__":
+    test_workers_see_each_others_turns()
+    test_clear_reaches_other_workers_and_reloads()
+    test_snapshot_history_is_seeded_once()
+    print("Shared history tests passed")
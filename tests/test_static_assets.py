@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test precompressed static file serving and revalidation
+"""
+
+import gzip
+import os
+import tempfile
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, PrecompressedStaticFiles
+
+SCRIPT = "console.log('tide');\n" * 100
+
+
+def make_client(directory):
+    for name in ("app.js", os.path.join("dist", "app.0123456789.js")):
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(SCRIPT)
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(SCRIPT.encode()))
+    app = Starlette(routes=[Mount("/static", PrecompressedStaticFiles(directory=directory))])
+    return TestClient(app)
+
+
+def test_serves_the_accepted_variant():
+    with tempfile.TemporaryDirectory() as directory:
+        client = make_client(directory)
+        encoded = client.get("/static/app.js", headers={"Accept-Encoding": "br, gzip"})
+        assert encoded.headers["Content-Encoding"] == "gzip"
+        assert encoded.headers["Content-Type"].startswith("text/javascript")
+        assert encoded.text == SCRIPT
+        assert encoded.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+
+        plain = client.get("/static/app.js", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers and plain.text == SCRIPT
+        assert plain.headers["ETag"] != encoded.headers["ETag"]
+
+        hashed = client.get("/static/dist/app.0123456789.js", headers={"Accept-Encoding": "gzip"})
+        assert hashed.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_revalidating_the_variant_returns_304():
+    with tempfile.TemporaryDirectory() as directory:
+        client = make_client(directory)
+        headers = {"Accept-Encoding": "gzip"}
+        first = client.get("/static/app.js", headers=headers)
+
+        again = client.get("/static/app.js", headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 304
+        assert again.headers["ETag"] == first.headers["ETag"]
+        assert again.headers["Content-Encoding"] == "gzip"
+        assert again.headers["Vary"] == "Accept-Encoding"
+
+        since = client.get("/static/app.js", headers={**headers, "If-Modified-Since": first.headers["Last-Modified"]})
+        assert since.status_code == 304
+
+        # A stale validator gets the full response
+        stale = client.get("/static/app.js", headers={**headers, "If-None-Match": '"stale"'})
+        assert stale.status_code == 200 and stale.text == SCRIPT
+
+
+if __name__ == "__main__":
+    test_serves_the_accepted_variant()
+    test_revalidating_the_variant_returns_304()
+    print("Static asset tests passed")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test ChatClient.stream_message against the fake provider
+"""
+
+import json
+import sqlite3
+import tempfile
+
+from chat_client import ChatClient
+from fake_provider import FakeAnthropic, FakeConfig, FakeLLM
+
+
+def make_client(db_path, client=None):
+    llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=12, seed=3))
+    return ChatClient(
+        chat_type="ocean", model="claude-3-haiku-20240307",
+        client=client or FakeAnthropic(llm), db_path=db_path
+    )
+
+
+def saved_conversations(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [json.loads(row[0]) for row in conn.execute("SELECT conversation FROM conversations ORDER BY chat_id")]
+
+
+def test_stream_yields_deltas_and_saves_the_reply():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = f"{tmp}/chat.db"
+        client = make_client(db_path)
+        chunks = list(client.stream_message("Tell me about tides"))
+
+        assert len(chunks) > 1
+        reply = "".join(chunks)
+        assert "You said: Tell me about tides" in reply
+        assert [(msg["role"], msg["content"]) for msg in client.chat_log] == [
+            ("user", "Tell me about tides"), ("assistant", reply)
+        ]
+        assert saved_conversations(db_path)[-1] == client.chat_log
+
+
+def test_closed_stream_saves_partial_reply():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(f"{tmp}/chat.db")
+        stream = client.stream_message("Tell me about storms")
+        received = [next(stream), next(stream)]
+        stream.close()
+
+        assert client.chat_log[-1]["role"] == "assistant"
+        assert client.chat_log[-1]["content"] == "".join(received)
+        # The lock was released, so the next turn can run
+        assert client.send_message("And gulls?")
+
+
+def test_failed_stream_is_not_saved():
+    class FailingStreamMessages:
+        """Fails after the first two text deltas"""
+
+        def __init__(self, messages):
+            self.messages = messages
+
+        def create(self, **kwargs):
+            deltas = 0
+            for event in self.messages.create(**kwargs):
+                if event.type == "content_block_delta":
+                    if deltas == 2:
+                        raise ConnectionError("stream reset")
+                    deltas += 1
+                yield event
+
+    class FailingStreamClient:
+        def __init__(self, messages):
+            self.messages = FailingStreamMessages(messages)
+
+    llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=12, seed=3))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = f"{tmp}/chat.db"
+        client = make_client(db_path, FailingStreamClient(FakeAnthropic(llm).messages))
+        received = []
+        try:
+            for chunk in client.stream_message("Tell me about storms"):
+                received.append(chunk)
+            raise AssertionError("expected the stream to fail")
+        except ConnectionError:
+            pass
+
+        assert len(received) == 2
+        assert [msg["role"] for msg in client.chat_log] == ["user"]
+        assert all(msg["role"] == "user" for msg in saved_conversations(db_path)[-1])
+
+
+def test_provider_without_streaming_yields_one_chunk():
+    class NonStreamingClient:
+        supports_streaming = False
+
+        def __init__(self, messages):
+            self.messages = messages
+
+    llm = FakeLLM(FakeConfig(latency="fixed:0", tokens_per_second=0, reply_tokens=12, seed=3))
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(f"{tmp}/chat.db", NonStreamingClient(FakeAnthropic(llm).messages))
+        chunks = list(client.stream_message("Hello"))
+        assert len(chunks) == 1
+        assert client.chat_log[-1]["content"] == chunks[0]
+
+
+if __name__ == "__main__":
+    test_stream_yields_deltas_and_saves_the_reply()
+    test_closed_stream_saves_partial_reply()
+    test_failed_stream_is_not_saved()
+    test_provider_without_streaming_yields_one_chunk()
+    print("Streaming tests passed")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test per-persona request size telemetry
+"""
+
+import logging
+
+from prompt_cache import build_system_blocks
+from telemetry import UsageTracker, request_sizes
+
+
+def make_request(system, messages):
+    return {"model": "claude-3-haiku-20240307", "system": system, "messages": messages}
+
+
+def test_request_sizes_separate_recalled_context():
+    system = build_system_blocks("Persona " * 10, "Memory tiers", "Recalled é")
+    messages = [{"role": "user", "content": "x" * 40}, {"role": "assistant", "content": "y" * 20}]
+    sizes = request_sizes(make_request(system, messages))
+
+    assert sizes["recalled_bytes"] == len("Recalled é".encode("utf-8"))
+    assert sizes["system_bytes"] == len("\n\n".join(block["text"] for block in system).encode("utf-8"))
+    assert sizes["message_count"] == 2 and sizes["message_bytes"] == 60
+    assert sizes["estimated_input_tokens"] > 15
+
+
+def test_reported_usage_wins_over_estimates():
+    tracker = UsageTracker()
+    request = make_request("You are Ocean.", [{"role": "user", "content": "Hi"}])
+    usage = {"uncached_input_tokens": 10, "cache_read_input_tokens": 90, "cache_creation_input_tokens": 0, "output_tokens": 7}
+
+    reported = tracker.record("ocean", request, usage, reply="Hello there")
+    assert (reported["input_tokens"], reported["output_tokens"], reported["cache_read_tokens"]) == (100, 7, 90)
+    assert not reported["estimated"]
+
+    estimated = tracker.record("ocean", request, None, reply="x" * 40, recalled_bytes=123)
+    assert estimated["estimated"] and estimated["output_tokens"] == 10
+    assert estimated["recalled_bytes"] == 123
+
+
+def test_stats_window_and_totals():
+    tracker = UsageTracker(window=3)
+    for size in (10, 20, 30, 40):
+        tracker.record("ocean", make_request("", [{"role": "user", "content": "x" * 4 * size}]))
+    tracker.record(None, make_request("", [{"role": "user", "content": "hi"}]))
+
+    stats = tracker.stats()
+    assert sorted(stats) == ["chat", "ocean"]
+    ocean = stats["ocean"]
+    assert ocean["totals"]["requests"] == 4 and ocean["totals"]["input_tokens"] == 100
+    # Percentiles only cover the last `window` requests
+    assert ocean["input_tokens"] == {"mean": 30.0, "p95": 40, "max": 40}
+    assert [record["input_tokens"] for record in tracker.recent("ocean")] == [20, 30, 40]
+
+    tracker.reset()
+    assert tracker.stats() == {}
+
+
+def test_large_requests_are_logged():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger("telemetry")
+    logger.addHandler(handler)
+    try:
+        tracker = UsageTracker(warn_tokens=50)
+        tracker.record("ocean", make_request("", [{"role": "user", "content": "x" * 100}]))
+        tracker.record("ocean", make_request("", [{"role": "user", "content": "x" * 400}]))
+    finally:
+        logger.removeHandler(handler)
+    assert len(records) == 1 and "Large request" in records[0].getMessage()
+
+
+if __name__ == "__main__":
+    test_request_sizes_separate_recalled_context()
+    test_reported_usage_wins_over_estimates()
+    test_stats_window_and_totals()
+    test_large_requests_are_logged()
+    print("Telemetry tests passed")